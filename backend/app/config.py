@@ -3,7 +3,7 @@ from __future__ import annotations
 from typing import List, Optional
 
 from pydantic import Field
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 def _split_origins(value: Optional[str]) -> Optional[List[str]]:
@@ -13,27 +13,39 @@ def _split_origins(value: Optional[str]) -> Optional[List[str]]:
 
 
 class Settings(BaseSettings):
-    app_name: str = Field("pocketLLM Backend", env="APP_NAME")
-    app_version: str = Field("0.1.0", env="APP_VERSION")
-    debug: bool = Field(True, env="DEBUG")
-    allowed_origins: Optional[str] = Field(None, env="ALLOWED_ORIGINS")
-    redis_url: str = Field("redis://localhost:6379/0", env="REDIS_URL")
-    model_management_url: str = Field("http://localhost:8000/api/v1", env="MODEL_MANAGEMENT_URL")
-    jwt_secret: str = Field("replace-this-secret", env="JWT_SECRET")
-    rate_limit_global: str = Field("100/minute", env="RATE_LIMIT_GLOBAL")
-    log_level: str = Field("INFO", env="LOG_LEVEL")
-    mongodb_uri: str = Field("mongodb://localhost:27017", env="MONGODB_URI")
-    mongodb_db: str = Field("pocketllm", env="MONGODB_DB")
-    users_collection: str = Field("users", env="MONGODB_USERS_COLLECTION")
-    sessions_collection: str = Field("sessions", env="MONGODB_SESSIONS_COLLECTION")
-    messages_collection: str = Field("messages", env="MONGODB_MESSAGES_COLLECTION")
-
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = False
-        extra = "ignore"
-        populate_by_name = True
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        extra="ignore",
+        populate_by_name=True,
+        # Lets model_management_url through without a namespace warning
+        protected_namespaces=("settings_",),
+    )
+
+    # Environment variables match the upper-cased field names unless aliased
+    app_name: str = "pocketLLM Backend"
+    app_version: str = "0.1.0"
+    debug: bool = True
+    allowed_origins: Optional[str] = None
+    redis_url: str = "redis://localhost:6379/0"
+    model_management_url: str = "http://localhost:8000/api/v1"
+    jwt_secret: str = "replace-this-secret"
+    rate_limit_global: str = "100/minute"
+    log_level: str = "INFO"
+    mongodb_uri: str = "mongodb://localhost:27017"
+    mongodb_db: str = "pocketllm"
+    # Keep warm connections for bursts instead of reopening them on demand
+    mongodb_min_pool_size: int = 20
+    mongodb_max_pool_size: int = 200
+    mongodb_max_idle_time_ms: int = 60000
+    mongodb_server_selection_timeout_ms: int = 2000
+    mongodb_socket_timeout_ms: int = 10000
+    # Tried in order; the server picks the first one it also supports
+    mongodb_compressors: str = "zstd,zlib"
+    users_collection: str = Field("users", validation_alias="MONGODB_USERS_COLLECTION")
+    sessions_collection: str = Field("sessions", validation_alias="MONGODB_SESSIONS_COLLECTION")
+    messages_collection: str = Field("messages", validation_alias="MONGODB_MESSAGES_COLLECTION")
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
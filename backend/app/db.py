@@ -4,26 +4,37 @@ from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Optional
 
 import structlog
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.config import settings
 
 
 logger = structlog.get_logger("backend-mongodb")
 
-_client: Optional[AsyncIOMotorClient] = None
-_database: Optional[AsyncIOMotorDatabase] = None
+_client: Optional[AsyncMongoClient] = None
+_database: Optional[AsyncDatabase] = None
 
 
-def get_client() -> AsyncIOMotorClient:
+def get_client() -> AsyncMongoClient:
     global _client
     if _client is None:
         logger.info("connecting_to_mongodb", uri=settings.mongodb_uri)
-        _client = AsyncIOMotorClient(settings.mongodb_uri)
+        _client = AsyncMongoClient(
+            settings.mongodb_uri,
+            tz_aware=True,
+            minPoolSize=settings.mongodb_min_pool_size,
+            maxPoolSize=settings.mongodb_max_pool_size,
+            maxIdleTimeMS=settings.mongodb_max_idle_time_ms,
+            serverSelectionTimeoutMS=settings.mongodb_server_selection_timeout_ms,
+            socketTimeoutMS=settings.mongodb_socket_timeout_ms,
+            retryWrites=True,
+            compressors=settings.mongodb_compressors,
+        )
     return _client
 
 
-def get_database() -> AsyncIOMotorDatabase:
+def get_database() -> AsyncDatabase:
     global _database
     if _database is None:
         client = get_client()
@@ -50,7 +61,7 @@ async def lifespan(app):
         from app.repositories.sessions import SessionRepository
         from app.repositories.users import UserRepository
         from app.utils.security import hash_password
-        from datetime import datetime
+        from app.utils.serializers import utc_now
 
         await UserRepository(database).ensure_indexes()
         await SessionRepository(database).ensure_indexes()
@@ -79,7 +90,7 @@ async def lifespan(app):
             if existing_user_with_hash and not existing_user_with_hash.get("is_admin", False):
                 await user_repo.collection.update_one(
                     {"email": demo_email.lower()},
-                    {"$set": {"is_admin": True, "updated_at": datetime.utcnow()}}
+                    {"$set": {"is_admin": True, "updated_at": utc_now()}}
                 )
                 logger.info("Demo user upgraded to admin", email=demo_email)
             else:
@@ -89,11 +100,11 @@ async def lifespan(app):
     finally:
         global _client, _database
         if _client:
-            _client.close()
+            await _client.close()
         _client = None
         _database = None
 
 
-async def database_dependency() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
+async def database_dependency() -> AsyncGenerator[AsyncDatabase, None]:
     db = get_database()
     yield db
\ No newline at end of file
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import logging
+import orjson
 import structlog
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
@@ -17,16 +18,25 @@ from app.middleware import (
 from app.routers import router as api_router
 from app.routers.chat import router as chat_router
 from app.db import lifespan
+from app.utils.serializers import BSONResponse
 
 
 log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
+# Pretty console output for development; outside debug, orjson renders each
+# event to bytes that are written straight to stdout's binary buffer
+if settings.debug:
+    log_renderer = structlog.dev.ConsoleRenderer()
+    log_factory = structlog.PrintLoggerFactory()
+else:
+    log_renderer = structlog.processors.JSONRenderer(serializer=orjson.dumps)
+    log_factory = structlog.BytesLoggerFactory()
 structlog.configure(
     processors=[
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.add_log_level,
-        structlog.dev.ConsoleRenderer(),
+        log_renderer,
     ],
-    logger_factory=structlog.PrintLoggerFactory(),
+    logger_factory=log_factory,
     context_class=dict,
     wrapper_class=structlog.make_filtering_bound_logger(log_level),
 )
@@ -37,6 +47,7 @@ app = FastAPI(
     version=settings.app_version,
     debug=settings.debug,
     lifespan=lifespan,
+    default_response_class=BSONResponse,
 )
 
 configure_cors(app)
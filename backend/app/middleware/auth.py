@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List
 
 from fastapi import Depends, HTTPException, status
@@ -10,6 +10,7 @@ from jose import JWTError, jwt
 
 from app.config import settings
 from app.db import database_dependency
+from app.utils.serializers import utc_now
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
@@ -29,7 +30,7 @@ class JWTAuthenticator:
         self.algorithm = algorithm
 
     def create_access_token(self, subject: str, scopes: List[str] | None = None) -> str:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = utc_now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         payload: Dict[str, Any] = {
             "sub": subject,
             "scopes": scopes or [],
@@ -46,7 +47,7 @@ class JWTAuthenticator:
             return AuthPayload(
                 sub=decoded.get("sub"),
                 scopes=decoded.get("scopes", []),
-                exp=datetime.utcfromtimestamp(int(exp_ts)),
+                exp=datetime.fromtimestamp(int(exp_ts), tz=timezone.utc),
             )
         except JWTError as exc:
             raise ValueError("Invalid or expired token") from exc
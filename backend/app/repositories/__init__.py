@@ -1,6 +1,45 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
+from fastapi import Depends
+from pymongo.asynchronous.database import AsyncDatabase
+
+from app.db import database_dependency
+from app.repositories.messages import MessageRepository
 from app.repositories.sessions import SessionRepository
 from app.repositories.users import UserRepository
 
-__all__ = ["UserRepository", "SessionRepository"]
\ No newline at end of file
+__all__ = [
+    "UserRepository",
+    "SessionRepository",
+    "MessageRepository",
+    "user_repository_dependency",
+    "session_repository_dependency",
+    "message_repository_dependency",
+]
+
+
+# Repositories only hold collection handles, which are safe to share, so one
+# instance per (class, database) serves every request
+@lru_cache(maxsize=16)
+def _repository(repository_cls: type, database: AsyncDatabase):
+    return repository_cls(database)
+
+
+def user_repository_dependency(
+    database: AsyncDatabase = Depends(database_dependency),
+) -> UserRepository:
+    return _repository(UserRepository, database)
+
+
+def session_repository_dependency(
+    database: AsyncDatabase = Depends(database_dependency),
+) -> SessionRepository:
+    return _repository(SessionRepository, database)
+
+
+def message_repository_dependency(
+    database: AsyncDatabase = Depends(database_dependency),
+) -> MessageRepository:
+    return _repository(MessageRepository, database)
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
 from typing import List, Optional
 
 from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.config import settings
 from app.schemas.messages import MessageCreate, MessageRead
-from app.utils.serializers import parse_object_id, to_public_id
+from app.utils.serializers import parse_object_id, to_public_id, utc_now
+
+# Session fields create_message overwrites, restored if its insert fails
+_SESSION_SUMMARY_FIELDS = ("last_message_at", "updated_at", "last_message")
 
 
 def _public_message(document: dict) -> dict:
@@ -28,9 +34,9 @@ def _public_message(document: dict) -> dict:
 
 
 class MessageRepository:
-    def __init__(self, database: AsyncIOMotorDatabase):
-        self.collection: AsyncIOMotorCollection = database[settings.messages_collection]
-        self.sessions: AsyncIOMotorCollection = database[settings.sessions_collection]
+    def __init__(self, database: AsyncDatabase):
+        self.collection: AsyncCollection = database[settings.messages_collection]
+        self.sessions: AsyncCollection = database[settings.sessions_collection]
 
     async def ensure_indexes(self) -> None:
         await self.collection.create_index([("session_id", 1), ("created_at", 1)])
@@ -61,32 +67,60 @@ class MessageRepository:
         user_id: str,
         payload: MessageCreate,
     ) -> dict:
-        now = datetime.utcnow()
+        now = utc_now()
         session_obj_id = parse_object_id(session_id)
         user_obj_id = parse_object_id(user_id)
 
         # Insert message
         doc = {
+            "_id": ObjectId(),
             "session_id": session_obj_id,
             "user_id": user_obj_id,
             "role": payload.role,
             "content": payload.content,
             "created_at": now,
         }
-        result = await self.collection.insert_one(doc)
-        doc["_id"] = result.inserted_id
 
-        # Update session's last_message_at + updated_at
-        await self.sessions.update_one(
-            {"_id": session_obj_id, "user_id": user_obj_id},
-            {
-                "$set": {
-                    "last_message_at": now,
-                    "updated_at": now,
-                    "last_message": payload.content,
+        # Insert message and update session's last_message_at + updated_at;
+        # the writes are independent, so they share one round-trip of latency.
+        # The session update returns the fields it overwrote so a failed insert
+        # can be rolled back without leaving the session pointing at nothing
+        session_filter = {"_id": session_obj_id, "user_id": user_obj_id}
+        inserted, previous = await asyncio.gather(
+            self.collection.insert_one(doc),
+            self.sessions.find_one_and_update(
+                session_filter,
+                {
+                    "$set": {
+                        "last_message_at": now,
+                        "updated_at": now,
+                        "last_message": payload.content,
+                    },
+                    "$inc": {"message_count": 1},
                 },
-                "$inc": {"message_count": 1},
-            },
+                projection={field: 1 for field in _SESSION_SUMMARY_FIELDS},
+                return_document=ReturnDocument.BEFORE,
+            ),
+            return_exceptions=True,
         )
-
+        if isinstance(inserted, BaseException):
+            if previous is not None and not isinstance(previous, BaseException):
+                await self._undo_session_update(session_filter, previous, now)
+            raise inserted
+        if isinstance(previous, BaseException):
+            raise previous
         return _public_message(doc)
+
+    async def _undo_session_update(self, session_filter: dict, previous: dict, now: datetime) -> None:
+        # Only restore the summary if no later message has replaced it since;
+        # the count is taken back either way
+        restore = {field: previous[field] for field in _SESSION_SUMMARY_FIELDS if field in previous}
+        unset = {field: "" for field in _SESSION_SUMMARY_FIELDS if field not in previous}
+        update = {"$inc": {"message_count": -1}}
+        if restore:
+            update["$set"] = restore
+        if unset:
+            update["$unset"] = unset
+        result = await self.sessions.update_one({**session_filter, "last_message_at": now}, update)
+        if result.matched_count == 0:
+            await self.sessions.update_one(session_filter, {"$inc": {"message_count": -1}})
@@ -1,13 +1,35 @@
 from __future__ import annotations
 
-from datetime import datetime
 from typing import Optional
 
-from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.config import settings
 from app.schemas.sessions import ChatSessionCreate, ChatSessionUpdate
-from app.utils.serializers import parse_object_id, to_public_id
+from app.utils.serializers import parse_object_id, to_public_id, utc_now
+
+
+# Fields ChatSessionPublic exposes; reads fetch only these from Mongo
+_PUBLIC_PROJECTION = {
+    "user_id": 1,
+    "title": 1,
+    "metadata": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "last_message_at": 1,
+    "last_message": 1,
+    "message_count": 1,
+}
+
+# One compound index per timestamp the session list can sort by; the equality
+# on user_id plus the sort key lets Mongo walk the index instead of sorting
+_USER_SORT_INDEXES = {
+    "created_at": [("user_id", 1), ("created_at", -1)],
+    "updated_at": [("user_id", 1), ("updated_at", -1)],
+}
 
 
 def _public_session(document: dict) -> dict:
@@ -19,15 +41,17 @@ def _public_session(document: dict) -> dict:
 
 
 class SessionRepository:
-    def __init__(self, database: AsyncIOMotorDatabase):
-        self.collection: AsyncIOMotorCollection = database[settings.sessions_collection]
+    def __init__(self, database: AsyncDatabase):
+        self.collection: AsyncCollection = database[settings.sessions_collection]
 
     async def ensure_indexes(self) -> None:
-        await self.collection.create_index([("user_id", 1), ("created_at", -1)])
+        for keys in _USER_SORT_INDEXES.values():
+            await self.collection.create_index(keys)
 
     async def create_session(self, payload: ChatSessionCreate) -> dict:
-        now = datetime.utcnow()
+        now = utc_now()
         document = {
+            "_id": ObjectId(),
             "user_id": parse_object_id(payload.user_id),
             "title": payload.title or "New chat",
             "metadata": payload.metadata or {},
@@ -36,8 +60,8 @@ class SessionRepository:
             "last_message_at": None,
             "message_count": 0,
         }
-        result = await self.collection.insert_one(document)
-        document["_id"] = result.inserted_id
+        # _id is generated client-side, so nothing needs patching after the write
+        await self.collection.insert_one(document)
         return _public_session(document)
 
     async def get_session(self, session_id: str, user_id: str | None = None) -> Optional[dict]:
@@ -45,11 +69,19 @@ class SessionRepository:
         filter_criteria = {"_id": object_id}
         if user_id:
             filter_criteria["user_id"] = parse_object_id(user_id)
-        document = await self.collection.find_one(filter_criteria)
+        document = await self.collection.find_one(filter_criteria, projection=_PUBLIC_PROJECTION)
         if not document:
             return None
         return _public_session(document)
 
+    async def session_exists(self, session_id: str, user_id: str | None = None) -> bool:
+        # Ownership checks only need the match, not the document
+        filter_criteria = {"_id": parse_object_id(session_id)}
+        if user_id:
+            filter_criteria["user_id"] = parse_object_id(user_id)
+        document = await self.collection.find_one(filter_criteria, projection={"_id": 1})
+        return document is not None
+
     async def list_for_user(
         self,
         user_id: str,
@@ -61,11 +93,15 @@ class SessionRepository:
         object_id = parse_object_id(user_id)
         cursor = (
             self.collection
-            .find({"user_id": object_id})
+            .find({"user_id": object_id}, projection=_PUBLIC_PROJECTION)
             .sort(sort_field, sort_direction)
             .skip(skip)
             .limit(limit)
         )
+        index = _USER_SORT_INDEXES.get(sort_field)
+        if index is not None:
+            # Pin the planner; either sort direction is a forward or reverse scan
+            cursor = cursor.hint(index)
         return [_public_session(doc) async for doc in cursor]
 
     async def count_for_user(self, user_id: str) -> int:
@@ -78,9 +114,9 @@ class SessionRepository:
         user_id: str | None = None,
     ) -> Optional[dict]:
         object_id = parse_object_id(session_id)
-        now = datetime.utcnow()
+        now = utc_now()
 
-        update_data = payload.dict(exclude_unset=True)
+        update_data = payload.model_dump(exclude_unset=True)
         if not update_data:
             return await self.get_session(session_id, user_id)
 
@@ -90,15 +126,17 @@ class SessionRepository:
         if user_id:
             filter_criteria["user_id"] = parse_object_id(user_id)
 
-        result = await self.collection.update_one(
+        # Returns the updated public fields from the write itself instead of
+        # following the update with a second find
+        document = await self.collection.find_one_and_update(
             filter_criteria,
-            {"$set": update_data}
+            {"$set": update_data},
+            projection=_PUBLIC_PROJECTION,
+            return_document=ReturnDocument.AFTER,
         )
-
-        if result.matched_count == 0:
+        if not document:
             return None
-
-        return await self.get_session(session_id, user_id)
+        return _public_session(document)
 
 
     async def delete_session(self, session_id: str, user_id: str | None = None) -> bool:
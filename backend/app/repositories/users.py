@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.config import settings
 from app.schemas.users import UserCreate
-from app.utils.serializers import parse_object_id, to_public_id
+from app.utils.serializers import parse_object_id, to_public_id, utc_now
 
 
 def _public_user(document: dict) -> dict:
@@ -25,15 +26,16 @@ def _public_user(document: dict) -> dict:
 
 
 class UserRepository:
-    def __init__(self, database: AsyncIOMotorDatabase):
-        self.collection: AsyncIOMotorCollection = database[settings.users_collection]
+    def __init__(self, database: AsyncDatabase):
+        self.collection: AsyncCollection = database[settings.users_collection]
 
     async def ensure_indexes(self) -> None:
         await self.collection.create_index("email", unique=True)
 
     async def create_user(self, payload: UserCreate, is_admin: bool = False) -> dict:
-        now = datetime.utcnow()
+        now = utc_now()
         document = {
+            "_id": ObjectId(),
             "email": payload.email.lower(),
             "full_name": payload.name,
             "avatar_url": str(payload.avatar) if payload.avatar else None,
@@ -42,8 +44,8 @@ class UserRepository:
             "created_at": now,
             "updated_at": now,
         }
-        result = await self.collection.insert_one(document)
-        document["_id"] = result.inserted_id
+        # _id is generated client-side, so the document is already complete
+        await self.collection.insert_one(document)
         return _public_user(document)
     
     async def update_user_admin_status(self, user_id: str, is_admin: bool) -> Optional[dict]:
@@ -51,7 +53,7 @@ class UserRepository:
         object_id = parse_object_id(user_id)
         result = await self.collection.update_one(
             {"_id": object_id},
-            {"$set": {"is_admin": is_admin, "updated_at": datetime.utcnow()}}
+            {"$set": {"is_admin": is_admin, "updated_at": utc_now()}}
         )
         if result.modified_count == 0:
             return None
@@ -65,15 +67,32 @@ class UserRepository:
         return _public_user(document)
 
     async def list_users(self, skip: int = 0, limit: int = 20) -> tuple[list[dict], int]:
+        # Page and total in one round-trip instead of a find plus count_documents
+        pipeline = [
+            {
+                "$facet": {
+                    "items": [{"$sort": {"created_at": -1}}, {"$skip": skip}, {"$limit": limit}],
+                    "total": [{"$count": "n"}],
+                }
+            }
+        ]
+        result = await (await self.collection.aggregate(pipeline)).to_list(length=1)
+        facets = result[0] if result else {"items": [], "total": []}
+        documents = [_public_user(doc) for doc in facets["items"]]
+        total = facets["total"][0]["n"] if facets["total"] else 0
+        return documents, total
+
+    async def iter_users(self, skip: int = 0, limit: int = 20) -> AsyncIterator[dict]:
+        # Yields each user as the cursor's batches arrive instead of building the page
         cursor = (
-            self.collection.find({})
+            self.collection
+            .find({}, projection={"password_hash": 0})
+            .sort("created_at", -1)
             .skip(skip)
             .limit(limit)
-            .sort("created_at", -1)
         )
-        documents = [_public_user(doc) async for doc in cursor]
-        total = await self.collection.count_documents({})
-        return documents, total
+        async for document in cursor:
+            yield _public_user(document)
 
     async def find_by_email(self, email: str) -> Optional[dict]:
         document = await self.collection.find_one({"email": email.lower()})
@@ -81,5 +100,14 @@ class UserRepository:
             return None
         return _public_user(document)
 
+    async def email_exists(self, email: str) -> bool:
+        # Projecting only the indexed field makes this a covered query: the
+        # unique email index answers it without reading the user document
+        document = await self.collection.find_one(
+            {"email": email.lower()},
+            projection={"_id": 0, "email": 1},
+        )
+        return document is not None
+
     async def find_by_email_with_hash(self, email: str) -> Optional[dict]:
         return await self.collection.find_one({"email": email.lower()})
\ No newline at end of file
@@ -1,16 +1,20 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Dict, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.db import database_dependency
 from app.middleware.auth import get_current_admin_user
-from app.repositories.messages import MessageRepository
-from app.repositories.sessions import SessionRepository
-from app.repositories.users import UserRepository
+from app.repositories import (
+    MessageRepository,
+    SessionRepository,
+    UserRepository,
+    message_repository_dependency,
+    session_repository_dependency,
+    user_repository_dependency,
+)
+from app.utils.serializers import BSONResponse, utc_now
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -18,13 +22,11 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 @router.get("/metrics")
 async def get_metrics(
     user_id: str = Depends(get_current_admin_user),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    user_repo: UserRepository = Depends(user_repository_dependency),
+    session_repo: SessionRepository = Depends(session_repository_dependency),
+    message_repo: MessageRepository = Depends(message_repository_dependency),
 ):
     """Get system-wide metrics for admin dashboard."""
-    user_repo = UserRepository(database)
-    session_repo = SessionRepository(database)
-    message_repo = MessageRepository(database)
-    
     # Total counts
     total_users = await user_repo.collection.count_documents({})
     total_sessions = await session_repo.collection.count_documents({})
@@ -34,7 +36,7 @@ async def get_metrics(
     admin_count = await user_repo.collection.count_documents({"is_admin": True})
     
     # Recent activity (last 24 hours)
-    yesterday = datetime.utcnow() - timedelta(days=1)
+    yesterday = utc_now() - timedelta(days=1)
     recent_users = await user_repo.collection.count_documents({
         "created_at": {"$gte": yesterday}
     })
@@ -50,7 +52,7 @@ async def get_metrics(
     assistant_messages = await message_repo.collection.count_documents({"role": "assistant"})
     
     # Active users (users with sessions in last 7 days)
-    week_ago = datetime.utcnow() - timedelta(days=7)
+    week_ago = utc_now() - timedelta(days=7)
     active_user_ids = await session_repo.collection.distinct(
         "user_id",
         {"updated_at": {"$gte": week_ago}}
@@ -88,17 +90,17 @@ async def list_all_users(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     user_id: str = Depends(get_current_admin_user),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    user_repo: UserRepository = Depends(user_repository_dependency),
 ):
     """List all users (admin only)."""
-    user_repo = UserRepository(database)
+    # Rows are already public dicts; BSONResponse skips the jsonable_encoder walk
     users, total = await user_repo.list_users(skip=skip, limit=limit)
-    return {
+    return BSONResponse({
         "users": users,
         "total": total,
         "skip": skip,
         "limit": limit,
-    }
+    })
 
 
 @router.get("/sessions")
@@ -106,10 +108,9 @@ async def list_all_sessions(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     user_id: str = Depends(get_current_admin_user),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    session_repo: SessionRepository = Depends(session_repository_dependency),
 ):
     """List all sessions (admin only)."""
-    session_repo = SessionRepository(database)
     sessions = await session_repo.collection.find({}).skip(skip).limit(limit).sort("created_at", -1).to_list(length=limit)
     total = await session_repo.collection.count_documents({})
     
@@ -117,12 +118,12 @@ async def list_all_sessions(
     from app.repositories.sessions import _public_session
     public_sessions = [_public_session(session) for session in sessions]
     
-    return {
+    return BSONResponse({
         "sessions": public_sessions,
         "total": total,
         "skip": skip,
         "limit": limit,
-    }
+    })
 
 
 @router.get("/messages")
@@ -130,10 +131,9 @@ async def list_all_messages(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     user_id: str = Depends(get_current_admin_user),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    message_repo: MessageRepository = Depends(message_repository_dependency),
 ):
     """List all messages (admin only)."""
-    message_repo = MessageRepository(database)
     messages = await message_repo.collection.find({}).skip(skip).limit(limit).sort("created_at", -1).to_list(length=limit)
     total = await message_repo.collection.count_documents({})
     
@@ -141,22 +141,21 @@ async def list_all_messages(
     from app.repositories.messages import _public_message
     public_messages = [_public_message(msg) for msg in messages]
     
-    return {
+    return BSONResponse({
         "messages": public_messages,
         "total": total,
         "skip": skip,
         "limit": limit,
-    }
+    })
 
 
 @router.post("/users/{user_id}/toggle-admin")
 async def toggle_user_admin(
     user_id: str,
     user_admin_id: str = Depends(get_current_admin_user),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    user_repo: UserRepository = Depends(user_repository_dependency),
 ):
     """Toggle admin status for a user."""
-    user_repo = UserRepository(database)
     user = await user_repo.get_user(user_id)
     
     if not user:
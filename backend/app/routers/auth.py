@@ -1,12 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from app.db import database_dependency
 from app.middleware.auth import (
     ACCESS_TOKEN_EXPIRE_SECONDS,
     get_authenticator,
     get_current_user,
 )
-from app.repositories.users import UserRepository
+from app.repositories import UserRepository, user_repository_dependency
 from app.schemas.auth import (
     AuthLoginRequest,
     AuthResponse,
@@ -30,11 +29,11 @@ def _build_auth_response(user: dict) -> AuthResponse:
 
 
 @router.post("/signup", response_model=AuthResponse)
-async def signup(payload: AuthSignupRequest, database=Depends(database_dependency)) -> AuthResponse:
-    repository = UserRepository(database)
-
-    existing_user = await repository.find_by_email(payload.email)
-    if existing_user:
+async def signup(
+    payload: AuthSignupRequest,
+    repository: UserRepository = Depends(user_repository_dependency),
+) -> AuthResponse:
+    if await repository.email_exists(payload.email):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="User with this email already exists",
@@ -54,8 +53,10 @@ async def signup(payload: AuthSignupRequest, database=Depends(database_dependenc
 
 
 @router.post("/login", response_model=AuthResponse)
-async def login(payload: AuthLoginRequest, database=Depends(database_dependency)) -> AuthResponse:
-    repository = UserRepository(database)
+async def login(
+    payload: AuthLoginRequest,
+    repository: UserRepository = Depends(user_repository_dependency),
+) -> AuthResponse:
     document = await repository.find_by_email_with_hash(payload.email)
 
     if not document or not verify_password(payload.password, document.get("password_hash", "")):
@@ -75,8 +76,10 @@ async def logout() -> None:
 
 
 @router.post("/refresh", response_model=AuthResponse)
-async def refresh_token(payload=Depends(get_current_user), database=Depends(database_dependency)) -> AuthResponse:
-    repository = UserRepository(database)
+async def refresh_token(
+    payload=Depends(get_current_user),
+    repository: UserRepository = Depends(user_repository_dependency),
+) -> AuthResponse:
     user = await repository.get_user(payload.sub)
     if not user:
         raise HTTPException(
@@ -87,8 +90,10 @@ async def refresh_token(payload=Depends(get_current_user), database=Depends(data
 
 
 @router.get("/me", response_model=UserMeResponse)
-async def current_user(payload=Depends(get_current_user), database=Depends(database_dependency)) -> UserMeResponse:
-    repository = UserRepository(database)
+async def current_user(
+    payload=Depends(get_current_user),
+    repository: UserRepository = Depends(user_repository_dependency),
+) -> UserMeResponse:
     user = await repository.get_user(payload.sub)
     if not user:
         raise HTTPException(
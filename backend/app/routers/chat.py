@@ -1,15 +1,16 @@
 import json
-from datetime import datetime
 from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
-from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.db import database_dependency
 from app.middleware.auth import get_current_user_id
-from app.repositories.messages import MessageRepository
-from app.repositories.sessions import SessionRepository
+from app.repositories import (
+    MessageRepository,
+    SessionRepository,
+    message_repository_dependency,
+    session_repository_dependency,
+)
 from app.schemas.messages import MessageCreate, ChatStreamRequest, ChatMessageRequest
 from app.schemas.sessions import (
     ChatSessionCreate,
@@ -18,6 +19,7 @@ from app.schemas.sessions import (
     ChatSessionPublic,
 )
 from app.services.model_client import stream_model_chat, ask_model_management
+from app.utils.serializers import utc_now
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -36,9 +38,8 @@ async def list_sessions(
     sort_by: str = Query("updatedAt", regex="^(createdAt|updatedAt|title)$"),
     sort_order: Literal["asc", "desc"] = Query("desc"),
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     skip = (page - 1) * limit
     sort_field = _SORT_FIELD_MAPPING.get(sort_by, "updated_at")
     sort_direction = -1 if sort_order == "desc" else 1
@@ -70,9 +71,8 @@ async def list_sessions(
 async def create_session(
     payload: ChatSessionCreateRequest,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     session = await repository.create_session(
         ChatSessionCreate(
             user_id=user_id,
@@ -90,9 +90,8 @@ async def create_session(
 async def get_session_detail(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     session = await repository.get_session(session_id, user_id=user_id)
     if not session:
         raise HTTPException(
@@ -108,15 +107,13 @@ async def get_session_messages(
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    messages_repo: MessageRepository = Depends(message_repository_dependency),
+    sessions_repo: SessionRepository = Depends(session_repository_dependency),
 ):
     """Get messages for a specific chat session."""
-    messages_repo = MessageRepository(database)
-    sessions_repo = SessionRepository(database)
 
     # Ensure session belongs to this user
-    session = await sessions_repo.get_session(session_id, user_id=user_id)
-    if not session:
+    if not await sessions_repo.session_exists(session_id, user_id=user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found",
@@ -141,22 +138,21 @@ async def get_session_messages(
 async def stream_chat(
     payload: ChatStreamRequest,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    session_repo: SessionRepository = Depends(session_repository_dependency),
+    message_repo: MessageRepository = Depends(message_repository_dependency),
 ):
     session_id = payload.session_id
     
     # 1. Validate Session
-    session_repo = SessionRepository(database)
-    session = await session_repo.get_session(session_id, user_id)
-    if not session:
+    if not await session_repo.session_exists(session_id, user_id):
         raise HTTPException(status_code=404, detail="Session not found")
 
-    # 2. Save User Message
-    message_repo = MessageRepository(database)
+    # 2. Save User Message; the prompt was validated with the request body,
+    # so build the MessageCreate without a second validation pass
     await message_repo.create_message(
         session_id,
         user_id,
-        MessageCreate(role="user", content=payload.prompt)
+        MessageCreate.model_construct(role="user", content=payload.prompt)
     )
 
     # 2.5. Load message history to pass to model-management-service
@@ -184,7 +180,9 @@ async def stream_chat(
 
     # 4. Stream and Accumulate
     async def response_generator():
-        full_response_text = ""
+        # Tokens are buffered and persisted once as a single message when the
+        # stream ends, never written per token
+        response_chunks: list[str] = []
         try:
             async for line in stream_model_chat("/inference/chat/stream", model_payload):
                 # line is a string like "data: {...}"
@@ -207,7 +205,7 @@ async def stream_chat(
                             done = data.get("done", False)
                             
                             if token:
-                                full_response_text += token
+                                response_chunks.append(token)
                                 yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
                             
                             if done:
@@ -220,11 +218,11 @@ async def stream_chat(
             return
 
         # 5. Save Assistant Message (after stream ends)
-        if full_response_text:
-             await message_repo.create_message(
+        if response_chunks:
+            await message_repo.create_message(
                 session_id,
                 user_id,
-                MessageCreate(role="assistant", content=full_response_text)
+                MessageCreate.model_construct(role="assistant", content="".join(response_chunks))
             )
 
     return StreamingResponse(response_generator(), media_type="text/event-stream")
@@ -234,23 +232,21 @@ async def stream_chat(
 async def send_message(
     payload: ChatMessageRequest,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    session_repo: SessionRepository = Depends(session_repository_dependency),
+    message_repo: MessageRepository = Depends(message_repository_dependency),
 ):
     """Non-streaming chat endpoint."""
     session_id = payload.session_id
     
     # 1. Validate Session
-    session_repo = SessionRepository(database)
-    session = await session_repo.get_session(session_id, user_id)
-    if not session:
+    if not await session_repo.session_exists(session_id, user_id):
         raise HTTPException(status_code=404, detail="Session not found")
 
     # 2. Save User Message
-    message_repo = MessageRepository(database)
     await message_repo.create_message(
         session_id,
         user_id,
-        MessageCreate(role="user", content=payload.prompt)
+        MessageCreate.model_construct(role="user", content=payload.prompt)
     )
 
     # 2.5. Load message history to pass to model-management-service
@@ -282,7 +278,7 @@ async def send_message(
         response = await ask_model_management("/inference/chat", model_payload)
         
         # Extract response text
-        response_text = response.get("response", "")
+        response_text = str(response.get("response") or "")
         if not response_text:
             raise HTTPException(
                 status_code=500,
@@ -293,15 +289,16 @@ async def send_message(
         await message_repo.create_message(
             session_id,
             user_id,
-            MessageCreate(role="assistant", content=response_text)
+            MessageCreate.model_construct(role="assistant", content=response_text)
         )
         
+        now = utc_now()
         return {
-            "messageId": f"msg-{datetime.now().timestamp()}",
+            "messageId": f"msg-{now.timestamp()}",
             "sessionId": session_id,
             "content": response_text,
             "role": "assistant",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
         }
     except Exception as e:
         raise HTTPException(
@@ -3,12 +3,14 @@ from __future__ import annotations
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.db import database_dependency
 from app.middleware.auth import get_current_user_id
-from app.repositories.messages import MessageRepository
-from app.repositories.sessions import SessionRepository
+from app.repositories import (
+    MessageRepository,
+    SessionRepository,
+    message_repository_dependency,
+    session_repository_dependency,
+)
 from app.schemas.messages import MessageCreate, MessageRead
 
 router = APIRouter(
@@ -23,14 +25,11 @@ async def list_messages(
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    messages_repo: MessageRepository = Depends(message_repository_dependency),
+    sessions_repo: SessionRepository = Depends(session_repository_dependency),
 ):
-    messages_repo = MessageRepository(database)
-    sessions_repo = SessionRepository(database)
-
     # Ensure session belongs to this user
-    session = await sessions_repo.get_session(session_id, user_id=user_id)
-    if not session:
+    if not await sessions_repo.session_exists(session_id, user_id=user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found",
@@ -49,14 +48,11 @@ async def create_message(
     session_id: str,
     payload: MessageCreate,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    messages_repo: MessageRepository = Depends(message_repository_dependency),
+    sessions_repo: SessionRepository = Depends(session_repository_dependency),
 ):
-    messages_repo = MessageRepository(database)
-    sessions_repo = SessionRepository(database)
-
     # Ensure session belongs to this user
-    session = await sessions_repo.get_session(session_id, user_id=user_id)
-    if not session:
+    if not await sessions_repo.session_exists(session_id, user_id=user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found",
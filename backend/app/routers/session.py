@@ -1,11 +1,9 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.db import database_dependency
 from app.middleware.auth import get_current_user_id
-from app.repositories.sessions import SessionRepository
+from app.repositories import SessionRepository, session_repository_dependency
 from app.schemas.sessions import (
     ChatSessionCreate,
     ChatSessionPublic,
@@ -19,9 +17,8 @@ router = APIRouter(prefix="/chat/sessions", tags=["Sessions"])
 async def create_session(
     payload: ChatSessionCreate,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     return await repository.create_session(
         ChatSessionCreate(
             user_id=user_id,
@@ -35,9 +32,8 @@ async def create_session(
 async def get_session(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     document = await repository.get_session(session_id, user_id=user_id)
     if not document:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
@@ -49,9 +45,8 @@ async def update_session(
     session_id: str,
     payload: ChatSessionUpdate,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     document = await repository.update_session(session_id, payload, user_id=user_id)
     if not document:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
@@ -68,9 +63,8 @@ async def list_sessions_for_user(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     current_user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     if user_id != current_user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -83,9 +77,8 @@ async def list_sessions_for_user(
 async def delete_session(
     session_id: str,
     user_id: str = Depends(get_current_user_id),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: SessionRepository = Depends(session_repository_dependency),
 ):
-    repository = SessionRepository(database)
     success = await repository.delete_session(session_id, user_id=user_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
@@ -1,21 +1,27 @@
 from __future__ import annotations
 
+from typing import AsyncIterator
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from fastapi.responses import StreamingResponse
 from pymongo.errors import DuplicateKeyError
 
-from app.db import database_dependency
-from app.repositories.users import UserRepository
+from app.repositories import UserRepository, user_repository_dependency
 from app.schemas.users import UserCreate, UserListResponse, UserPublic
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
+async def _ndjson_lines(documents: AsyncIterator[dict]) -> AsyncIterator[str]:
+    # Same shape as the UserListResponse items, one JSON document per line
+    async for document in documents:
+        yield UserPublic.model_validate(document).model_dump_json(by_alias=True) + "\n"
+
+
 @router.post("/", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
 async def create_user(
-    payload: UserCreate, database: AsyncIOMotorDatabase = Depends(database_dependency)
+    payload: UserCreate, repository: UserRepository = Depends(user_repository_dependency)
 ):
-    repository = UserRepository(database)
     try:
         document = await repository.create_user(payload)
     except DuplicateKeyError:
@@ -30,16 +36,29 @@ async def create_user(
 async def list_users(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    database: AsyncIOMotorDatabase = Depends(database_dependency),
+    repository: UserRepository = Depends(user_repository_dependency),
 ):
-    repository = UserRepository(database)
     items, total = await repository.list_users(skip=skip, limit=limit)
     return UserListResponse(items=items, total=total)
 
 
+@router.get("/stream")
+async def stream_users(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    repository: UserRepository = Depends(user_repository_dependency),
+):
+    """Stream users as NDJSON, one line per document as it is read from Mongo."""
+    return StreamingResponse(
+        _ndjson_lines(repository.iter_users(skip=skip, limit=limit)),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.get("/{user_id}", response_model=UserPublic)
-async def get_user(user_id: str, database: AsyncIOMotorDatabase = Depends(database_dependency)):
-    repository = UserRepository(database)
+async def get_user(
+    user_id: str, repository: UserRepository = Depends(user_repository_dependency)
+):
     document = await repository.get_user(user_id)
     if not document:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
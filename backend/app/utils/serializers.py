@@ -1,13 +1,31 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Any, Mapping
 
+import orjson
 from bson import ObjectId
 from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+
+
+def utc_now() -> datetime:
+    # Timezone-aware replacement for the deprecated datetime.utcnow()
+    return datetime.now(timezone.utc)
+
+
+# The same user and session ids are parsed on every request of a chat, so
+# keep recent parses; ObjectIds are immutable and safe to share
+@lru_cache(maxsize=4096)
+def _object_id_from_str(value: str) -> ObjectId:
+    return ObjectId(value)
 
 
 def parse_object_id(value: str) -> ObjectId:
     try:
+        if isinstance(value, str):
+            return _object_id_from_str(value)
         return ObjectId(value)
     except Exception as exc:  # pragma: no cover - simple validation helper
         raise HTTPException(
@@ -21,4 +39,18 @@ def to_public_id(document: Mapping[str, Any]) -> Mapping[str, Any]:
     if "_id" in doc:
         doc["id"] = str(doc.pop("_id"))
     doc.pop("password_hash", None)
-    return doc
\ No newline at end of file
+    return doc
+
+
+def bson_default(value: Any) -> str:
+    # orjson encodes datetimes itself; this hook only sees the BSON leftovers
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class BSONResponse(ORJSONResponse):
+    """ORJSONResponse that also encodes ObjectIds, so raw Mongo documents can be returned."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
@@ -14,14 +14,15 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 from app.config import settings
 from app.utils.security import hash_password
+from app.utils.serializers import utc_now
 
 
 async def create_demo_user():
     """Create demo user in MongoDB."""
-    client = AsyncIOMotorClient(settings.mongodb_uri)
+    client = AsyncMongoClient(settings.mongodb_uri)
     db = client[settings.mongodb_db]
     users_collection = db[settings.users_collection]
     
@@ -32,20 +33,20 @@ async def create_demo_user():
     existing_user = await users_collection.find_one({"email": demo_email.lower()})
     if existing_user:
         print(f"✅ Demo user already exists: {demo_email}")
-        client.close()
+        await client.close()
         return
     
     # Create demo user
-    from datetime import datetime
     password_hash = hash_password(demo_password)
+    now = utc_now()
     
     user_doc = {
         "email": demo_email.lower(),
         "full_name": "Demo User",
         "avatar_url": None,
         "password_hash": password_hash,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
+        "created_at": now,
+        "updated_at": now,
     }
     
     result = await users_collection.insert_one(user_doc)
@@ -58,7 +59,7 @@ async def create_demo_user():
     await users_collection.create_index("email", unique=True)
     print(f"✅ Email index ensured")
     
-    client.close()
+    await client.close()
 
 
 if __name__ == "__main__":
@@ -3,13 +3,12 @@ from fastapi import APIRouter, Request, HTTPException, status, WebSocket, WebSoc
 from fastapi.responses import StreamingResponse
 from typing import Optional
 import structlog
-import asyncio
 import time
 import json
 from contextlib import asynccontextmanager
 
 from app.models import InferenceRequest, InferenceResponse, WebSocketMessage
-from app.services.cache_manager_service import CacheManager
+from app.services.cache_manager_service import get_cache_manager
 from app.services.session_manager import SessionManager
 from app.services.context_builder import ContextBuilder
 from app.services.model_orchestrator import ModelOrchestrator
@@ -23,7 +22,7 @@ logger = structlog.get_logger()
 router = APIRouter()
 
 # Service instances
-cache_manager = CacheManager()
+cache_manager = get_cache_manager()
 session_manager = SessionManager()
 context_builder = ContextBuilder()
 model_orchestrator = ModelOrchestrator()
@@ -70,48 +69,33 @@ async def chat_endpoint(
             logger.warning("Failed to load session history", session_id=session_id, error=str(e))
             messages = []
     
-    # Build context - this is needed for accurate cache key generation
-    # IMPORTANT: Build FULL context first (before truncation) for accurate cache keys
-    full_context = None
-    context = None
-    try:
-        if messages:
-            # Build full context first - use this for cache key generation
-            full_context = context_builder.build_context(messages, prompt)
-            
-            # Truncate context only for model input (after cache check)
-            # Use MAX_CONTEXT_TOKENS for input context (not max_tokens which is for response)
-            max_context_tokens = settings.MAX_CONTEXT_TOKENS
-            original_context_length = len(full_context)
-            context = context_builder.truncate_if_needed(full_context, max_context_tokens)
-            truncated_length = len(context)
-            
-            logger.info(
-                "Context built for model",
-                session_id=session_id,
-                message_count=len(messages),
-                original_length=original_context_length,
-                truncated_length=truncated_length,
-                max_context_tokens=max_context_tokens,
-                was_truncated=original_context_length != truncated_length,
-            )
-        else:
-            full_context = prompt
-            context = prompt
-            logger.debug("No message history, using prompt only", session_id=session_id)
-    except Exception as e:
-        logger.error("Failed to build context", session_id=session_id, error=str(e))
-        full_context = prompt  # Fallback to prompt only
-        context = prompt  # Fallback to prompt only
-    
-    # Check cache AFTER building full context - use FULL context (not truncated) for accurate cache key
-    # This ensures same prompt in different conversation contexts gets different cache keys
+    # Build, truncate and hash the context once - the cache key covers the
+    # FULL context (before truncation), the model gets the truncated one
+    # Use MAX_CONTEXT_TOKENS for input context (not max_tokens which is for response)
     model_config = request.config or {"temperature": request.temperature, "max_tokens": request.max_tokens}
+    max_context_tokens = settings.MAX_CONTEXT_TOKENS
+    prepared = context_builder.prepare(messages, prompt, model_config, max_context_tokens)
+    context = prepared.text
+    
+    if messages:
+        logger.info(
+            "Context built for model",
+            session_id=session_id,
+            message_count=len(messages),
+            original_length=len(prepared.full_text),
+            truncated_length=len(context),
+            max_context_tokens=max_context_tokens,
+            was_truncated=len(prepared.full_text) != len(context),
+        )
+    else:
+        logger.debug("No message history, using prompt only", session_id=session_id)
+    
+    # Same prompt in different conversation contexts gets different cache keys
     cache_result = await cache_manager.check_cache(
         prompt,
         model_config,
-        context=full_context,  # Pass FULL context (before truncation) for accurate cache key
-        messages=messages,  # Also pass messages as fallback
+        context=prepared.full_text,
+        prompt_hash=prepared.prompt_hash,
     )
     
     if cache_result:
@@ -120,7 +104,7 @@ async def chat_endpoint(
         latency_ms = (time.time() - start_time) * 1000
         
         # Process response
-        request_data = request.model_dump()
+        request_data = request.model_dump(exclude={"messages"})
         await response_handler.process_response(
             response_text,
             request_data,
@@ -202,7 +186,7 @@ async def chat_endpoint(
         )
     
     # Process response (non-blocking background tasks)
-    request_data = request.model_dump()
+    request_data = request.model_dump(exclude={"messages"})
     try:
         await response_handler.process_response(
             full_response,
@@ -211,8 +195,8 @@ async def chat_endpoint(
             latency_ms=latency_ms,
             tokens_generated=tokens_generated,
             tokens_prompt=tokens_prompt,
-            context=context,  # Pass context for cache storage
-            messages=messages,  # Pass messages for cache storage
+            context=prepared.full_text,  # Same key the lookup used
+            prompt_hash=prepared.prompt_hash,
         )
     except Exception as e:
         logger.error("Failed to process response", session_id=session_id, error=str(e))
@@ -267,48 +251,33 @@ async def chat_stream_endpoint(
                 logger.warning("Failed to load session history", session_id=session_id, error=str(e))
                 messages = []
         
-        # Build context - this is needed for accurate cache key generation
-        # IMPORTANT: Build FULL context first (before truncation) for accurate cache keys
-        full_context = None
-        context = None
-        try:
-            if messages:
-                # Build full context first - use this for cache key generation
-                full_context = context_builder.build_context(messages, prompt)
-                
-                # Truncate context only for model input (after cache check)
-                # Use MAX_CONTEXT_TOKENS for input context (not max_tokens which is for response)
-                max_context_tokens = settings.MAX_CONTEXT_TOKENS
-                original_context_length = len(full_context)
-                context = context_builder.truncate_if_needed(full_context, max_context_tokens)
-                truncated_length = len(context)
-                
-                logger.info(
-                    "Context built for model (streaming)",
-                    session_id=session_id,
-                    message_count=len(messages),
-                    original_length=original_context_length,
-                    truncated_length=truncated_length,
-                    max_context_tokens=max_context_tokens,
-                    was_truncated=original_context_length != truncated_length,
-                )
-            else:
-                full_context = prompt
-                context = prompt
-                logger.debug("No message history, using prompt only (streaming)", session_id=session_id)
-        except Exception as e:
-            logger.error("Failed to build context", session_id=session_id, error=str(e))
-            full_context = prompt  # Fallback to prompt only
-            context = prompt  # Fallback to prompt only
-        
-        # Check cache AFTER building full context - use FULL context (not truncated) for accurate cache key
-        # This ensures same prompt in different conversation contexts gets different cache keys
+        # Build, truncate and hash the context once - the cache key covers the
+        # FULL context (before truncation), the model gets the truncated one
+        # Use MAX_CONTEXT_TOKENS for input context (not max_tokens which is for response)
         model_config = request.config or {"temperature": request.temperature, "max_tokens": request.max_tokens}
+        max_context_tokens = settings.MAX_CONTEXT_TOKENS
+        prepared = context_builder.prepare(messages, prompt, model_config, max_context_tokens)
+        context = prepared.text
+        
+        if messages:
+            logger.info(
+                "Context built for model (streaming)",
+                session_id=session_id,
+                message_count=len(messages),
+                original_length=len(prepared.full_text),
+                truncated_length=len(context),
+                max_context_tokens=max_context_tokens,
+                was_truncated=len(prepared.full_text) != len(context),
+            )
+        else:
+            logger.debug("No message history, using prompt only (streaming)", session_id=session_id)
+        
+        # Same prompt in different conversation contexts gets different cache keys
         cache_result = await cache_manager.check_cache(
             prompt,
             model_config,
-            context=full_context,  # Pass FULL context (before truncation) for accurate cache key
-            messages=messages,  # Also pass messages as fallback
+            context=prepared.full_text,
+            prompt_hash=prepared.prompt_hash,
         )
         
         if cache_result:
@@ -317,7 +286,7 @@ async def chat_stream_endpoint(
             yield f"data: {json.dumps({'token': response_text, 'done': True, 'cache_hit': True, 'cache_type': cache_type})}\n\n"
             
             # Process response
-            request_data = request.model_dump()
+            request_data = request.model_dump(exclude={"messages"})
             await response_handler.process_response(
                 response_text,
                 request_data,
@@ -334,7 +303,6 @@ async def chat_stream_endpoint(
         # Generate response with streaming
         # model_config already defined above
         
-        full_response = ""
         tokens_generated = 0
         tokens_prompt = 0
         latency_ms = 0.0
@@ -369,7 +337,7 @@ async def chat_stream_endpoint(
                     yield f"data: {json.dumps({'token': '', 'done': True, 'tokens_generated': tokens_generated, 'tokens_prompt': tokens_prompt, 'latency_ms': latency_ms})}\n\n"
                     
                     # Process response (non-blocking)
-                    request_data = request.model_dump()
+                    request_data = request.model_dump(exclude={"messages"})
                     try:
                         await response_handler.process_response(
                             full_response,
@@ -378,8 +346,8 @@ async def chat_stream_endpoint(
                             latency_ms=latency_ms,
                             tokens_generated=tokens_generated,
                             tokens_prompt=tokens_prompt,
-                            context=context,  # Pass context for cache storage
-                            messages=messages,  # Pass messages for cache storage
+                            context=prepared.full_text,  # Same key the lookup used
+                            prompt_hash=prepared.prompt_hash,
                         )
                     except Exception as e:
                         logger.error("Failed to process response", session_id=session_id, error=str(e))
@@ -388,7 +356,6 @@ async def chat_stream_endpoint(
                     # Send token
                     token = chunk.get("token", "")
                     if token:
-                        full_response += token
                         yield f"data: {json.dumps({'token': token, 'done': False})}\n\n"
         
         except Exception as e:
@@ -463,7 +430,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         messages = []
                 
                 # Save user prompt to database (non-blocking, after loading history)
-                asyncio.create_task(
+                response_handler.run_in_background(
                     session_manager.save_message_to_database(
                         session_id,
                         "user",
@@ -472,34 +439,20 @@ async def websocket_endpoint(websocket: WebSocket):
                     )
                 )
                 
-                # Build context - needed for accurate cache key generation
-                # IMPORTANT: Build FULL context first (before truncation) for accurate cache keys
-                full_context = None
-                context = None
-                try:
-                    if messages:
-                        # Build full context first - use this for cache key generation
-                        full_context = context_builder.build_context(messages, prompt)
-                        
-                        # Truncate context only for model input (after cache check)
-                        max_context_tokens = settings.MAX_CONTEXT_TOKENS
-                        context = context_builder.truncate_if_needed(full_context, max_context_tokens)
-                    else:
-                        full_context = prompt
-                        context = prompt
-                except Exception as e:
-                    logger.error("Failed to build context", session_id=session_id, error=str(e))
-                    full_context = prompt  # Fallback to prompt only
-                    context = prompt  # Fallback to prompt only
+                # Build, truncate and hash the context once - the cache key covers
+                # the FULL context (before truncation), the model gets the truncated one
+                model_config = request_data.get("model_settings") or request_data.get("config")
+                prepared = context_builder.prepare(
+                    messages, prompt, model_config, settings.MAX_CONTEXT_TOKENS
+                )
+                context = prepared.text
                 
-                # Check cache AFTER building full context - use FULL context (not truncated) for accurate cache key
                 start_time = time.time()
-                model_config = request_data.get("model_settings") or request_data.get("config")
                 cache_result = await cache_manager.check_cache(
                     prompt,
                     model_config,
-                    context=full_context,  # Pass FULL context (before truncation) for accurate cache key
-                    messages=messages,  # Also pass messages as fallback
+                    context=prepared.full_text,
+                    prompt_hash=prepared.prompt_hash,
                 )
                 
                 if cache_result:
@@ -538,7 +491,6 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Context already built above for cache check
                 # model_config already defined above
                 
-                full_response = ""
                 tokens_generated = 0
                 generation_start = time.time()
                 
@@ -574,14 +526,13 @@ async def websocket_endpoint(websocket: WebSocket):
                             latency_ms=latency_ms,
                             tokens_generated=tokens_generated,
                             tokens_prompt=tokens_prompt,
-                            context=context,  # Pass context for cache storage
-                            messages=messages,  # Pass messages for cache storage
+                            context=prepared.full_text,  # Same key the lookup used
+                            prompt_hash=prepared.prompt_hash,
                         )
                     else:
                         # Send token
                         token = chunk.get("token", "")
                         if token:
-                            full_response += token
                             tokens_generated = chunk.get("tokens_generated", 0)
                             
                             await websocket.send_json({
@@ -611,7 +562,7 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass
     finally:
-        # Clean up cancellation token
+        # Release cancellation token (set tokens are pruned by the orchestrator)
         if cancellation_token:
-            cancellation_token.cancel()
+            cancellation_token.set()
 
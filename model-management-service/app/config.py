@@ -1,4 +1,5 @@
 """Configuration management for Model Management Service."""
+import logging
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -12,6 +13,11 @@ class Settings(BaseSettings):
     
     # PostgreSQL Configuration
     DATABASE_URL: str = ""  # Empty = use placeholder mode
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_PRE_PING: bool = False  # Stale connections are retried instead
+    DB_POOL_RECYCLE: int = 300  # 5 minutes
     
     # Model Server Configuration (Ollama)
     MODEL_SERVER_URL: str = "http://localhost:11434"
@@ -29,6 +35,7 @@ class Settings(BaseSettings):
     # Queue Configuration
     MAX_QUEUE_SIZE: int = 50
     QUEUE_POLL_INTERVAL: float = 0.5
+    QUEUE_WORKERS: int = 4  # Requests processed concurrently from the queue
     
     # Rate Limiting Configuration
     MAX_REQUESTS_PER_HOUR: int = 100
@@ -61,3 +68,7 @@ class Settings(BaseSettings):
 # Global settings instance
 settings = Settings()
 
+
+# Whether DEBUG records pass the log filter; hot paths check this before
+# building debug-only log arguments
+DEBUG_LOGGING: bool = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO) <= logging.DEBUG
@@ -1,30 +1,43 @@
 """FastAPI application entry point."""
 import structlog
 from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.edge import EdgeMiddleware
 from app.api import inference, metrics
 from app.services.metrics import MetricsCollector
+from app.services.model_client import close_http_client, get_http_client
 
 
 # Configure structured logging
 import logging
 log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
 
+if settings.LOG_FORMAT != "json":
+    log_renderer = structlog.dev.ConsoleRenderer()
+    log_factory = structlog.PrintLoggerFactory()
+else:
+    # orjson renders to bytes, which BytesLogger writes to stdout's buffer
+    # without a str round-trip through the text layer
+    try:
+        import orjson
+        log_renderer = structlog.processors.JSONRenderer(serializer=orjson.dumps)
+        log_factory = structlog.BytesLoggerFactory()
+    except ImportError:
+        log_renderer = structlog.processors.JSONRenderer()
+        log_factory = structlog.PrintLoggerFactory()
+
 structlog.configure(
     processors=[
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.add_log_level,
-        structlog.processors.JSONRenderer() if settings.LOG_FORMAT == "json" 
-        else structlog.dev.ConsoleRenderer(),
+        log_renderer,
     ],
     wrapper_class=structlog.make_filtering_bound_logger(log_level),
     context_class=dict,
-    logger_factory=structlog.PrintLoggerFactory(),
+    logger_factory=log_factory,
     cache_logger_on_first_use=False,
 )
 
@@ -40,6 +53,10 @@ async def lifespan(app: FastAPI):
     metrics_collector = MetricsCollector()
     app.state.metrics = metrics_collector
     
+    # Shared HTTP client for model server calls (keep-alive connection pooling);
+    # the same pool serves inference and health checks
+    app.state.http = get_http_client()
+    
     # Start queue processor
     from app.services.queue_processor import QueueProcessor
     queue_processor = QueueProcessor(metrics_collector)
@@ -52,6 +69,9 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, "queue_processor"):
         await app.state.queue_processor.stop()
     
+    # Close shared HTTP client
+    await close_http_client()
+    
     logger.info("Shutting down Model Management Service")
 
 
@@ -63,18 +83,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Add CORS middleware
-# Note: CORS middleware doesn't block WebSocket connections, but we configure it for HTTP requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Add rate limiting middleware
-app.add_middleware(RateLimitMiddleware)
+# Add CORS + rate limiting middleware (single ASGI layer)
+# Note: CORS doesn't block WebSocket connections, it only applies to HTTP requests
+# CORS allows all origins - configure appropriately for production
+app.add_middleware(EdgeMiddleware)
 
 
 # Global exception handler
@@ -99,10 +111,9 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Health check endpoint
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint."""
     from app.services.cache_manager import get_redis_client
-    from app.services.database import get_db_session
     
     health_status = {
         "status": "healthy",
@@ -137,10 +148,10 @@ async def health_check():
                 health_status["checks"]["postgresql"] = "unavailable (invalid URL format)"
                 health_status["status"] = "degraded"
             else:
-                from app.services.database import get_db_session, PlaceholderSession
+                from app.services.database import db_session, PlaceholderSession
                 from sqlalchemy import text
                 try:
-                    async for session in get_db_session():
+                    async with db_session() as session:
                         if isinstance(session, PlaceholderSession):
                             health_status["checks"]["postgresql"] = "unavailable (placeholder mode)"
                             health_status["status"] = "degraded"
@@ -156,7 +167,6 @@ async def health_check():
                             except Exception as e:
                                 health_status["checks"]["postgresql"] = f"unavailable: {str(e)}"
                                 health_status["status"] = "degraded"
-                        break
                 except Exception as e:
                     health_status["checks"]["postgresql"] = f"unavailable: {str(e)}"
                     health_status["status"] = "degraded"
@@ -166,24 +176,22 @@ async def health_check():
     
     # Check Model Server (Ollama)
     try:
-        import httpx
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            # Try /api/tags as health check for Ollama
-            response = await client.get(f"{settings.MODEL_SERVER_URL}/api/tags")
-            if response.status_code == 200:
-                # Verify model is available
-                tags_data = response.json()
-                models = tags_data.get("models", [])
-                model_names = [m.get("name", "") for m in models]
-                if settings.MODEL_NAME in model_names or any(settings.MODEL_NAME in name for name in model_names):
-                    health_status["checks"]["model_server"] = "healthy"
-                    health_status["checks"]["model_name"] = settings.MODEL_NAME
-                else:
-                    health_status["checks"]["model_server"] = f"healthy (model {settings.MODEL_NAME} not found in available models)"
-                    health_status["status"] = "degraded"
+        # Try /api/tags as health check for Ollama (reuses the pooled client)
+        response = await request.app.state.http.get("/api/tags", timeout=5.0)
+        if response.status_code == 200:
+            # Verify model is available
+            tags_data = response.json()
+            models = tags_data.get("models", [])
+            model_names = [m.get("name", "") for m in models]
+            if settings.MODEL_NAME in model_names or any(settings.MODEL_NAME in name for name in model_names):
+                health_status["checks"]["model_server"] = "healthy"
+                health_status["checks"]["model_name"] = settings.MODEL_NAME
             else:
-                health_status["checks"]["model_server"] = f"unhealthy: status {response.status_code}"
+                health_status["checks"]["model_server"] = f"healthy (model {settings.MODEL_NAME} not found in available models)"
                 health_status["status"] = "degraded"
+        else:
+            health_status["checks"]["model_server"] = f"unhealthy: status {response.status_code}"
+            health_status["status"] = "degraded"
     except Exception as e:
         health_status["checks"]["model_server"] = f"unavailable: {str(e)}"
         health_status["status"] = "degraded"
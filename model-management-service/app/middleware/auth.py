@@ -1,7 +1,9 @@
 """JWT authentication middleware."""
-from fastapi import Request, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
+import json
+import time
+from functools import lru_cache
+from fastapi.security import HTTPBearer
+from starlette.types import ASGIApp, Receive, Scope, Send
 from jose import JWTError, jwt
 import structlog
 
@@ -11,63 +13,119 @@ logger = structlog.get_logger()
 security = HTTPBearer()
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
+@lru_cache(maxsize=4096)
+def _verify_token(token: str) -> dict:
+    """
+    Verify a JWT signature and return its claims.
+    
+    Clients reuse the same bearer token across many requests, so verified
+    tokens are memoized. Failures raise and are therefore never cached.
+    """
+    return jwt.decode(
+        token,
+        settings.JWT_SECRET,
+        algorithms=[settings.JWT_ALGORITHM]
+    )
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decode a JWT, re-checking expiry for tokens served from the cache.
+    
+    Raises:
+        JWTError: If the token is invalid or expired
+    """
+    payload = _verify_token(token)
+    exp = payload.get("exp")
+    if exp is not None and exp < time.time():
+        raise JWTError("Signature has expired.")
+    return payload
+
+
+def _unauthorized_response(detail: str) -> tuple:
+    """Pre-encode a 401 response as (headers, body) for direct ASGI sends."""
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"www-authenticate", b"Bearer"),
+    ]
+    return headers, body
+
+
+class AuthMiddleware:
     """Middleware to validate JWT tokens."""
     
     # Paths that don't require authentication
     PUBLIC_PATHS = {"/health", "/", "/docs", "/openapi.json", "/redoc"}
     
-    async def dispatch(self, request: Request, call_next):
+    _MISSING_HEADER = _unauthorized_response("Missing authorization header")
+    _INVALID_FORMAT = _unauthorized_response("Invalid authorization format")
+    _INVALID_TOKEN = _unauthorized_response("Invalid or expired token")
+    
+    def __init__(self, app: ASGIApp):
+        """Initialize middleware and precompute the bearer prefix bytes."""
+        self.app = app
+        self._prefix = (settings.JWT_TOKEN_PREFIX + " ").encode("latin-1")
+        self._prefix_len = len(self._prefix)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process request and validate JWT token."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
+        
         # Skip auth for public paths
-        if request.url.path in self.PUBLIC_PATHS:
-            return await call_next(request)
+        if path in self.PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
         
         # Skip auth for WebSocket connections (handled separately)
-        if request.url.path.startswith("/ws"):
-            return await call_next(request)
+        if path.startswith("/ws"):
+            await self.app(scope, receive, send)
+            return
+        
+        # Extract token from the raw Authorization header bytes
+        authorization = None
+        for key, value in scope["headers"]:
+            if key == b"authorization":
+                authorization = value
+                break
         
-        # Extract token from Authorization header
-        authorization = request.headers.get("Authorization")
         if not authorization:
-            logger.warning("Missing authorization header", path=request.url.path)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Missing authorization header",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+            logger.warning("Missing authorization header", path=path)
+            await self._reject(send, self._MISSING_HEADER)
+            return
         
         # Extract Bearer token
-        if not authorization.startswith(settings.JWT_TOKEN_PREFIX):
-            logger.warning("Invalid authorization format", path=request.url.path)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authorization format",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        token = authorization[len(settings.JWT_TOKEN_PREFIX) + 1:].strip()
+        if not authorization.startswith(self._prefix):
+            logger.warning("Invalid authorization format", path=path)
+            await self._reject(send, self._INVALID_FORMAT)
+            return
         
         # Validate token
         try:
-            payload = jwt.decode(
-                token,
-                settings.JWT_SECRET,
-                algorithms=[settings.JWT_ALGORITHM]
-            )
-            # Attach user info to request state
-            request.state.user_id = payload.get("sub") or payload.get("user_id")
-            request.state.user_email = payload.get("email")
-            
-            logger.debug("Token validated", user_id=request.state.user_id)
-            
-        except JWTError as e:
-            logger.warning("Token validation failed", error=str(e), path=request.url.path)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid or expired token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+            token = authorization[self._prefix_len:].decode("ascii").strip()
+            payload = decode_token(token)
+        except (JWTError, UnicodeDecodeError) as e:
+            logger.warning("Token validation failed", error=str(e), path=path)
+            await self._reject(send, self._INVALID_TOKEN)
+            return
         
-        return await call_next(request)
-
+        # Attach user info to request state
+        state = scope.setdefault("state", {})
+        state["user_id"] = payload.get("sub") or payload.get("user_id")
+        state["user_email"] = payload.get("email")
+        
+        logger.debug("Token validated", user_id=state["user_id"])
+        
+        await self.app(scope, receive, send)
+    
+    @staticmethod
+    async def _reject(send: Send, response: tuple):
+        """Send a pre-encoded 401 response."""
+        headers, body = response
+        await send({"type": "http.response.start", "status": 401, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
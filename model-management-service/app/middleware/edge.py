@@ -0,0 +1,72 @@
+"""Edge middleware - CORS and rate limiting in a single ASGI layer."""
+from starlette.types import Message, Receive, Scope, Send
+
+from app.middleware.rate_limit import RateLimitMiddleware
+
+
+class EdgeMiddleware(RateLimitMiddleware):
+    """
+    Applies CORS headers and rate limiting in one pass.
+
+    Mirrors Starlette's CORSMiddleware configured with all origins, methods
+    and headers allowed and credentials enabled. Preflight requests are
+    answered directly without reaching the rate limiter or the router.
+    """
+
+    _PREFLIGHT_HEADERS = [
+        (b"content-type", b"text/plain; charset=utf-8"),
+        (b"content-length", b"2"),
+        (b"vary", b"Origin"),
+        (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+        (b"access-control-max-age", b"600"),
+        (b"access-control-allow-credentials", b"true"),
+    ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Handle CORS, then delegate to rate limiting."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        has_cookie = False
+        preflight_method = None
+        requested_headers = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = value
+            elif key == b"cookie":
+                has_cookie = True
+            elif key == b"access-control-request-method":
+                preflight_method = value
+            elif key == b"access-control-request-headers":
+                requested_headers = value
+
+        # Not a CORS request
+        if origin is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        # Preflight: static response, echoing the origin and requested headers
+        if scope["method"] == "OPTIONS" and preflight_method is not None:
+            headers = self._PREFLIGHT_HEADERS + [(b"access-control-allow-origin", origin)]
+            if requested_headers is not None:
+                headers.append((b"access-control-allow-headers", requested_headers))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b"OK"})
+            return
+
+        # Credentialed requests must get the explicit origin rather than "*"
+        cors_headers = [
+            (b"access-control-allow-origin", origin if has_cookie else b"*"),
+            (b"access-control-allow-credentials", b"true"),
+        ]
+        if has_cookie:
+            cors_headers.append((b"vary", b"Origin"))
+
+        async def send_with_cors(message: Message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), *cors_headers]}
+            await send(message)
+
+        await super().__call__(scope, receive, send_with_cors)
@@ -1,83 +1,117 @@
 """Rate limiting middleware."""
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime
+import json
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import structlog
 
-from app.config import settings
+from app.config import DEBUG_LOGGING, settings
 from app.services.cache_manager import get_redis_client
 
 logger = structlog.get_logger()
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """Middleware to enforce rate limiting per user."""
-    
+
     # Paths that don't require rate limiting
     EXCLUDED_PATHS = {"/health", "/", "/docs", "/openapi.json", "/redoc", "/api/v1/metrics"}
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        """Initialize middleware and pre-encode the static 429 response."""
+        self.app = app
+        self._limit = settings.MAX_REQUESTS_PER_HOUR
+        self._limit_header = str(self._limit)
+
+        # The rejection path is hot during a rate-limit storm, so build it once
+        self._429_body = json.dumps(
+            {"detail": f"Rate limit exceeded: {self._limit} requests per hour"}
+        ).encode("utf-8")
+        self._429_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(self._429_body)).encode("latin-1")),
+            (b"x-ratelimit-limit", self._limit_header.encode("latin-1")),
+            (b"x-ratelimit-remaining", b"0"),
+            (b"retry-after", b"3600"),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process request and check rate limits."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+
         # Skip rate limiting for excluded paths
-        if request.url.path in self.EXCLUDED_PATHS:
-            return await call_next(request)
-        
+        if path in self.EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
         # Skip rate limiting for WebSocket connections (handled separately)
-        if request.url.path.startswith("/ws"):
-            return await call_next(request)
-        
+        if path.startswith("/ws"):
+            await self.app(scope, receive, send)
+            return
+
         # Use IP address for rate limiting (no auth required)
-        user_id = request.client.host if request.client else "unknown"
-        
+        client = scope.get("client")
+        user_id = client[0] if client else "unknown"
+
         # Check rate limit
         try:
             redis_client = await get_redis_client()
             from app.services.cache_manager import PlaceholderRedis
-            
+
             # If Redis is unavailable, skip rate limiting (fail open)
             if isinstance(redis_client, PlaceholderRedis):
-                logger.debug("Redis unavailable, skipping rate limiting", user_id=user_id)
-                return await call_next(request)
-            
-            current_hour = datetime.utcnow().strftime("%Y-%m-%d-%H")
-            rate_limit_key = f"ratelimit:{user_id}:{current_hour}"
-            
-            # Increment counter
-            current_count = await redis_client.incr(rate_limit_key)
-            
-            # Set TTL if this is the first request in this hour
-            if current_count == 1:
-                await redis_client.expire(rate_limit_key, 3600)  # 1 hour
-            
-            # Check if limit exceeded
-            if current_count > settings.MAX_REQUESTS_PER_HOUR:
-                logger.warning(
-                    "Rate limit exceeded",
-                    user_id=user_id,
-                    count=current_count,
-                    limit=settings.MAX_REQUESTS_PER_HOUR,
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded: {settings.MAX_REQUESTS_PER_HOUR} requests per hour",
-                    headers={
-                        "X-RateLimit-Limit": str(settings.MAX_REQUESTS_PER_HOUR),
-                        "X-RateLimit-Remaining": str(max(0, settings.MAX_REQUESTS_PER_HOUR - current_count)),
-                        "Retry-After": "3600",
-                    },
-                )
-            
-            # Add rate limit headers to response
-            response = await call_next(request)
-            response.headers["X-RateLimit-Limit"] = str(settings.MAX_REQUESTS_PER_HOUR)
-            response.headers["X-RateLimit-Remaining"] = str(max(0, settings.MAX_REQUESTS_PER_HOUR - current_count))
-            
-            return response
-            
-        except HTTPException:
-            raise
+                if DEBUG_LOGGING:
+                    logger.debug("Redis unavailable, skipping rate limiting", user_id=user_id)
+                current_count = None
+            else:
+                # Hours since the epoch: same UTC hour buckets as a formatted
+                # date, without building a datetime per request
+                current_hour = int(time.time()) // 3600
+                rate_limit_key = f"ratelimit:{user_id}:{current_hour}"
+
+                # Increment counter
+                current_count = await redis_client.incr(rate_limit_key)
+
+                # Set TTL if this is the first request in this hour
+                if current_count == 1:
+                    await redis_client.expire(rate_limit_key, 3600)  # 1 hour
         except Exception as e:
             logger.warning("Rate limit check failed, allowing request", error=str(e))
             # On error, allow request through (fail open)
-            return await call_next(request)
+            current_count = None
+
+        if current_count is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Check if limit exceeded
+        if current_count > self._limit:
+            logger.warning(
+                "Rate limit exceeded",
+                user_id=user_id,
+                count=current_count,
+                limit=self._limit,
+            )
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": self._429_headers,
+            })
+            await send({"type": "http.response.body", "body": self._429_body})
+            return
+
+        remaining = str(self._limit - current_count)
+
+        # Add rate limit headers to response
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-RateLimit-Limit", self._limit_header)
+                headers.append("X-RateLimit-Remaining", remaining)
+            await send(message)
 
+        await self.app(scope, receive, send_with_headers)
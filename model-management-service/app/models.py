@@ -1,10 +1,15 @@
 """Pydantic models for request/response validation."""
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 
 
+def utc_now() -> datetime:
+    """Current time as a timezone-aware UTC datetime (serializes with a "Z" suffix)."""
+    return datetime.now(timezone.utc)
+
+
 class MessageRole(str, Enum):
     """Message role types."""
     SYSTEM = "system"
@@ -83,7 +88,7 @@ class InferenceResponse(BaseModel):
     cache_hit: bool = False
     cache_type: Optional[str] = None  # "l1" or "l2"
     latency_ms: float
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utc_now)
 
 
 class CacheEntry(BaseModel):
@@ -91,7 +96,7 @@ class CacheEntry(BaseModel):
     hash: str
     response: str
     embedding: Optional[List[float]] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
     ttl: int
 
 
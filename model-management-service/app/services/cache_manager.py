@@ -1,4 +1,5 @@
 """Redis connection and cache management."""
+import asyncio
 import redis.asyncio as redis
 from typing import Optional, Union
 import structlog
@@ -19,6 +20,9 @@ class PlaceholderRedis:
     async def get(self, key: str) -> None:
         return None
     
+    async def mget(self, keys: list) -> list:
+        return [None] * len(keys)
+    
     async def setex(self, key: str, time: int, value: str) -> None:
         pass
     
@@ -28,13 +32,18 @@ class PlaceholderRedis:
     async def rpop(self, key: str) -> None:
         return None
     
+    async def brpop(self, keys, timeout: float = 0) -> None:
+        # Behave like an empty queue: wait out the timeout, then report nothing
+        await asyncio.sleep(timeout)
+        return None
+    
     async def llen(self, key: str) -> int:
         return 0
     
     async def lrem(self, key: str, count: int, value: str) -> int:
         return 0
     
-    async def delete(self, key: str) -> int:
+    async def delete(self, *keys: str) -> int:
         return 0
     
     async def ping(self) -> bool:
@@ -46,9 +55,6 @@ class PlaceholderRedis:
     async def expire(self, key: str, time: int) -> bool:
         return False
     
-    async def scan_iter(self, match: str = None):
-        return iter([])
-    
     async def close(self) -> None:
         pass
 
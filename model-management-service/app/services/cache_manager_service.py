@@ -1,12 +1,20 @@
 """Cache Manager - Orchestrates L1 and L2 caches."""
-from typing import Optional, Tuple
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
 import structlog
 
+from app.config import DEBUG_LOGGING
+from app.services.context_builder import ContextBuilder
 from app.services.l1_cache import L1CacheHandler
 from app.services.l2_cache import L2CacheHandler
 
 logger = structlog.get_logger()
 
+# Process-wide cache manager instance (lazy created)
+_cache_manager: Optional[CacheManager] = None
+
 
 class CacheManager:
     """Orchestrates L1 and L2 cache operations."""
@@ -15,6 +23,7 @@ class CacheManager:
         """Initialize cache manager."""
         self.l1_cache = L1CacheHandler()
         self.l2_cache = L2CacheHandler()
+        self.context_builder = ContextBuilder()
     
     async def check_cache(
         self,
@@ -22,6 +31,7 @@ class CacheManager:
         model_config: Optional[dict] = None,
         context: Optional[str] = None,
         messages: Optional[list] = None,
+        prompt_hash: Optional[str] = None,
     ) -> Optional[Tuple[str, str]]:
         """
         Check both L1 and L2 caches for a match.
@@ -31,6 +41,7 @@ class CacheManager:
             model_config: Optional model configuration
             context: Full conversation context (for accurate cache key)
             messages: List of previous messages (if context not available)
+            prompt_hash: Precomputed L1 hash (e.g. from ContextBuilder.prepare)
             
         Returns:
             Tuple of (response, cache_type) if found, None otherwise
@@ -38,34 +49,79 @@ class CacheManager:
         """
         try:
             # Try L1 cache first (exact match) - includes context in hash
-            prompt_hash = self.l1_cache.generate_hash(prompt, model_config, context, messages)
-            l1_response = await self.l1_cache.check_exact_match(prompt_hash)
+            if prompt_hash is None:
+                prompt_hash = self.l1_cache.generate_hash(prompt, model_config, context, messages)
+            
+            # Start the L2 embedding speculatively so it overlaps the L1 round-trip
+            embedding_task = asyncio.create_task(self.l2_cache.generate_embedding(prompt))
+            try:
+                l1_response = await self.l1_cache.check_exact_match(prompt_hash)
+            except BaseException:
+                embedding_task.cancel()
+                raise
             
             if l1_response:
-                logger.debug("Cache hit: L1", hash=prompt_hash[:16], has_context=bool(context or messages))
+                embedding_task.cancel()
+                if DEBUG_LOGGING:
+                    logger.debug("Cache hit: L1", hash=prompt_hash[:16], has_context=bool(context or messages))
                 return (l1_response, "l1")
             
             # Try L2 cache (semantic similarity)
             # Note: L2 cache uses embeddings which don't capture context well
             # For now, we'll still check it but it may return incorrect results
             # TODO: Improve L2 cache to consider context
-            embedding = await self.l2_cache.generate_embedding(prompt)
+            embedding = await embedding_task
             l2_result = await self.l2_cache.find_similar(embedding)
             
             if l2_result:
                 response, similarity = l2_result
-                logger.debug("Cache hit: L2", similarity=similarity, hash=prompt_hash[:16])
+                if DEBUG_LOGGING:
+                    logger.debug("Cache hit: L2", similarity=similarity, hash=prompt_hash[:16])
                 # Warn that L2 cache doesn't consider context
                 if context or messages:
                     logger.warning("L2 cache hit but context not considered - may be inaccurate")
                 return (response, "l2")
             
-            logger.debug("Cache miss", hash=prompt_hash[:16], has_context=bool(context or messages))
+            if DEBUG_LOGGING:
+                logger.debug("Cache miss", hash=prompt_hash[:16], has_context=bool(context or messages))
             return None
         except Exception as e:
             logger.warning("Cache check failed (Redis may be unavailable)", error=str(e))
             return None
     
+    async def check_exact_many(
+        self,
+        prompts: List[str],
+        messages: Optional[list] = None,
+        model_config: Optional[dict] = None,
+    ) -> Dict[str, str]:
+        """
+        Look up several candidate prompts in L1 with one round-trip.
+        
+        Useful for prefetching likely follow-ups (retries, suggestions)
+        that share the same conversation history. Each candidate is keyed
+        exactly as a request for it would be (ContextBuilder.prepare), so
+        responses stored by the inference endpoints are found.
+        
+        Args:
+            prompts: Candidate user prompts
+            messages: Conversation history shared by the candidates
+            model_config: Optional model configuration
+            
+        Returns:
+            Mapping of prompt to cached response, for L1 hits only
+        """
+        hashes = [
+            self.context_builder.prepare(messages or [], prompt, model_config).prompt_hash
+            for prompt in prompts
+        ]
+        cached = await self.l1_cache.check_exact_match_many(hashes)
+        return {
+            prompt: cached[prompt_hash]
+            for prompt, prompt_hash in zip(prompts, hashes)
+            if cached.get(prompt_hash)
+        }
+    
     async def store_in_cache(
         self,
         prompt: str,
@@ -73,6 +129,7 @@ class CacheManager:
         model_config: Optional[dict] = None,
         context: Optional[str] = None,
         messages: Optional[list] = None,
+        prompt_hash: Optional[str] = None,
     ):
         """
         Store response in both L1 and L2 caches.
@@ -83,24 +140,55 @@ class CacheManager:
             model_config: Optional model configuration
             context: Full conversation context (for accurate cache key)
             messages: List of previous messages (if context not available)
+            prompt_hash: Precomputed L1 hash (e.g. from ContextBuilder.prepare)
         """
         try:
             # Include context in hash for accurate caching
-            prompt_hash = self.l1_cache.generate_hash(prompt, model_config, context, messages)
+            if prompt_hash is None:
+                prompt_hash = self.l1_cache.generate_hash(prompt, model_config, context, messages)
             
             # Store in L1 cache
             await self.l1_cache.store(prompt_hash, response)
             
-            # Store in L2 cache (async, don't wait)
-            # Note: L2 cache doesn't consider context, so it may cache incorrectly
-            # This is a limitation of semantic similarity caching
-            try:
-                embedding = await self.l2_cache.generate_embedding(prompt)
-                await self.l2_cache.store(embedding, response, prompt_hash)
-            except Exception as e:
-                logger.warning("Failed to store in L2 cache", error=str(e))
+            await self.store_in_l2(prompt, response, prompt_hash)
             
-            logger.debug("Response cached in L1 and L2", hash=prompt_hash[:16], has_context=bool(context or messages))
+            if DEBUG_LOGGING:
+                logger.debug("Response cached in L1 and L2", hash=prompt_hash[:16], has_context=bool(context or messages))
         except Exception as e:
             logger.warning("Failed to store in cache (Redis may be unavailable)", error=str(e))
+    
+    def queue_l1_store(self, pipe, prompt_hash: str, response: str):
+        """
+        Add the L1 store to a caller's pipeline, to share its round-trip.
+        
+        Args:
+            pipe: Redis pipeline the caller executes
+            prompt_hash: L1 hash of the prompt and context
+            response: Model response
+        """
+        self.l1_cache.queue_store(pipe, prompt_hash, response)
+    
+    async def store_in_l2(self, prompt: str, response: str, prompt_hash: str):
+        """
+        Embed the prompt and store the response in the L2 cache.
+        
+        Args:
+            prompt: User prompt
+            response: Model response
+            prompt_hash: L1 hash of the prompt (for key generation)
+        """
+        # Note: L2 cache doesn't consider context, so it may cache incorrectly
+        # This is a limitation of semantic similarity caching
+        try:
+            embedding = await self.l2_cache.generate_embedding(prompt)
+            await self.l2_cache.store(embedding, response, prompt_hash)
+        except Exception as e:
+            logger.warning("Failed to store in L2 cache", error=str(e))
+
 
+def get_cache_manager() -> CacheManager:
+    """Get or create the shared CacheManager instance."""
+    global _cache_manager
+    if _cache_manager is None:
+        _cache_manager = CacheManager()
+    return _cache_manager
@@ -1,69 +1,150 @@
 """Context building and truncation service."""
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, NamedTuple, Optional
 import structlog
 
 from app.config import settings
-from app.utils.token_counter import count_tokens, count_tokens_in_messages
+from app.services.l1_cache import L1CacheHandler
+from app.utils.token_counter import count_tokens, count_tokens_batch
 
 logger = structlog.get_logger()
 
+# Rough chars-per-token ratio used to size tokenizer windows (BPE averages ~3-4)
+_CHARS_PER_TOKEN = 4
+
+# Default system prompt to ensure accurate thinking and English responses
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful AI assistant. Think carefully and accurately before responding. "
+    "Always respond in clear, correct English. Be precise and thoughtful in your answers."
+)
+_DEFAULT_SYSTEM_LINE = "System: " + DEFAULT_SYSTEM_PROMPT
+
+# Line prefix per history role; system messages in history are skipped
+# (we already have the system prompt)
+_ROLE_PREFIX = {"user": "User: ", "assistant": "Assistant: "}
+
+
+@lru_cache(maxsize=32)
+def _count_system_tokens(system_text: str) -> int:
+    """Token count of the system prompt lines; nearly always the default."""
+    return count_tokens(system_text)
+
+
+class ContextBundle(NamedTuple):
+    """Structured context: the system line plus one formatted line per turn."""
+    system_line: str
+    turns: List[str]  # Oldest first; ends with the new prompt and "Assistant:"
+    
+    def render(self, start: int = 0) -> str:
+        """Join the system line with the turns from index ``start`` on."""
+        if not self.system_line:
+            return "\n".join(self.turns[start:])
+        return "\n".join([self.system_line, *self.turns[start:]])
+
+
+class PreparedContext(NamedTuple):
+    """Everything derived from a request's history, computed once."""
+    full_text: str  # Untruncated context (what the cache key covers)
+    text: str  # Context truncated for model input
+    prompt_hash: str  # L1 cache key hash of prompt + full_text + model config
+
 
 class ContextBuilder:
     """Builds and manages context for LLM inference."""
     
     def __init__(self):
         """Initialize context builder."""
-        pass
+        self.l1_cache = L1CacheHandler()
     
-    def build_context(
+    def prepare(
         self,
         messages: List[Dict[str, Any]],
         new_prompt: str,
-        system_prompt: Optional[str] = None,
-    ) -> str:
+        model_config: Optional[dict] = None,
+        max_tokens: int = None,
+    ) -> PreparedContext:
         """
-        Build context from messages and new prompt.
+        Build, truncate and hash the context for a request in one pass.
+        
+        The cache lookup, model call and cache store all reuse the result,
+        so the history is formatted and hashed once per request and lookup
+        and store always agree on the cache key.
         
         Args:
             messages: List of previous messages
             new_prompt: New user prompt
-            system_prompt: Optional system prompt (if not provided, uses default)
+            model_config: Optional model configuration (part of the cache key)
+            max_tokens: Maximum context tokens (defaults to config value)
             
         Returns:
-            Formatted context string
+            PreparedContext with full text, truncated text and cache hash
         """
-        context_parts = []
+        full_text = new_prompt
+        text = new_prompt
+        if messages:
+            try:
+                bundle = self.build_context_bundle(messages, new_prompt)
+                full_text = bundle.render()
+                text = self._truncate(bundle, full_text, max_tokens)
+            except Exception as e:
+                logger.error("Failed to build context", error=str(e))
+                full_text = new_prompt  # Fallback to prompt only
+                text = new_prompt
         
-        # Default system prompt to ensure accurate thinking and English responses
-        default_system_prompt = (
-            "You are a helpful AI assistant. Think carefully and accurately before responding. "
-            "Always respond in clear, correct English. Be precise and thoughtful in your answers."
-        )
+        prompt_hash = self.l1_cache.generate_hash(new_prompt, model_config, context=full_text)
+        return PreparedContext(full_text, text, prompt_hash)
+    
+    def build_context_bundle(
+        self,
+        messages: List[Dict[str, Any]],
+        new_prompt: str,
+        system_prompt: Optional[str] = None,
+    ) -> ContextBundle:
+        """
+        Build structured context from messages and new prompt.
         
+        Args:
+            messages: List of previous messages
+            new_prompt: New user prompt
+            system_prompt: Optional system prompt (if not provided, uses default)
+            
+        Returns:
+            ContextBundle with one formatted line per turn
+        """
         # Use provided system prompt or default
-        final_system_prompt = system_prompt or default_system_prompt
-        context_parts.append(f"System: {final_system_prompt}")
+        system_line = f"System: {system_prompt}" if system_prompt else _DEFAULT_SYSTEM_LINE
         
         # Add message history
+        turns = []
         for message in messages:
-            role = message.get("role", "user")
-            content = message.get("content", "")
-            # Skip system messages in history (we already have the system prompt)
-            if role == "system":
-                continue
-            elif role == "user":
-                context_parts.append(f"User: {content}")
-            elif role == "assistant":
-                context_parts.append(f"Assistant: {content}")
-        
-        # Add new prompt
-        context_parts.append(f"User: {new_prompt}")
-        
-        # Add final assistant prompt
-        context_parts.append("Assistant:")
-        
-        context = "\n".join(context_parts)
-        return context
+            prefix = _ROLE_PREFIX.get(message.get("role", "user"))
+            if prefix is not None:
+                turns.append(prefix + message.get("content", ""))
+        
+        # Add new prompt and the final assistant prompt
+        turns.append("User: " + new_prompt)
+        turns.append("Assistant:")
+        
+        return ContextBundle(system_line, turns)
+    
+    def build_context(
+        self,
+        messages: List[Dict[str, Any]],
+        new_prompt: str,
+        system_prompt: Optional[str] = None,
+    ) -> str:
+        """
+        Build context from messages and new prompt.
+        
+        Args:
+            messages: List of previous messages
+            new_prompt: New user prompt
+            system_prompt: Optional system prompt (if not provided, uses default)
+            
+        Returns:
+            Formatted context string
+        """
+        return self.build_context_bundle(messages, new_prompt, system_prompt).render()
     
     def truncate_if_needed(
         self,
@@ -82,9 +163,28 @@ class ContextBuilder:
         Returns:
             Truncated context string
         """
+        return self._truncate(None, context, max_tokens, mode)
+    
+    def _truncate(
+        self,
+        bundle: Optional[ContextBundle],
+        context: str,
+        max_tokens: int = None,
+        mode: str = None,
+    ) -> str:
+        """
+        Truncate ``context``, using its bundle when the caller has one.
+        
+        Plain strings are parsed back into a bundle line by line only if
+        truncation is actually needed.
+        """
         max_tokens = max_tokens or settings.MAX_CONTEXT_TOKENS
         mode = mode or settings.CONTEXT_TRUNCATION_MODE
         
+        # Every token covers at least one byte, so short contexts always fit
+        if len(context.encode("utf-8")) <= max_tokens:
+            return context
+        
         current_tokens = count_tokens(context)
         
         if current_tokens <= max_tokens:
@@ -97,70 +197,68 @@ class ContextBuilder:
             mode=mode,
         )
         
+        if bundle is None:
+            bundle = self._bundle_from_text(context)
+        
         if mode == "sliding_window":
-            return self._truncate_sliding_window(context, max_tokens)
+            return self._truncate_sliding_window(bundle, max_tokens)
         else:
-            return self._truncate_last_n(context, max_tokens)
+            return self._truncate_last_n(bundle, max_tokens)
+    
+    @staticmethod
+    def _bundle_from_text(context: str) -> ContextBundle:
+        """Recover a bundle from a context string, one turn per line."""
+        lines = context.split("\n")
+        
+        # Separate system prompt from conversation lines
+        system_lines = [line for line in lines if line.startswith("System:")]
+        other_lines = [line for line in lines if not line.startswith("System:")]
+        return ContextBundle("\n".join(system_lines), other_lines)
     
-    def _truncate_sliding_window(self, context: str, max_tokens: int) -> str:
+    def _truncate_sliding_window(self, bundle: ContextBundle, max_tokens: int) -> str:
         """
         Truncate using sliding window approach.
         Keeps system prompt and recent messages.
         """
-        lines = context.split("\n")
-        
-        # Find system prompt
-        system_lines = []
-        other_lines = []
-        
-        for line in lines:
-            if line.startswith("System:"):
-                system_lines.append(line)
-            else:
-                other_lines.append(line)
-        
-        # Start with system prompt
-        result_lines = system_lines.copy()
-        remaining_tokens = max_tokens - count_tokens("\n".join(system_lines))
-        
-        # Add lines from the end until we hit token limit
-        added_lines = []
-        for line in reversed(other_lines):
-            line_tokens = count_tokens(line)
-            if remaining_tokens >= line_tokens:
-                added_lines.insert(0, line)
-                remaining_tokens -= line_tokens
-            else:
-                break
-        
-        result_lines.extend(added_lines)
-        return "\n".join(result_lines)
+        return self._truncate_to_recent_turns(bundle, max_tokens)
     
-    def _truncate_last_n(self, context: str, max_tokens: int) -> str:
+    def _truncate_last_n(self, bundle: ContextBundle, max_tokens: int) -> str:
         """
         Truncate by keeping only the last N tokens.
         """
-        lines = context.split("\n")
+        return self._truncate_to_recent_turns(bundle, max_tokens)
+    
+    def _truncate_to_recent_turns(self, bundle: ContextBundle, max_tokens: int) -> str:
+        """
+        Keep the system prompt plus the longest suffix of turns that fits.
         
-        # Keep system prompt if present
-        system_lines = [line for line in lines if line.startswith("System:")]
-        other_lines = [line for line in lines if not line.startswith("System:")]
+        Only a window of recent turns sized by a chars-per-token estimate is
+        tokenized at a time, so long histories don't pay for tokenizing text
+        that will be dropped anyway. The window grows if it all fits.
+        """
+        turns = bundle.turns
+        remaining_tokens = max_tokens - _count_system_tokens(bundle.system_line)
+        
+        # Walk back from the most recent turn until the budget is exhausted
+        start = len(turns)
+        while start > 0 and remaining_tokens >= 0:
+            # Take turns from the tail up to the estimated character budget
+            # (always at least one turn)
+            window_start = start - 1
+            window_chars = len(turns[window_start])
+            char_budget = max(remaining_tokens, 1) * _CHARS_PER_TOKEN
+            while window_start > 0 and window_chars + len(turns[window_start - 1]) <= char_budget:
+                window_start -= 1
+                window_chars += len(turns[window_start])
+            
+            turn_counts = count_tokens_batch(turns[window_start:start])
+            for turn_tokens in reversed(turn_counts):
+                if turn_tokens > remaining_tokens:
+                    return bundle.render(start)
+                start -= 1
+                remaining_tokens -= turn_tokens
         
-        result_lines = system_lines.copy()
-        remaining_tokens = max_tokens - count_tokens("\n".join(system_lines))
-        
-        # Add lines from the end
-        added_lines = []
-        for line in reversed(other_lines):
-            line_tokens = count_tokens(line)
-            if remaining_tokens >= line_tokens:
-                added_lines.insert(0, line)
-                remaining_tokens -= line_tokens
-            else:
-                break
-        
-        result_lines.extend(added_lines)
-        return "\n".join(result_lines)
+        return bundle.render(start)
     
     def format_for_model(self, context: str) -> str:
         """
@@ -1,4 +1,6 @@
 """Database connection utilities."""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from typing import AsyncGenerator, Optional
@@ -12,33 +14,41 @@ logger = structlog.get_logger()
 engine: Optional[object] = None
 AsyncSessionLocal: Optional[async_sessionmaker] = None
 
+# Set once initialization has run, whether or not it produced an engine
+_engine_ready = False
+
+# Session bound to the current task while a get_db_session() scope is open
+_session_ctx: ContextVar[Optional[AsyncSession]] = ContextVar("db_session", default=None)
+
 # Base class for models
 Base = declarative_base()
 
 
+async def _noop(*args, **kwargs):
+    return None
+
+
 class PlaceholderSession:
     """Placeholder database session for when DB is unavailable."""
     
-    async def execute(self, *args, **kwargs):
-        return None
-    
-    async def commit(self):
-        pass
-    
-    async def rollback(self):
-        pass
-    
-    async def close(self):
-        pass
+    execute = commit = rollback = close = _noop
+
+
+# Stateless, so one instance serves every degraded-mode request
+_PLACEHOLDER_SESSION = PlaceholderSession()
 
 
 def _init_db_engine():
     """Initialize database engine with error handling - non-blocking."""
-    global engine, AsyncSessionLocal
+    global engine, AsyncSessionLocal, _engine_ready
     
-    if engine is not None:
+    if _engine_ready:
         return
     
+    # Synchronous, so concurrent first requests can't interleave here.
+    # Placeholder mode is also settled once instead of re-checked per call.
+    _engine_ready = True
+    
     # If DATABASE_URL is empty or invalid, use placeholder mode
     db_url = settings.DATABASE_URL.strip() if settings.DATABASE_URL else ""
     if not db_url or db_url == "":
@@ -56,16 +66,21 @@ def _init_db_engine():
     
     try:
         # Create engine with connection pool that doesn't validate on creation
-        # Use connect_args to prevent immediate connection
+        # (connections are opened lazily on first checkout)
         engine = create_async_engine(
             db_url,
             echo=False,
-            pool_pre_ping=False,  # Disable pre-ping to avoid connection attempts
-            pool_size=1,  # Minimal pool
-            max_overflow=0,  # No overflow to prevent extra connections
-            pool_timeout=1,  # Short timeout
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
             connect_args={
-                "server_settings": {"application_name": "model_management"},
+                "server_settings": {
+                    "application_name": "model_management",
+                    # Keep idle pooled connections alive instead of pinging on checkout
+                    "tcp_keepalives_idle": "30",
+                },
                 "command_timeout": 1,  # Connection timeout
             },
             # Prevent connection on engine creation
@@ -88,21 +103,34 @@ async def get_db_session() -> AsyncGenerator[Optional[AsyncSession], None]:
     """
     Get database session with graceful fallback.
     
+    Calls made while a session is already open in the current context
+    (e.g. inside ``async with db_session():``) share that session instead
+    of checking out another connection; the outermost scope commits.
+    
     Yields:
         AsyncSession instance or PlaceholderSession if DB unavailable
     """
-    _init_db_engine()
+    current = _session_ctx.get()
+    if current is not None:
+        yield current
+        return
     
-    if AsyncSessionLocal is None:
-        logger.debug("Database unavailable, using placeholder mode")
-        yield PlaceholderSession()
+    if not _engine_ready:
+        _init_db_engine()
+    
+    session_factory = AsyncSessionLocal
+    if session_factory is None:
+        yield _PLACEHOLDER_SESSION
         return
     
+    yielded = False
     try:
-        async with AsyncSessionLocal() as session:
+        async with session_factory() as session:
+            token = _session_ctx.set(session)
             try:
                 # Don't test connection here - just yield the session
                 # Connection will be tested when actually used
+                yielded = True
                 yield session
                 # Only commit if no exception occurred
                 try:
@@ -120,11 +148,22 @@ async def get_db_session() -> AsyncGenerator[Optional[AsyncSession], None]:
                 # Don't yield placeholder here - let the exception propagate
                 raise
             finally:
+                try:
+                    _session_ctx.reset(token)
+                except ValueError:
+                    # Generator finalized from another context (abandoned loop)
+                    pass
                 try:
                     await session.close()
                 except Exception as close_error:
                     logger.warning("Database close failed", error=str(close_error))
     except Exception as e:
+        if yielded:
+            raise
         logger.warning("Database connection failed, using placeholder", error=str(e))
-        yield PlaceholderSession()
+        yield _PLACEHOLDER_SESSION
+
+
+# Scoped form of get_db_session() with deterministic cleanup
+db_session = asynccontextmanager(get_db_session)
 
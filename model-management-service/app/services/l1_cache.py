@@ -1,14 +1,41 @@
 """L1 Cache Handler - Exact match caching."""
 import hashlib
 import json
-from typing import Optional, Dict, Any
+import struct
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
 import structlog
 
-from app.config import settings
+from app.config import DEBUG_LOGGING, settings
 from app.services.cache_manager import get_redis_client
 
 logger = structlog.get_logger()
 
+# BLAKE3 is SIMD-accelerated; fall back to SHA-256 when it isn't installed.
+# Both produce 64-char hex digests, so cache key length is unchanged.
+try:
+    from blake3 import blake3 as _hasher
+except ImportError:
+    _hasher = hashlib.sha256
+
+
+@lru_cache(maxsize=256)
+def _digest(prompt: str, context: str, model_config_key: str) -> str:
+    """
+    Hash the cache key components with a length-prefixed encoding.
+    
+    Each part is fed to the hasher as a 4-byte length followed by its UTF-8
+    bytes, so no JSON document is built around the (potentially large)
+    context. Memoized because the same request is hashed on lookup and
+    again when the response is stored.
+    """
+    hash_obj = _hasher()
+    for part in (prompt, context, model_config_key):
+        data = part.encode("utf-8")
+        hash_obj.update(struct.pack("<I", len(data)))
+        hash_obj.update(data)
+    return hash_obj.hexdigest()
+
 
 class L1CacheHandler:
     """Handles L1 cache (exact match) operations."""
@@ -25,7 +52,7 @@ class L1CacheHandler:
         messages: Optional[list] = None,
     ) -> str:
         """
-        Generate SHA256 hash for prompt, context, and model config.
+        Generate hash (BLAKE3, or SHA256 fallback) for prompt, context, and model config.
         
         Args:
             prompt: User prompt
@@ -34,7 +61,7 @@ class L1CacheHandler:
             messages: List of previous messages (if context not available)
             
         Returns:
-            SHA256 hash string
+            64-character hex digest
         """
         # Build context string if not provided
         if context is None and messages:
@@ -61,16 +88,10 @@ class L1CacheHandler:
         # Normalize context: if empty string, use empty; otherwise use as-is
         context_str = context if context else ""
         
-        hash_input = {
-            "prompt": prompt,
-            "context": context_str,  # Include FULL context in hash for accurate caching
-            "model_config": model_config or {},
-        }
+        # Model config is small; serialize it canonically so key order doesn't matter
+        model_config_key = json.dumps(model_config or {}, sort_keys=True)
         
-        # Convert to JSON string and hash
-        hash_string = json.dumps(hash_input, sort_keys=True)
-        hash_obj = hashlib.sha256(hash_string.encode('utf-8'))
-        return hash_obj.hexdigest()
+        return _digest(prompt, context_str, model_config_key)
     
     async def check_exact_match(self, hash: str) -> Optional[str]:
         """
@@ -87,16 +108,54 @@ class L1CacheHandler:
         
         try:
             cached_response = await redis_client.get(cache_key)
-            if cached_response:
-                logger.debug("L1 cache hit", hash=hash[:16])
-                return cached_response
-            else:
-                logger.debug("L1 cache miss", hash=hash[:16])
-                return None
+            if DEBUG_LOGGING:
+                logger.debug("L1 cache hit" if cached_response else "L1 cache miss", hash=hash[:16])
+            return cached_response or None
         except Exception as e:
             logger.error("L1 cache check failed", hash=hash[:16], error=str(e))
             return None
     
+    async def check_exact_match_many(self, hashes: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Check several hashes with a single MGET round-trip.
+        
+        Args:
+            hashes: Prompt hashes
+            
+        Returns:
+            Mapping of each hash to its cached response (None on miss)
+        """
+        if not hashes:
+            return {}
+        
+        redis_client = await get_redis_client()
+        cache_keys = [f"cache:exact:{hash}" for hash in hashes]
+        
+        try:
+            cached_responses = await redis_client.mget(cache_keys)
+            if DEBUG_LOGGING:
+                logger.debug(
+                    "L1 batch lookup",
+                    requested=len(hashes),
+                    hits=sum(1 for response in cached_responses if response),
+                )
+            return {hash: response or None for hash, response in zip(hashes, cached_responses)}
+        except Exception as e:
+            logger.error("L1 batch cache check failed", count=len(hashes), error=str(e))
+            return dict.fromkeys(hashes)
+    
+    def queue_store(self, pipe, hash: str, response: str, ttl: int = None):
+        """
+        Add an L1 store to a pipeline; the caller executes it.
+        
+        Args:
+            pipe: Redis pipeline to add the write to
+            hash: Prompt hash
+            response: Model response
+            ttl: Time to live in seconds (defaults to config value)
+        """
+        pipe.setex(f"cache:exact:{hash}", ttl or settings.L1_CACHE_TTL, response)
+    
     async def store(self, hash: str, response: str, ttl: int = None):
         """
         Store response in L1 cache.
@@ -112,7 +171,8 @@ class L1CacheHandler:
         
         try:
             await redis_client.setex(cache_key, ttl, response)
-            logger.debug("L1 cache stored", hash=hash[:16], ttl=ttl)
+            if DEBUG_LOGGING:
+                logger.debug("L1 cache stored", hash=hash[:16], ttl=ttl)
         except Exception as e:
             logger.error("L1 cache store failed", hash=hash[:16], error=str(e))
 
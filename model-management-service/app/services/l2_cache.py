@@ -1,138 +1,457 @@
-"""L2 Cache Handler - Semantic similarity caching."""
-import json
-from typing import List, Optional, Dict, Any, Tuple
+"""
+L2 Cache Handler - Semantic similarity caching.
+
+Each entry is a Redis hash at ``cache:l2:<prompt_hash>`` with the fields
+``embedding`` (raw unit-length float32 bytes, read with np.frombuffer),
+``embedding_q`` (the same vector as a float32 scale plus int8 values, a
+quarter of the size, read by the brute-force scan) and ``response`` (the
+cached text). No JSON is involved on the L2 path.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import structlog
+from redis.client import NEVER_DECODE
 
-from app.config import settings
-from app.services.cache_manager import get_redis_client
-from app.utils.embeddings import generate_embedding, cosine_similarity
+from app.config import DEBUG_LOGGING, settings
+from app.services.cache_manager import get_redis_client, PlaceholderRedis
+from app.utils.embeddings import EMBEDDING_DIMENSION, cosine_similarity_batch, get_embedding_batcher
 
 logger = structlog.get_logger()
 
+# In-process HNSW index for plain Redis deployments (no RediSearch);
+# without it lookups fall back to a brute-force scan.
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# SIMD int8 cosine kernels for the brute-force scan; numpy otherwise
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+L2_KEY_PREFIX = "cache:l2:"
+L2_INDEX_NAME = "idx:cache:l2"
+# Sorted set of L2 keys scored by expiry time, used by the scan fallback
+L2_KEYS_ZSET = "cache:l2:index"
+EMBEDDING_BYTES = EMBEDDING_DIMENSION * 4  # float32
+QUANTIZED_BYTES = 4 + EMBEDDING_DIMENSION  # float32 scale + int8 values
+# Scan fallback: approximate candidates reranked exactly, and the slack
+# allowed for int8 error when deciding which candidates could still pass
+_RERANK_CANDIDATES = 8
+_QUANTIZATION_MARGIN = 0.02
+# A candidate this similar is taken as-is: only it is reranked
+_EARLY_EXIT_SIMILARITY = 0.98
+# Recently embedded prompts kept in-process; a prompt is embedded for the
+# lookup and again for the store, and recurs across conversations
+_EMBEDDING_MEMO_SIZE = 1024
+# Scans at least this large are scored on a worker thread (BLAS and SimSIMD
+# release the GIL); smaller ones are cheaper than the thread hand-off
+_THREADED_SCAN_MIN = 4096
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    """Return the embedding as a unit-length float32 vector."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _quantize(vector: np.ndarray) -> bytes:
+    """Encode a float32 vector as its float32 scale followed by int8 values."""
+    scale = float(np.max(np.abs(vector))) / 127 or 1.0
+    values = np.round(vector / scale).astype(np.int8)
+    return np.float32(scale).tobytes() + values.tobytes()
+
+
+def _dequantize(raw_vectors: List[bytes]) -> np.ndarray:
+    """Decode quantized vectors into an (N, D) float32 matrix."""
+    rows = np.frombuffer(b"".join(raw_vectors), dtype=np.uint8)
+    rows = rows.reshape(len(raw_vectors), QUANTIZED_BYTES)
+    scales = rows[:, :4].copy().view(np.float32)
+    values = rows[:, 4:].view(np.int8).astype(np.float32)
+    return values * scales
+
+
+def _approximate_similarities(raw_vectors: List[bytes], query: np.ndarray) -> np.ndarray:
+    """Approximate cosine similarity of each quantized vector to the query."""
+    if simsimd is None:
+        return _dequantize(raw_vectors) @ query
+    
+    # Cosine is scale-invariant, so the int8 values are compared directly
+    rows = np.frombuffer(b"".join(raw_vectors), dtype=np.uint8)
+    rows = rows.reshape(len(raw_vectors), QUANTIZED_BYTES)
+    values = np.ascontiguousarray(rows[:, 4:]).view(np.int8)
+    query_values = np.frombuffer(_quantize(query), dtype=np.int8)[4:]
+    distances = np.asarray(simsimd.cdist(query_values[np.newaxis], values, metric="cosine"))
+    return 1.0 - distances[0]
+
+
+class _LocalVectorIndex:
+    """hnswlib index over L2 embeddings, labelled by prompt hash prefix."""
+    
+    def __init__(self, capacity: int = 1024):
+        """Create an empty inner-product index (vectors are unit length)."""
+        self._index = hnswlib.Index(space="ip", dim=EMBEDDING_DIMENSION)
+        self._index.init_index(max_elements=capacity, ef_construction=200, M=16)
+        self._index.set_ef(64)
+        self._hashes: Dict[int, str] = {}
+    
+    def add(self, prompt_hash: str, vector: np.ndarray):
+        """Insert or replace the vector for a prompt hash."""
+        label = int(prompt_hash[:16], 16)
+        # Deleted labels still occupy slots, so size by the index's own count
+        if self._index.get_current_count() >= self._index.get_max_elements():
+            self._index.resize_index(2 * self._index.get_max_elements())
+        self._index.add_items(vector[np.newaxis], [label])
+        self._hashes[label] = prompt_hash
+    
+    def remove(self, prompt_hash: str):
+        """Drop a prompt hash whose Redis entry has expired."""
+        label = int(prompt_hash[:16], 16)
+        if self._hashes.pop(label, None) is not None:
+            self._index.mark_deleted(label)
+    
+    def query(self, vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (prompt_hash, similarity) pairs, best first."""
+        k = min(k, len(self._hashes))
+        if k == 0:
+            return []
+        labels, distances = self._index.knn_query(vector, k=k)
+        # Inner-product distance is 1 - dot product
+        return [
+            (self._hashes[int(label)], 1.0 - float(distance))
+            for label, distance in zip(labels[0], distances[0])
+        ]
+
 
 class L2CacheHandler:
     """Handles L2 cache (semantic similarity) operations."""
-    
+
     def __init__(self):
         """Initialize L2 cache handler."""
-        pass
-    
-    async def generate_embedding(self, text: str) -> List[float]:
+        # Whether Redis has a vector index (RediSearch); None until probed
+        self._vector_index: Optional[bool] = None
+        # In-process index used instead when RediSearch is missing; built
+        # from Redis on first lookup, then kept current by store()
+        self._local_index: Optional[_LocalVectorIndex] = None
+        # Prompt text -> embedding, least recently used first
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding vector for text.
-        
+
         Args:
             text: Input text
-            
+
         Returns:
-            Embedding vector
+            Embedding vector (float32)
         """
-        return generate_embedding(text)
-    
+        # Exact repeats skip the model: L1 keys include the conversation, so
+        # an L1 miss doesn't mean this prompt text hasn't been embedded
+        embedding = self._embeddings.get(text)
+        if embedding is not None:
+            self._embeddings.move_to_end(text)
+            return embedding
+
+        # Batched with concurrent requests and run on a worker thread, so the
+        # model isn't called once per request on the event loop
+        embedding = await get_embedding_batcher().embed(text)
+        embedding.setflags(write=False)  # shared by every caller of this text
+        self._embeddings[text] = embedding
+        if len(self._embeddings) > _EMBEDDING_MEMO_SIZE:
+            self._embeddings.popitem(last=False)
+        return embedding
+
+    async def _has_vector_index(self, redis_client) -> bool:
+        """
+        Create the HNSW vector index on first use if RediSearch is available.
+
+        Plain Redis (no search module) rejects FT.CREATE, in which case
+        lookups fall back to a brute-force scan.
+        """
+        if self._vector_index is not None:
+            return self._vector_index
+
+        try:
+            await redis_client.execute_command(
+                "FT.CREATE", L2_INDEX_NAME,
+                "ON", "HASH",
+                "PREFIX", "1", L2_KEY_PREFIX,
+                "SCHEMA", "embedding", "VECTOR", "HNSW", "6",
+                "TYPE", "FLOAT32",
+                "DIM", str(EMBEDDING_DIMENSION),
+                "DISTANCE_METRIC", "COSINE",
+            )
+            self._vector_index = True
+            logger.info("L2 vector index created", index=L2_INDEX_NAME)
+        except Exception as e:
+            if "already exists" in str(e).lower():
+                self._vector_index = True
+            else:
+                self._vector_index = False
+                logger.info("L2 vector index unavailable, using brute-force scan", error=str(e))
+
+        return self._vector_index
+
     async def find_similar(
         self,
-        embedding: List[float],
+        embedding: np.ndarray,
         threshold: float = None,
     ) -> Optional[Tuple[str, float]]:
         """
         Find similar cached response using cosine similarity.
-        
+
         Args:
             embedding: Query embedding vector
             threshold: Similarity threshold (defaults to config value)
-            
+
         Returns:
             Tuple of (cached_response, similarity_score) if found, None otherwise
         """
         threshold = threshold or settings.CACHE_SIMILARITY_THRESHOLD
         redis_client = await get_redis_client()
-        
+        if isinstance(redis_client, PlaceholderRedis):
+            return None
+
         try:
-            # Get all L2 cache keys
-            pattern = "cache:l2:*"
-            keys = []
-            # redis_client.scan_iter returns an async iterator, so we can use async for
-            # However, if redis_client is not an async client, this would fail.
-            # Assuming redis_client is from aioredis or redis.asyncio
-            
-            # Fix: Ensure we are using the async iterator correctly
-            # The error "'async for' requires an object with __aiter__ method, got coroutine"
-            # suggests that scan_iter might be a coroutine itself in some versions or wrappers?
-            # Or maybe get_redis_client() returns a wrapper?
-            
-            # Let's check how scan_iter is called. 
-            # In redis-py 5.x (async), scan_iter is an async generator.
-            
-            # If the error says "got coroutine", it means something we are iterating over IS a coroutine.
-            # Maybe redis_client.scan_iter(match=pattern) is NOT a coroutine but returns an async iterator.
-            # Wait, if it says "got coroutine", maybe we are doing `async for key in await func()`?
-            # No, the code was `async for key in redis_client.scan_iter(match=pattern):`
-            
-            # If redis_client.scan_iter IS a coroutine (returns a future), then we should await it?
-            # But scan_iter usually returns an iterator.
-            
-            # Let's try to use keys() instead for simplicity if scan_iter is problematic, 
-            # though keys() is blocking/heavy. But for L2 cache with limited keys it might be ok for now.
-            # Better: Let's look at the error again.
-            # "async for' requires an object with __aiter__ method, got coroutine"
-            
-            # This implies `redis_client.scan_iter(match=pattern)` returned a coroutine object.
-            # This happens if `scan_iter` is defined as `async def scan_iter(...)`.
-            # If so, we need to await it? `async for key in await redis_client.scan_iter(...)`?
-            # But `async for` expects an async iterator.
-            
-            # Let's try a safer approach using `keys` for now to fix the immediate crash, 
-            # as we likely don't have millions of keys yet.
-            
-            keys = await redis_client.keys(pattern)
-            
-            best_match = None
-            best_similarity = 0.0
-            
-            # Compare with each cached embedding
-            for key in keys:
-                try:
-                    cached_data = await redis_client.get(key)
-                    if cached_data:
-                        data = json.loads(cached_data)
-                        cached_embedding = data.get("embedding")
-                        cached_response = data.get("response")
-                        
-                        if cached_embedding and cached_response:
-                            similarity = cosine_similarity(embedding, cached_embedding)
-                            
-                            if similarity > best_similarity and similarity >= threshold:
-                                best_similarity = similarity
-                                best_match = (cached_response, similarity)
-                except Exception as e:
-                    logger.warning("Failed to process L2 cache entry", key=key, error=str(e))
-                    continue
-            
-            if best_match:
+            if await self._has_vector_index(redis_client):
+                best_match = await self._knn_search(redis_client, embedding)
+            elif hnswlib is not None:
+                best_match = await self._local_search(redis_client, embedding, threshold)
+            else:
+                best_match = await self._scan_search(redis_client, embedding, threshold)
+
+            if best_match and best_match[1] >= threshold:
                 logger.debug(
                     "L2 cache hit",
-                    similarity=best_similarity,
+                    similarity=best_match[1],
                     threshold=threshold,
                 )
                 return best_match
             else:
                 logger.debug("L2 cache miss", threshold=threshold)
                 return None
-                
+
         except Exception as e:
             logger.error("L2 cache search failed", error=str(e))
             return None
+
+    async def _knn_search(
+        self,
+        redis_client,
+        embedding: np.ndarray,
+    ) -> Optional[Tuple[str, float]]:
+        """Find the nearest cached entry with a single FT.SEARCH KNN query."""
+        query_vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        result = await redis_client.execute_command(
+            "FT.SEARCH", L2_INDEX_NAME,
+            "*=>[KNN 1 @embedding $vec AS distance]",
+            "PARAMS", "2", "vec", query_vector,
+            "SORTBY", "distance",
+            "RETURN", "2", "response", "distance",
+            "DIALECT", "2",
+        )
+
+        # Reply: [total, key, [field, value, ...], ...]
+        if not result or result[0] == 0:
+            return None
+
+        fields = dict(zip(result[2][::2], result[2][1::2]))
+        response = fields.get("response")
+        if not response:
+            return None
+
+        # COSINE distance is 1 - cosine similarity
+        return (response, 1.0 - float(fields["distance"]))
+
+    async def _local_search(
+        self,
+        redis_client,
+        embedding: np.ndarray,
+        threshold: float,
+    ) -> Optional[Tuple[str, float]]:
+        """Find the nearest entry with the in-process HNSW index."""
+        if self._local_index is None:
+            local_index = _LocalVectorIndex()
+            keys, raw_embeddings = await self._fetch_embeddings(redis_client)
+            for key, raw_embedding in zip(keys, raw_embeddings):
+                local_index.add(
+                    key[len(L2_KEY_PREFIX):],
+                    np.frombuffer(raw_embedding, dtype=np.float32),
+                )
+            self._local_index = local_index
+            logger.info("L2 local vector index built", entries=len(keys))
+        
+        # A few candidates, since the best may have expired in Redis; only
+        # those that would pass the threshold are worth fetching
+        candidates = [
+            candidate
+            for candidate in self._local_index.query(_normalize(embedding), k=4)
+            if candidate[1] >= threshold
+        ]
+        if not candidates:
+            return None
+        
+        pipe = redis_client.pipeline(transaction=False)
+        for prompt_hash, _ in candidates:
+            pipe.hget(f"{L2_KEY_PREFIX}{prompt_hash}", "response")
+        responses = await pipe.execute()
+        
+        stale_keys = []
+        best_match = None
+        for (prompt_hash, similarity), response in zip(candidates, responses):
+            if response:
+                best_match = (response, similarity)
+                break
+            self._local_index.remove(prompt_hash)
+            stale_keys.append(f"{L2_KEY_PREFIX}{prompt_hash}")
+        await self._forget(redis_client, stale_keys)
+        return best_match
     
+    async def _live_keys(self, redis_client) -> List[str]:
+        """Return every unexpired L2 key from the expiry-scored key set."""
+        # Drop index members whose entries have expired, then read the rest.
+        # Both run in one round-trip and never walk the whole keyspace.
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zremrangebyscore(L2_KEYS_ZSET, "-inf", time.time())
+        pipe.zrange(L2_KEYS_ZSET, 0, -1)
+        _, keys = await pipe.execute()
+        return keys
+
+    async def _hget_raw(self, redis_client, keys: List[str], field: str) -> List[Optional[bytes]]:
+        """Fetch one binary field from many hashes in a single round-trip."""
+        if not keys:
+            return []
+        # Raw bytes, so skip response decoding
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.execute_command("HGET", key, field, **{NEVER_DECODE: True})
+        results = await pipe.execute(raise_on_error=False)
+
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.warning("Failed to process L2 cache entry", key=keys[i], error=str(result))
+                results[i] = None
+        return results
+
+    async def _forget(self, redis_client, keys: List[str]):
+        """Drop keys that no longer exist (evicted before expiry) from the key set."""
+        if keys:
+            await redis_client.zrem(L2_KEYS_ZSET, *keys)
+            if DEBUG_LOGGING:
+                logger.debug("L2 evicted keys dropped from index", count=len(keys))
+
+    async def _fetch_embeddings(self, redis_client) -> Tuple[List[str], List[bytes]]:
+        """Read every live L2 key and its raw float32 embedding bytes."""
+        keys = await self._live_keys(redis_client)
+        results = await self._hget_raw(redis_client, keys, "embedding")
+        pairs = [
+            (key, raw) for key, raw in zip(keys, results)
+            if raw and len(raw) == EMBEDDING_BYTES
+        ]
+        await self._forget(redis_client, [key for key, raw in zip(keys, results) if raw is None])
+        return [key for key, _ in pairs], [raw for _, raw in pairs]
+
+    async def _fetch_quantized(self, redis_client) -> Tuple[List[str], List[bytes]]:
+        """Read every live L2 key and its int8-quantized embedding bytes."""
+        keys = await self._live_keys(redis_client)
+        results = await self._hget_raw(redis_client, keys, "embedding_q")
+
+        # Entries written before quantized copies existed: quantize locally,
+        # and write the copy back so later scans only read the int8 bytes
+        missing = [i for i, raw in enumerate(results) if not raw or len(raw) != QUANTIZED_BYTES]
+        if missing:
+            legacy = await self._hget_raw(redis_client, [keys[i] for i in missing], "embedding")
+            backfill = redis_client.pipeline(transaction=False)
+            for i, raw in zip(missing, legacy):
+                if raw and len(raw) == EMBEDDING_BYTES:
+                    results[i] = _quantize(np.frombuffer(raw, dtype=np.float32))
+                    backfill.hset(keys[i], "embedding_q", results[i])
+                else:
+                    results[i] = None
+            if len(backfill):
+                await backfill.execute(raise_on_error=False)
+
+        pairs = [(key, raw) for key, raw in zip(keys, results) if raw]
+        await self._forget(redis_client, [key for key, raw in zip(keys, results) if raw is None])
+        return [key for key, _ in pairs], [raw for _, raw in pairs]
+
+    async def _scan_search(
+        self,
+        redis_client,
+        embedding: np.ndarray,
+        threshold: float,
+    ) -> Optional[Tuple[str, float]]:
+        """Compare against every cached embedding (no vector index available)."""
+        candidate_keys, raw_embeddings = await self._fetch_quantized(redis_client)
+        if not candidate_keys:
+            return None
+
+        # Score every int8 copy in one call
+        query = _normalize(embedding)
+        if len(raw_embeddings) >= _THREADED_SCAN_MIN:
+            approx = await asyncio.to_thread(_approximate_similarities, raw_embeddings, query)
+        else:
+            approx = _approximate_similarities(raw_embeddings, query)
+
+        # Rerank the few candidates that could pass with their exact float32
+        # vectors; quantization error on unit vectors is well under the margin
+        k = min(_RERANK_CANDIDATES, len(candidate_keys))
+        top = np.argpartition(-approx, k - 1)[:k]
+        top = sorted(
+            (int(i) for i in top if approx[i] >= threshold - _QUANTIZATION_MARGIN),
+            key=lambda i: -approx[i],
+        )
+        if not top:
+            return None
+        # Near-duplicate of the query: nothing else can meaningfully beat it,
+        # so skip fetching the other candidates' vectors. Compared on the
+        # approximate score alone (adding the margin would demand > 1.0 once
+        # int8 error is counted); the exact rerank below still applies
+        if approx[top[0]] >= _EARLY_EXIT_SIMILARITY:
+            top = top[:1]
+
+        pipe = redis_client.pipeline(transaction=False)
+        for i in top:
+            pipe.execute_command(
+                "HMGET", candidate_keys[i], "embedding", "response", **{NEVER_DECODE: True}
+            )
+        results = await pipe.execute(raise_on_error=False)
+
+        candidates = [
+            result for result in results
+            if not isinstance(result, Exception)
+            and result[1] and result[0] and len(result[0]) == EMBEDDING_BYTES
+        ]
+        if not candidates:
+            return None
+
+        # Score the surviving candidates in one matrix-vector product
+        matrix = np.frombuffer(
+            b"".join(raw_embedding for raw_embedding, _ in candidates), dtype=np.float32
+        ).reshape(len(candidates), EMBEDDING_DIMENSION)
+        similarities = cosine_similarity_batch(query, matrix, normalized=True)
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        return candidates[best][1].decode("utf-8"), float(similarities[best])
+
     async def store(
         self,
-        embedding: List[float],
+        embedding: np.ndarray,
         response: str,
         prompt_hash: str,
         ttl: int = None,
     ):
         """
         Store response with embedding in L2 cache.
-        
+
         Args:
             embedding: Embedding vector
             response: Model response
@@ -141,16 +460,30 @@ class L2CacheHandler:
         """
         ttl = ttl or settings.L2_CACHE_TTL
         redis_client = await get_redis_client()
-        cache_key = f"cache:l2:{prompt_hash}"
-        
+        if isinstance(redis_client, PlaceholderRedis):
+            return
+
+        cache_key = f"{L2_KEY_PREFIX}{prompt_hash}"
+
         try:
-            cache_data = {
-                "embedding": embedding,
-                "response": response,
-            }
-            cache_json = json.dumps(cache_data)
-            await redis_client.setex(cache_key, ttl, cache_json)
-            logger.debug("L2 cache stored", hash=prompt_hash[:16], ttl=ttl)
+            # Stored as a hash with raw unit-length float32 bytes so RediSearch
+            # can index it and the scan fallback can use plain dot products
+            vector = _normalize(embedding)
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.hset(
+                cache_key,
+                mapping={
+                    "embedding": vector.tobytes(),
+                    "embedding_q": _quantize(vector),
+                    "response": response,
+                },
+            )
+            pipe.expire(cache_key, ttl)
+            pipe.zadd(L2_KEYS_ZSET, {cache_key: time.time() + ttl})
+            await pipe.execute()
+            if self._local_index is not None:
+                self._local_index.add(prompt_hash, vector)
+            if DEBUG_LOGGING:
+                logger.debug("L2 cache stored", hash=prompt_hash[:16], ttl=ttl)
         except Exception as e:
             logger.error("L2 cache store failed", hash=prompt_hash[:16], error=str(e))
-
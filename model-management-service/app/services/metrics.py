@@ -1,22 +1,36 @@
 """Metrics collection service."""
-from typing import Dict, Any
-from collections import defaultdict
+import time
+from typing import Deque, Dict, Any
+from collections import defaultdict, deque
 import structlog
-from datetime import datetime, timedelta
+
+from app.services.queue_manager import RequestQueue
 
 logger = structlog.get_logger()
 
+# How long a fetched queue length is reused, so frequent metrics scrapes
+# don't each cost a Redis LLEN
+QUEUE_LENGTH_TTL = 1.0
+
+# Latency samples kept per stage
+LATENCY_WINDOW = 1000
+
 
 class MetricsCollector:
     """Collects and aggregates metrics."""
     
     def __init__(self):
         """Initialize metrics collector."""
-        self._latencies: Dict[str, list] = defaultdict(list)
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        # Running sum of each stage's window, so averages don't iterate it
+        self._latency_sums: Dict[str, float] = defaultdict(float)
         self._cache_hits: Dict[str, int] = defaultdict(int)
         self._cache_misses: int = 0
         self._total_requests: int = 0
-        self._start_time = datetime.utcnow()
+        self._start_time = time.monotonic()
+        self._queue = RequestQueue()
+        self._queue_length = 0
+        self._queue_length_at = float("-inf")
     
     def record_latency(self, duration_ms: float, stage: str):
         """
@@ -26,11 +40,14 @@ class MetricsCollector:
             duration_ms: Duration in milliseconds
             stage: Stage name (e.g., "l1_cache", "l2_cache", "model", "total")
         """
-        self._latencies[stage].append(duration_ms)
+        latencies = self._latencies[stage]
         
-        # Keep only last 1000 entries per stage
-        if len(self._latencies[stage]) > 1000:
-            self._latencies[stage] = self._latencies[stage][-1000:]
+        # Keep only the last LATENCY_WINDOW entries per stage; the deque
+        # evicts the oldest on append, so take it out of the sum first
+        if len(latencies) == LATENCY_WINDOW:
+            self._latency_sums[stage] -= latencies[0]
+        latencies.append(duration_ms)
+        self._latency_sums[stage] += duration_ms
     
     def record_cache_hit(self, cache_type: str):
         """
@@ -62,7 +79,7 @@ class MetricsCollector:
         avg_latencies = {}
         for stage, latencies in self._latencies.items():
             if latencies:
-                avg_latencies[stage] = sum(latencies) / len(latencies)
+                avg_latencies[stage] = self._latency_sums[stage] / len(latencies)
             else:
                 avg_latencies[stage] = 0.0
         
@@ -72,17 +89,18 @@ class MetricsCollector:
         if total_cache_operations > 0:
             cache_hit_rate = sum(self._cache_hits.values()) / total_cache_operations
         
-        # Get queue length (requires Redis)
-        queue_length = 0
-        try:
-            from app.services.queue_manager import RequestQueue
-            queue = RequestQueue()
-            queue_length = await queue.get_length()
-        except Exception as e:
-            logger.debug("Failed to get queue length (Redis may be unavailable)", error=str(e))
-            queue_length = 0
+        # Get queue length (requires Redis), reusing a recent value
+        now = time.monotonic()
+        if now - self._queue_length_at >= QUEUE_LENGTH_TTL:
+            try:
+                self._queue_length = await self._queue.get_length()
+            except Exception as e:
+                logger.debug("Failed to get queue length (Redis may be unavailable)", error=str(e))
+                self._queue_length = 0
+            self._queue_length_at = now
+        queue_length = self._queue_length
         
-        uptime_seconds = (datetime.utcnow() - self._start_time).total_seconds()
+        uptime_seconds = time.monotonic() - self._start_time
         
         return {
             "queue_length": queue_length,
@@ -102,8 +120,9 @@ class MetricsCollector:
     def reset(self):
         """Reset all metrics."""
         self._latencies.clear()
+        self._latency_sums.clear()
         self._cache_hits.clear()
         self._cache_misses = 0
         self._total_requests = 0
-        self._start_time = datetime.utcnow()
+        self._start_time = time.monotonic()
 
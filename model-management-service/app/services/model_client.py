@@ -8,13 +8,41 @@ from app.config import settings
 
 logger = structlog.get_logger()
 
+# orjson parses the per-token JSON lines several times faster than stdlib json
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# Process-wide HTTP client for the model server (lazy created)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared, keep-alive pooled model server client."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=settings.MODEL_SERVER_URL,
+            timeout=settings.MODEL_SERVER_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared model server client."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 class ModelClient:
     """HTTP client for Ollama model server."""
     
     def __init__(self):
         """Initialize model client."""
-        self.base_url = settings.MODEL_SERVER_URL
         self.timeout = settings.MODEL_SERVER_TIMEOUT
         self.max_retries = settings.MODEL_MAX_RETRIES
         self.retry_delay = settings.MODEL_RETRY_DELAY
@@ -23,7 +51,7 @@ class ModelClient:
         self,
         prompt: str,
         config: Optional[Dict[str, Any]] = None,
-        cancellation_token: Optional[asyncio.Task] = None,
+        cancellation_token: Optional[asyncio.Event] = None,
     ) -> AsyncIterator[str]:
         """
         Stream completion from model server.
@@ -60,61 +88,53 @@ class ModelClient:
         last_error = None
         for attempt in range(self.max_retries):
             try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    async with client.stream(
-                        "POST",
-                        f"{self.base_url}/api/generate",
-                        json=payload,
-                        headers={"Content-Type": "application/json"},
-                    ) as response:
-                        if response.status_code != 200:
-                            error_text = await response.aread()
-                            raise httpx.HTTPError(
-                                f"Model server returned {response.status_code}: {error_text.decode()}"
-                            )
+                client = get_http_client()
+                async with client.stream(
+                    "POST",
+                    "/api/generate",
+                    json=payload,
+                    timeout=self.timeout,
+                ) as response:
+                    if response.status_code != 200:
+                        error_text = await response.aread()
+                        raise httpx.HTTPError(
+                            f"Model server returned {response.status_code}: {error_text.decode()}"
+                        )
+                    
+                    # Stream Server-Sent Events (SSE)
+                    async for line in response.aiter_lines():
+                        # Check for cancellation
+                        if cancellation_token and cancellation_token.is_set():
+                            logger.info("Stream cancelled by user")
+                            return
                         
-                        # Stream Server-Sent Events (SSE)
-                        async for line in response.aiter_lines():
-                            # Check for cancellation
-                            if cancellation_token and cancellation_token.done():
-                                logger.info("Stream cancelled by user")
-                                return
-                            
-                            # Parse Ollama streaming format (JSON lines)
-                            if line.strip():
-                                try:
-                                    import json
-                                    data = json.loads(line)
-                                    
-                                    # Ollama format: {"response": "token", "done": false}
-                                    token = data.get("response", "")
-                                    done = data.get("done", False)
-                                    
-                                    if token:
-                                        yield token
-                                    
-                                    if done:
-                                        logger.debug("Stream completed")
-                                        return
-                                except json.JSONDecodeError:
-                                    logger.warning("Failed to parse JSON line", data=line)
-                                    continue
-                            
-                            # Check for errors in JSON response
-                            if line.strip():
-                                try:
-                                    import json
-                                    data = json.loads(line)
-                                    if "error" in data:
-                                        error_msg = data.get("error", "Unknown error")
-                                        logger.error("Model server error", error=error_msg)
-                                        raise httpx.HTTPError(f"Model server error: {error_msg}")
-                                except json.JSONDecodeError:
-                                    pass
+                        # Parse Ollama streaming format (JSON lines), once per line
+                        if not line or line.isspace():
+                            continue
+                        try:
+                            data = _json_loads(line)
+                        except ValueError:
+                            logger.warning("Failed to parse JSON line", data=line)
+                            continue
                         
-                        # Stream completed successfully
-                        return
+                        # Errors arrive on the same parsed line, so no second pass
+                        if "error" in data:
+                            error_msg = data["error"] or "Unknown error"
+                            logger.error("Model server error", error=error_msg)
+                            raise httpx.HTTPError(f"Model server error: {error_msg}")
                         
+                        # Ollama format: {"response": "token", "done": false}
+                        token = data.get("response", "")
+                        if token:
+                            yield token
+                        
+                        if data.get("done", False):
+                            logger.debug("Stream completed")
+                            return
+                    
+                    # Stream completed successfully
+                    return
+                    
             except (httpx.HTTPError, httpx.TimeoutException) as e:
                 last_error = e
                 logger.warning(
@@ -170,22 +190,21 @@ class ModelClient:
         
         for attempt in range(self.max_retries):
             try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(
-                        f"{self.base_url}/api/generate",
-                        json=payload,
-                        headers={"Content-Type": "application/json"},
+                response = await get_http_client().post(
+                    "/api/generate",
+                    json=payload,
+                    timeout=self.timeout,
+                )
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    # Ollama format: {"response": "full text"}
+                    return data.get("response", "")
+                else:
+                    raise httpx.HTTPError(
+                        f"Model server returned {response.status_code}: {response.text}"
                     )
                     
-                    if response.status_code == 200:
-                        data = response.json()
-                        # Ollama format: {"response": "full text"}
-                        return data.get("response", "")
-                    else:
-                        raise httpx.HTTPError(
-                            f"Model server returned {response.status_code}: {response.text}"
-                        )
-                        
             except (httpx.HTTPError, httpx.TimeoutException) as e:
                 if attempt < self.max_retries - 1:
                     await asyncio.sleep(self.retry_delay)
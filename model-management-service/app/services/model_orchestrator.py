@@ -1,11 +1,11 @@
 """Model orchestrator - coordinates generation and streaming."""
 import asyncio
+import time
 from typing import Optional, Dict, Any, AsyncIterator
 import structlog
-from datetime import datetime
 
 from app.services.model_client import ModelClient
-from app.utils.token_counter import count_tokens
+from app.utils.token_counter import count_tokens_async
 
 logger = structlog.get_logger()
 
@@ -16,7 +16,7 @@ class ModelOrchestrator:
     def __init__(self):
         """Initialize model orchestrator."""
         self.model_client = ModelClient()
-        self._active_tasks: Dict[str, asyncio.Task] = {}
+        self._active_tokens: Dict[str, asyncio.Event] = {}
     
     async def generate_response(
         self,
@@ -24,7 +24,7 @@ class ModelOrchestrator:
         config: Optional[Dict[str, Any]] = None,
         user_id: Optional[str] = None,
         stream: bool = True,
-        cancellation_token: Optional[asyncio.Task] = None,
+        cancellation_token: Optional[asyncio.Event] = None,
     ) -> AsyncIterator[Dict[str, Any]]:
         """
         Generate response from model with streaming support.
@@ -39,11 +39,18 @@ class ModelOrchestrator:
         Yields:
             Dictionary with token data: {"token": str, "done": bool}
         """
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter()
         tokens_generated = 0
         full_response = ""
+        response_parts = []
+        tokens_prompt_task = None
         
         try:
+            # Tokenize the prompt once, on a worker thread alongside generation;
+            # streamed tokens are counted one per chunk, so nothing is
+            # re-tokenized on the way out
+            tokens_prompt_task = asyncio.create_task(count_tokens_async(context))
+            
             if stream:
                 async for token in self.model_client.stream_completion(
                     context,
@@ -51,17 +58,19 @@ class ModelOrchestrator:
                     cancellation_token,
                 ):
                     tokens_generated += 1
-                    full_response += token
+                    response_parts.append(token)
                     
                     yield {
                         "token": token,
                         "done": False,
                         "tokens_generated": tokens_generated,
                     }
+                # Joined once at the end; += per token is quadratic on long completions
+                full_response = "".join(response_parts)
             else:
                 # Non-streaming mode
                 response = await self.model_client.get_completion(context, config)
-                tokens_generated = count_tokens(response)
+                tokens_generated = await count_tokens_async(response)
                 full_response = response
                 
                 yield {
@@ -71,8 +80,7 @@ class ModelOrchestrator:
                 }
             
             # Final yield with completion
-            end_time = datetime.utcnow()
-            latency_ms = (end_time - start_time).total_seconds() * 1000
+            latency_ms = (time.perf_counter() - start_time) * 1000
             
             yield {
                 "token": "",
@@ -80,7 +88,7 @@ class ModelOrchestrator:
                 "tokens_generated": tokens_generated,
                 "full_response": full_response,
                 "latency_ms": latency_ms,
-                "tokens_prompt": count_tokens(context),
+                "tokens_prompt": await tokens_prompt_task,
             }
             
         except Exception as e:
@@ -90,28 +98,36 @@ class ModelOrchestrator:
                 "done": True,
                 "error": str(e),
             }
+        finally:
+            # Errors and early-closed streams never await the count; cancel it
+            # so it neither holds a tokenizer worker nor logs an unretrieved error
+            if tokens_prompt_task and not tokens_prompt_task.done():
+                tokens_prompt_task.cancel()
     
-    def create_cancellation_token(self, request_id: str) -> asyncio.Task:
+    def create_cancellation_token(self, request_id: str) -> asyncio.Event:
         """
         Create a cancellation token for a request.
         
+        The token is a plain flag checked by the stream loop, so it costs no
+        scheduled task on the event loop.
+        
         Args:
             request_id: Unique request identifier
             
         Returns:
-            Cancellation task
+            Cancellation event (set to cancel)
         """
-        # Clean up old tasks to prevent memory leak
-        if len(self._active_tasks) > 1000:
-            logger.warning("Too many active tasks, cleaning up", count=len(self._active_tasks))
-            # Remove completed tasks
-            completed = [rid for rid, task in self._active_tasks.items() if task.done()]
+        # Clean up old tokens to prevent memory leak
+        if len(self._active_tokens) > 1000:
+            logger.warning("Too many active tokens, cleaning up", count=len(self._active_tokens))
+            # Remove tokens that have been set (cancelled or released)
+            completed = [rid for rid, token in self._active_tokens.items() if token.is_set()]
             for rid in completed:
-                del self._active_tasks[rid]
+                del self._active_tokens[rid]
         
-        cancellation_task = asyncio.create_task(asyncio.sleep(float('inf')))
-        self._active_tasks[request_id] = cancellation_task
-        return cancellation_task
+        cancellation_token = asyncio.Event()
+        self._active_tokens[request_id] = cancellation_token
+        return cancellation_token
     
     def cancel_request(self, request_id: str) -> bool:
         """
@@ -123,10 +139,8 @@ class ModelOrchestrator:
         Returns:
             True if cancelled, False if not found
         """
-        if request_id in self._active_tasks:
-            task = self._active_tasks[request_id]
-            task.cancel()
-            del self._active_tasks[request_id]
+        if request_id in self._active_tokens:
+            self._active_tokens.pop(request_id).set()
             logger.info("Request cancelled", request_id=request_id)
             return True
         return False
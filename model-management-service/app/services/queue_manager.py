@@ -1,5 +1,5 @@
 """Request queue management service."""
-import json
+import uuid
 from typing import Optional, Dict, Any
 import structlog
 
@@ -9,15 +9,48 @@ from app.models import InferenceRequest
 
 logger = structlog.get_logger()
 
+# Push only while the queue is below the bound, atomically: the payload goes
+# into the items hash under its entry id, the id is indexed under its session,
+# and only the id goes onto the list.
+# Returns the new length, or -1 if the queue is full.
+_ENQUEUE_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    return -1
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('SADD', KEYS[3], ARGV[2])
+return redis.call('LPUSH', KEYS[1], ARGV[2])
+"""
+
+# Entry ids are "<session_id>:<uuid4 hex>"; the hex part has no separator, so
+# the session is recoverable from the id without reading the payload
+_ENTRY_ID_SEPARATOR = ":"
+
+
+def _new_entry_id(session_id: str) -> str:
+    return f"{session_id}{_ENTRY_ID_SEPARATOR}{uuid.uuid4().hex}"
+
+
+def _session_of(entry_id: str) -> str:
+    return entry_id.rpartition(_ENTRY_ID_SEPARATOR)[0]
+
 
 class RequestQueue:
     """Manages FIFO request queue using Redis."""
     
     QUEUE_KEY = "queue:requests"
+    # entry id -> request payload; the list above only holds entry ids, so
+    # several requests from one session can be queued at once
+    ITEMS_KEY = "queue:items"
+    # Per-session set of queued entry ids, for remove()
+    SESSION_KEY_PREFIX = "queue:session:"
     
     def __init__(self):
         """Initialize request queue."""
-        pass
+        self._enqueue_script = None
+    
+    def _session_key(self, session_id: str) -> str:
+        return f"{self.SESSION_KEY_PREFIX}{session_id}"
     
     async def enqueue(self, request: InferenceRequest) -> bool:
         """
@@ -44,13 +77,22 @@ class RequestQueue:
                 detail="Queue service unavailable (Redis not connected)",
             )
         
-        # Check queue length
-        queue_length = await self.get_length()
+        # Check the bound and add the request in one atomic step, so concurrent
+        # enqueues can't overflow the queue (LPUSH for FIFO - we RPOP to dequeue)
+        if self._enqueue_script is None:
+            self._enqueue_script = redis_client.register_script(_ENQUEUE_SCRIPT)
+        # Dump by alias so model_settings survives model_validate_json on the
+        # way out, and leave defaults out to keep payloads small
+        request_data = request.model_dump_json(by_alias=True, exclude_defaults=True)
+        entry_id = _new_entry_id(request.session_id)
+        queue_length = await self._enqueue_script(
+            keys=[self.QUEUE_KEY, self.ITEMS_KEY, self._session_key(request.session_id)],
+            args=[settings.MAX_QUEUE_SIZE, entry_id, request_data],
+        )
         
-        if queue_length >= settings.MAX_QUEUE_SIZE:
+        if queue_length == -1:
             logger.warning(
                 "Queue full",
-                queue_length=queue_length,
                 max_size=settings.MAX_QUEUE_SIZE,
             )
             from fastapi import HTTPException, status
@@ -59,29 +101,42 @@ class RequestQueue:
                 detail=f"Queue is full (max {settings.MAX_QUEUE_SIZE} requests)",
             )
         
-        # Add request to queue (LPUSH for FIFO - we'll use RPOP to dequeue)
-        request_data = request.model_dump_json()
-        await redis_client.lpush(self.QUEUE_KEY, request_data)
-        
         logger.debug(
             "Request enqueued",
             session_id=request.session_id,
-            queue_length=queue_length + 1,
+            queue_length=queue_length,
         )
         return True
     
-    async def dequeue(self) -> Optional[InferenceRequest]:
+    async def dequeue(self, timeout: Optional[float] = None) -> Optional[InferenceRequest]:
         """
         Remove and return the next request from the queue (FIFO).
         
+        Args:
+            timeout: If given, block up to this many seconds for a request
+                (BRPOP) instead of returning immediately
+        
         Returns:
             InferenceRequest if available, None if queue is empty
         """
         redis_client = await get_redis_client()
         
-        # Use RPOP for FIFO (last in, first out when using LPUSH)
-        # Actually, for true FIFO with LPUSH, we need RPOP
-        request_data = await redis_client.rpop(self.QUEUE_KEY)
+        # RPOP for FIFO, since requests are added with LPUSH
+        if timeout is None:
+            entry_id = await redis_client.rpop(self.QUEUE_KEY)
+        else:
+            popped = await redis_client.brpop(self.QUEUE_KEY, timeout=timeout)
+            entry_id = popped[1] if popped else None
+        
+        if not entry_id:
+            return None
+        
+        # Take the payload out of the items hash and drop the session index entry
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hget(self.ITEMS_KEY, entry_id)
+            pipe.hdel(self.ITEMS_KEY, entry_id)
+            pipe.srem(self._session_key(_session_of(entry_id)), entry_id)
+            request_data, _, _ = await pipe.execute()
         
         if request_data:
             try:
@@ -110,38 +165,46 @@ class RequestQueue:
     
     async def remove(self, request_id: str) -> bool:
         """
-        Remove a specific request from the queue.
+        Remove a session's queued requests.
         
         Args:
-            request_id: Request identifier (using session_id as identifier)
+            request_id: Request identifier (using session_id as identifier);
+                every request queued for that session is removed
             
         Returns:
             True if removed, False if not found
         """
         redis_client = await get_redis_client()
+        from app.services.cache_manager import PlaceholderRedis
+        if isinstance(redis_client, PlaceholderRedis):
+            return False
         
-        # Get all items in queue
-        items = await redis_client.lrange(self.QUEUE_KEY, 0, -1)
+        # The session index names the entries, so no payloads need fetching
+        # or parsing and the list is only searched for those ids
+        session_key = self._session_key(request_id)
+        entry_ids = await redis_client.smembers(session_key)
+        if not entry_ids:
+            return False
         
-        # Find and remove matching request
-        removed = False
-        for item in items:
-            try:
-                request_data = json.loads(item)
-                if request_data.get("session_id") == request_id:
-                    await redis_client.lrem(self.QUEUE_KEY, 1, item)
-                    removed = True
-                    logger.debug("Request removed from queue", request_id=request_id)
-                    break
-            except Exception as e:
-                logger.warning("Failed to parse queue item", error=str(e))
-                continue
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for entry_id in entry_ids:
+                pipe.lrem(self.QUEUE_KEY, 1, entry_id)
+            pipe.hdel(self.ITEMS_KEY, *entry_ids)
+            pipe.srem(session_key, *entry_ids)
+            results = await pipe.execute()
         
+        removed = sum(results[:len(entry_ids)]) > 0
+        if removed:
+            logger.debug("Request removed from queue", request_id=request_id)
         return removed
     
     async def clear(self):
         """Clear all requests from the queue."""
         redis_client = await get_redis_client()
-        await redis_client.delete(self.QUEUE_KEY)
+        from app.services.cache_manager import PlaceholderRedis
+        if isinstance(redis_client, PlaceholderRedis):
+            return
+        session_keys = [key async for key in redis_client.scan_iter(match=f"{self.SESSION_KEY_PREFIX}*")]
+        await redis_client.delete(self.QUEUE_KEY, self.ITEMS_KEY, *session_keys)
         logger.info("Queue cleared")
 
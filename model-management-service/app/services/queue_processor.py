@@ -1,6 +1,6 @@
 """Queue processor background task."""
 import asyncio
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import structlog
 
 from app.config import settings
@@ -8,12 +8,17 @@ from app.services.queue_manager import RequestQueue
 from app.services.context_builder import ContextBuilder
 from app.services.model_orchestrator import ModelOrchestrator
 from app.services.response_handler import ResponseHandler
-from app.services.cache_manager_service import CacheManager
+from app.services.cache_manager_service import get_cache_manager
 from app.services.session_manager import SessionManager
 from app.services.metrics import MetricsCollector
 
 logger = structlog.get_logger()
 
+# How long one BRPOP waits for work. Pushed requests wake it immediately, so
+# this only bounds idle wake-ups; it must stay under the Redis client's
+# 2s socket timeout or an idle wait would read as a dead connection.
+DEQUEUE_BLOCK_TIMEOUT = 1.5
+
 
 class QueueProcessor:
     """Background task that processes requests from the queue."""
@@ -24,11 +29,13 @@ class QueueProcessor:
         self.context_builder = ContextBuilder()
         self.model_orchestrator = ModelOrchestrator()
         self.response_handler = ResponseHandler()
-        self.cache_manager = CacheManager()
+        self.cache_manager = get_cache_manager()
         self.session_manager = SessionManager()
         self.metrics = metrics_collector
         self._running = False
-        self._task: Optional[asyncio.Task] = None
+        self._workers: List[asyncio.Task] = []
+        # Prompt hash -> final chunk of the generation currently running for it
+        self._inflight: Dict[str, asyncio.Future] = {}
     
     async def start(self):
         """Start the queue processor."""
@@ -37,38 +44,40 @@ class QueueProcessor:
             return
         
         self._running = True
-        self._task = asyncio.create_task(self._process_loop())
-        logger.info("Queue processor started")
+        # A fixed pool bounds both concurrent model calls and live tasks
+        self._workers = [
+            asyncio.create_task(self._process_loop())
+            for _ in range(settings.QUEUE_WORKERS)
+        ]
+        logger.info("Queue processor started", workers=settings.QUEUE_WORKERS)
     
     async def stop(self):
         """Stop the queue processor."""
         self._running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
         logger.info("Queue processor stopped")
     
     async def _process_loop(self):
-        """Main processing loop."""
+        """Worker loop: take one request at a time and process it to completion."""
         while self._running:
             try:
-                # Dequeue next request
-                request = await self.queue.dequeue()
+                # Block until a request arrives, so new requests are picked
+                # up without polling delay
+                request = await self.queue.dequeue(timeout=DEQUEUE_BLOCK_TIMEOUT)
                 
+                # No explicit sleep(0) needed: every dequeue waits on a Redis
+                # round-trip, so a busy queue still yields to the event loop
                 if request:
-                    # Process request (don't await - let it run in background)
-                    asyncio.create_task(self._process_request(request))
-                else:
-                    # No requests, wait before checking again
-                    await asyncio.sleep(settings.QUEUE_POLL_INTERVAL)
+                    await self._process_request(request)
                     
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error("Queue processor error", error=str(e))
+                # Back off only on errors, e.g. while Redis is unreachable
                 await asyncio.sleep(settings.QUEUE_POLL_INTERVAL)
     
     async def _process_request(self, request):
@@ -77,10 +86,27 @@ class QueueProcessor:
         start_time = time.time()
         
         try:
+            # Load the session once; the context built from it serves the cache
+            # lookup, the model call and the cache store alike
+            if request.messages:
+                messages = request.messages
+            else:
+                messages = await self.session_manager.load_session(request.session_id)
+            
+            model_config = request.config or {
+                "temperature": request.temperature,
+                "max_tokens": request.max_tokens,
+            }
+            prepared = self.context_builder.prepare(
+                messages, request.prompt, model_config, settings.MAX_CONTEXT_TOKENS
+            )
+            
             # Check cache first
             cache_result = await self.cache_manager.check_cache(
                 request.prompt,
-                request.config,  # Use config field (aliased as model_settings)
+                model_config,
+                context=prepared.full_text,
+                prompt_hash=prepared.prompt_hash,
             )
             
             if cache_result:
@@ -95,7 +121,7 @@ class QueueProcessor:
                 # Process response
                 await self.response_handler.process_response(
                     response_text,
-                    request.model_dump(),
+                    request.model_dump(exclude={"messages"}),
                     cache_hit=True,
                     cache_type=cache_type,
                     latency_ms=cache_latency,
@@ -108,48 +134,73 @@ class QueueProcessor:
             if self.metrics:
                 self.metrics.record_cache_miss()
             
-            # Load session
-            messages = await self.session_manager.load_session(request.session_id)
+            # Identical requests (same prompt, context and settings) already
+            # being generated share that generation instead of re-running it
+            key = prepared.prompt_hash
+            leader = self._inflight.get(key)
+            coalesced = leader is not None
+            if coalesced:
+                # Shielded: a cancelled follower must not cancel the shared future
+                final = await asyncio.shield(leader)
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                final = None
+                try:
+                    final = await self._generate(prepared.text, model_config)
+                finally:
+                    del self._inflight[key]
+                    future.set_result(final)
             
-            # Build context
-            context = self.context_builder.build_context(messages, request.prompt)
-            context = self.context_builder.truncate_if_needed(context, request.max_tokens)
+            if final is None:
+                logger.error("Model generation failed", session_id=request.session_id, coalesced=coalesced)
+                return
             
-            # Generate response
-            model_config = {
-                "temperature": request.temperature,
-                "max_tokens": request.max_tokens,
-            }
+            latency_ms = final.get("latency_ms", 0)
             
-            full_response = ""
-            tokens_generated = 0
+            # Process response; a coalesced request is stored by its leader
+            await self.response_handler.process_response(
+                final.get("full_response", ""),
+                request.model_dump(exclude={"messages"}),
+                cache_hit=coalesced,
+                latency_ms=latency_ms,
+                tokens_generated=final.get("tokens_generated", 0),
+                tokens_prompt=final.get("tokens_prompt", 0),
+                context=prepared.full_text,
+                messages=messages,
+                prompt_hash=prepared.prompt_hash,
+            )
             
-            async for chunk in self.model_orchestrator.generate_response(
-                context,
-                model_config,
-                stream=False,  # Queue processing is non-streaming
-            ):
-                if chunk.get("done"):
-                    full_response = chunk.get("full_response", "")
-                    tokens_generated = chunk.get("tokens_generated", 0)
-                    latency_ms = chunk.get("latency_ms", 0)
-                    tokens_prompt = chunk.get("tokens_prompt", 0)
-                    
-                    # Process response
-                    await self.response_handler.process_response(
-                        full_response,
-                        request.model_dump(),
-                        cache_hit=False,
-                        latency_ms=latency_ms,
-                        tokens_generated=tokens_generated,
-                        tokens_prompt=tokens_prompt,
-                    )
-                    
-                    if self.metrics:
-                        total_latency = (time.time() - start_time) * 1000
-                        self.metrics.record_latency(total_latency, "total")
-                        self.metrics.record_latency(latency_ms, "model")
+            if self.metrics:
+                total_latency = (time.time() - start_time) * 1000
+                self.metrics.record_latency(total_latency, "total")
+                if not coalesced:
+                    self.metrics.record_latency(latency_ms, "model")
             
         except Exception as e:
             logger.error("Request processing failed", error=str(e), session_id=request.session_id)
-
+    
+    async def _generate(self, context: str, model_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Run a non-streaming generation.
+        
+        Args:
+            context: Truncated context for the model
+            model_config: Model configuration
+            
+        Returns:
+            The orchestrator's final chunk (full_response, latency, token
+            counts), or None if generation failed
+        """
+        final = None
+        async for chunk in self.model_orchestrator.generate_response(
+            context,
+            model_config,
+            stream=False,  # Queue processing is non-streaming
+        ):
+            # Several chunks can be marked done; the last one carries the totals
+            if chunk.get("done"):
+                final = chunk
+        if final is None or "error" in final:
+            return None
+        return final
@@ -1,23 +1,46 @@
 """Response handler - processes and stores responses."""
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
 import structlog
-from datetime import datetime
 
-from app.services.cache_manager_service import CacheManager
+from app.services.cache_manager import get_redis_client, PlaceholderRedis
+from app.services.cache_manager_service import get_cache_manager
+from app.services.context_builder import ContextBuilder
 from app.services.session_manager import SessionManager
-from app.models import InferenceResponse
+from app.models import InferenceResponse, utc_now
 
 logger = structlog.get_logger()
 
 
+def _log_task_error(task: asyncio.Task):
+    """Log errors from background tasks."""
+    if task.cancelled():
+        return
+    try:
+        task.result()
+    except Exception as e:
+        logger.error("Background task failed", error=str(e), exc_info=True)
+
+
 class ResponseHandler:
     """Handles response processing and storage."""
     
     def __init__(self):
         """Initialize response handler."""
-        self.cache_manager = CacheManager()
+        self.cache_manager = get_cache_manager()
         self.session_manager = SessionManager()
+        self.context_builder = ContextBuilder()
+        # Strong references to background storage tasks; the event loop only
+        # keeps weak ones, so unreferenced tasks can vanish mid-flight
+        self._pending: Set[asyncio.Task] = set()
+    
+    def run_in_background(self, coro) -> asyncio.Task:
+        """Run a storage coroutine in the background, holding it until done."""
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        task.add_done_callback(_log_task_error)
+        return task
     
     async def process_response(
         self,
@@ -30,18 +53,23 @@ class ResponseHandler:
         tokens_prompt: int = 0,
         context: Optional[str] = None,
         messages: Optional[list] = None,
+        prompt_hash: Optional[str] = None,
     ) -> InferenceResponse:
         """
         Process response and store in caches and database.
         
         Args:
             response: Model response text
-            request_data: Original request data
+            request_data: Original request data; only session_id, prompt and
+                model settings are read, so callers can leave out the history
             cache_hit: Whether this was a cache hit
             cache_type: Cache type ("l1" or "l2")
             latency_ms: Response latency in milliseconds
             tokens_generated: Number of tokens generated
             tokens_prompt: Number of tokens in prompt
+            context: Full conversation context (for the cache key)
+            messages: List of previous messages (if context not available)
+            prompt_hash: Precomputed L1 hash; skips rebuilding the context
             
         Returns:
             InferenceResponse object
@@ -60,21 +88,13 @@ class ResponseHandler:
             cache_hit=cache_hit,
             cache_type=cache_type,
             latency_ms=latency_ms,
-            timestamp=datetime.utcnow(),
         )
         
         # Store in parallel (non-blocking) with error tracking
-        def log_task_error(task):
-            """Log errors from background tasks."""
-            try:
-                task.result()
-            except Exception as e:
-                logger.error("Background task failed", error=str(e), exc_info=True)
-        
         if not cache_hit:
             # Only cache if it wasn't a cache hit
             # Load messages if not provided (for context-aware caching)
-            if messages is None and session_id:
+            if prompt_hash is None and messages is None and session_id:
                 try:
                     messages = await self.session_manager.load_session(session_id)
                 except Exception as e:
@@ -82,22 +102,25 @@ class ResponseHandler:
                     messages = []
             
             # Build context if not provided
-            if context is None and messages:
-                from app.services.context_builder import ContextBuilder
-                context_builder = ContextBuilder()
+            if prompt_hash is None and context is None and messages:
                 try:
-                    context = context_builder.build_context(messages, prompt)
+                    context = self.context_builder.build_context(messages, prompt)
                 except Exception as e:
                     logger.warning("Failed to build context for cache storage", error=str(e))
                     context = None
             
-            task = asyncio.create_task(
-                self._store_in_caches(prompt, response, model_config, context, messages)
-            )
-            task.add_done_callback(log_task_error)
+            if prompt_hash is None:
+                prompt_hash = self.cache_manager.l1_cache.generate_hash(
+                    prompt, model_config, context, messages
+                )
+        
+        # Cache and session writes share one Redis round-trip
+        self.run_in_background(
+            self._store_in_redis(session_id, prompt, response, prompt_hash, cache_hit)
+        )
         
         # Store message in database
-        task = asyncio.create_task(
+        self.run_in_background(
             self._store_message_in_db(
                 session_id,
                 "assistant",
@@ -105,13 +128,6 @@ class ResponseHandler:
                 user_id,
             )
         )
-        task.add_done_callback(log_task_error)
-        
-        # Update session cache
-        task = asyncio.create_task(
-            self._update_session_cache(session_id, "assistant", response)
-        )
-        task.add_done_callback(log_task_error)
         
         logger.info(
             "Response processed",
@@ -124,25 +140,41 @@ class ResponseHandler:
         
         return inference_response
     
-    async def _store_in_caches(
+    async def _store_in_redis(
         self,
+        session_id: str,
         prompt: str,
         response: str,
-        model_config: Optional[Dict[str, Any]],
-        context: Optional[str] = None,
-        messages: Optional[list] = None,
+        prompt_hash: Optional[str],
+        cache_hit: bool,
     ):
-        """Store response in L1 and L2 caches with context."""
+        """Store the response in L1 and the session cache in one pipeline, then in L2."""
+        message = {
+            "role": "assistant",
+            "content": response,
+            "timestamp": utc_now().isoformat(),
+        }
         try:
-            await self.cache_manager.store_in_cache(
-                prompt, 
-                response, 
-                model_config,
-                context=context,
-                messages=messages,
-            )
+            redis_client = await get_redis_client()
+            if not isinstance(redis_client, PlaceholderRedis):
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    # Only cache if it wasn't a cache hit
+                    if not cache_hit:
+                        self.cache_manager.queue_l1_store(pipe, prompt_hash, response)
+                    position = self.session_manager.queue_append(pipe, session_id, message)
+                    results = await pipe.execute(raise_on_error=False)
+                
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.error("Failed to store response in Redis", error=str(result))
+                if results[position] == 0:
+                    await self.session_manager.rebuild_cache(session_id, message)
         except Exception as e:
-            logger.error("Failed to store in caches", error=str(e))
+            logger.error("Failed to store response in Redis", error=str(e))
+        
+        # L2 needs the prompt embedding first, so it can't join the pipeline
+        if not cache_hit:
+            await self.cache_manager.store_in_l2(prompt, response, prompt_hash)
     
     async def _store_message_in_db(
         self,
@@ -161,22 +193,3 @@ class ResponseHandler:
             )
         except Exception as e:
             logger.error("Failed to store message in database", error=str(e))
-    
-    async def _update_session_cache(
-        self,
-        session_id: str,
-        role: str,
-        content: str,
-    ):
-        """Update session cache with new message."""
-        try:
-            messages = await self.session_manager.load_session(session_id)
-            messages.append({
-                "role": role,
-                "content": content,
-                "timestamp": datetime.utcnow().isoformat(),
-            })
-            await self.session_manager.cache_session(session_id, messages)
-        except Exception as e:
-            logger.error("Failed to update session cache", error=str(e))
-
@@ -1,5 +1,7 @@
 """Session management service."""
-from typing import List, Optional, Dict, Any
+import asyncio
+import contextvars
+from typing import List, Optional, Dict, Any, Tuple
 import json
 import structlog
 from datetime import datetime
@@ -10,6 +12,115 @@ from app.utils.token_counter import count_tokens_in_messages
 
 logger = structlog.get_logger()
 
+# orjson encodes and parses session messages several times faster than
+# stdlib json; its decode errors subclass json.JSONDecodeError
+try:
+    import orjson
+    
+    def _json_dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=str)
+    
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(value: Any) -> str:
+        return json.dumps(value, default=str)
+    
+    _json_loads = json.loads
+
+
+# Most message rows written in one INSERT/commit
+MESSAGE_BATCH_SIZE = 64
+
+# clock_timestamp() rather than NOW(): rows batched into one transaction
+# would otherwise share a timestamp and lose their order
+_INSERT_MESSAGE_SQL = """
+    INSERT INTO messages (session_id, user_id, role, content, timestamp)
+    VALUES (:session_id, :user_id, :role, :content, clock_timestamp())
+"""
+
+
+class MessageWriter:
+    """
+    Batches message inserts into one executemany and commit per flush.
+    
+    A save arriving while no write is in flight is written immediately;
+    saves arriving during a write wait and go out together in the next one,
+    so idle traffic pays no added latency and bursts share a WAL sync.
+    """
+    
+    def __init__(self):
+        """Initialize an empty writer."""
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._draining: Optional[asyncio.Task] = None
+    
+    async def submit(self, row: Dict[str, Any]):
+        """
+        Insert a message row as part of the next batch.
+        
+        Args:
+            row: session_id, user_id, role and content of the message
+            
+        Raises:
+            Exception: If the batch containing the row failed to commit
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if self._draining is None:
+            # Fresh context: the writer must not inherit a caller's open
+            # db_session, which may be closed before the batch runs
+            self._draining = asyncio.create_task(self._drain(), context=contextvars.Context())
+        await future
+    
+    async def _drain(self):
+        """Write pending rows batch by batch until none are left."""
+        try:
+            while self._pending:
+                batch = self._pending[:MESSAGE_BATCH_SIZE]
+                del self._pending[:MESSAGE_BATCH_SIZE]
+                try:
+                    await self._write([row for row, _ in batch])
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+        finally:
+            self._draining = None
+    
+    async def _write(self, rows: List[Dict[str, Any]]):
+        """Insert rows with a single executemany and commit."""
+        from app.services.database import db_session, PlaceholderSession
+        from sqlalchemy import text
+        
+        async with db_session() as session:
+            # Check if using placeholder session
+            if isinstance(session, PlaceholderSession):
+                logger.debug("Database unavailable, skipping save", count=len(rows))
+                return
+            
+            # Assumes table structure: messages(session_id, user_id, role, content, timestamp)
+            await session.execute(text(_INSERT_MESSAGE_SQL), rows)
+            await session.commit()
+
+
+_message_writer: Optional[MessageWriter] = None
+
+
+def get_message_writer() -> MessageWriter:
+    """Get or create the shared message writer."""
+    global _message_writer
+    if _message_writer is None:
+        _message_writer = MessageWriter()
+    return _message_writer
+
+
+def _session_cache_key(session_id: str) -> str:
+    """Redis list holding one JSON-encoded message per element."""
+    return f"session:messages:{session_id}"
+
 
 class SessionManager:
     """Manages user sessions and message history."""
@@ -33,12 +144,11 @@ class SessionManager:
         
         # Try Redis first (if available)
         if not isinstance(redis_client, PlaceholderRedis):
-            cache_key = f"session:{session_id}"
-            cached_data = await redis_client.get(cache_key)
+            cached_data = await redis_client.lrange(_session_cache_key(session_id), 0, -1)
             
             if cached_data:
                 try:
-                    messages = json.loads(cached_data)
+                    messages = [_json_loads(item) for item in cached_data]
                     logger.debug("Session loaded from cache", session_id=session_id, message_count=len(messages))
                     return messages
                 except json.JSONDecodeError:
@@ -66,45 +176,54 @@ class SessionManager:
             List of messages
         """
         try:
-            from app.services.database import get_db_session, PlaceholderSession
+            from app.services.database import db_session, PlaceholderSession
             from sqlalchemy import text
+            from sqlalchemy.exc import DBAPIError
             
-            async for session in get_db_session():
-                # Check if using placeholder session
-                if isinstance(session, PlaceholderSession):
-                    logger.debug("Database unavailable, returning empty session", session_id=session_id)
-                    return []
-                
-                # Query messages from database
-                # Assumes table structure: messages(session_id, role, content, timestamp)
-                result = await session.execute(
-                    text("""
-                        SELECT role, content, timestamp 
-                        FROM messages 
-                        WHERE session_id = :session_id 
-                        ORDER BY timestamp ASC
-                        LIMIT :limit
-                    """),
-                    {
-                        "session_id": session_id,
-                        "limit": settings.MAX_HISTORY_MESSAGES
-                    }
-                )
-                
-                messages = []
-                for row in result:
-                    messages.append({
-                        "role": row[0],
-                        "content": row[1],
-                        "timestamp": row[2].isoformat() if row[2] else None
-                    })
-                
-                logger.debug(
-                    "Loaded session from database",
-                    session_id=session_id,
-                    message_count=len(messages)
-                )
-                return messages
+            # The pool doesn't pre-ping, so a connection dropped while idle
+            # only shows up here; the read is safe to retry once on a fresh one
+            for attempt in range(2):
+                try:
+                    async with db_session() as session:
+                        # Check if using placeholder session
+                        if isinstance(session, PlaceholderSession):
+                            logger.debug("Database unavailable, returning empty session", session_id=session_id)
+                            return []
+                        
+                        # Query messages from database
+                        # Assumes table structure: messages(session_id, role, content, timestamp)
+                        result = await session.execute(
+                            text("""
+                                SELECT role, content, timestamp 
+                                FROM messages 
+                                WHERE session_id = :session_id 
+                                ORDER BY timestamp ASC
+                                LIMIT :limit
+                            """),
+                            {
+                                "session_id": session_id,
+                                "limit": settings.MAX_HISTORY_MESSAGES
+                            }
+                        )
+                        
+                        messages = []
+                        for row in result:
+                            messages.append({
+                                "role": row[0],
+                                "content": row[1],
+                                "timestamp": row[2].isoformat() if row[2] else None
+                            })
+                        
+                        logger.debug(
+                            "Loaded session from database",
+                            session_id=session_id,
+                            message_count=len(messages)
+                        )
+                        return messages
+                except DBAPIError as e:
+                    if not e.connection_invalidated or attempt:
+                        raise
+                    logger.info("Stale database connection, retrying", session_id=session_id)
         except Exception as e:
             logger.warning("Failed to load session from database", session_id=session_id, error=str(e))
             return []
@@ -125,15 +244,16 @@ class SessionManager:
             logger.debug("Redis unavailable, skipping session cache", session_id=session_id)
             return
         
-        cache_key = f"session:{session_id}"
+        cache_key = _session_cache_key(session_id)
         
         try:
-            messages_json = json.dumps(messages, default=str)
-            await redis_client.setex(
-                cache_key,
-                settings.SESSION_CACHE_TTL,
-                messages_json
-            )
+            # Replace the whole list atomically
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(cache_key)
+                if messages:
+                    pipe.rpush(cache_key, *[_json_dumps(message) for message in messages])
+                    pipe.expire(cache_key, settings.SESSION_CACHE_TTL)
+                await pipe.execute()
             logger.debug(
                 "Session cached",
                 session_id=session_id,
@@ -143,6 +263,41 @@ class SessionManager:
         except Exception as e:
             logger.warning("Failed to cache session", session_id=session_id, error=str(e))
     
+    def queue_append(self, pipe, session_id: str, message: Dict[str, Any]) -> int:
+        """
+        Add a cached-session append to a caller's pipeline.
+        
+        Only appends to a session that is already cached (RPUSHX), so an
+        expired session never ends up holding just the newest message.
+        
+        Args:
+            pipe: Redis pipeline the caller executes
+            session_id: Unique session identifier
+            message: Message to append
+            
+        Returns:
+            Position of the RPUSHX result in the pipeline's results; 0 there
+            means the session wasn't cached and needs rebuild_cache
+        """
+        cache_key = _session_cache_key(session_id)
+        position = len(pipe)
+        pipe.rpushx(cache_key, _json_dumps(message))
+        pipe.ltrim(cache_key, -settings.MAX_HISTORY_MESSAGES, -1)
+        pipe.expire(cache_key, settings.SESSION_CACHE_TTL)
+        return position
+    
+    async def rebuild_cache(self, session_id: str, message: Dict[str, Any]):
+        """
+        Re-cache a session from the database plus a new message.
+        
+        Args:
+            session_id: Unique session identifier
+            message: Message to add after the loaded history
+        """
+        messages = await self.load_session(session_id)
+        messages.append(message)
+        await self.cache_session(session_id, messages)
+    
     async def save_message_to_database(
         self,
         session_id: str,
@@ -160,37 +315,18 @@ class SessionManager:
             user_id: Optional user identifier
         """
         try:
-            from app.services.database import get_db_session, PlaceholderSession
-            from sqlalchemy import text
-            
-            async for session in get_db_session():
-                # Check if using placeholder session
-                if isinstance(session, PlaceholderSession):
-                    logger.debug("Database unavailable, skipping save", session_id=session_id)
-                    return
-                
-                # Insert message into database
-                # Assumes table structure: messages(session_id, user_id, role, content, timestamp)
-                await session.execute(
-                    text("""
-                        INSERT INTO messages (session_id, user_id, role, content, timestamp) 
-                        VALUES (:session_id, :user_id, :role, :content, NOW())
-                    """),
-                    {
-                        "session_id": session_id,
-                        "user_id": user_id,
-                        "role": role,
-                        "content": content
-                    }
-                )
-                await session.commit()
-                logger.debug(
-                    "Saved message to database",
-                    session_id=session_id,
-                    role=role,
-                    content_length=len(content),
-                )
-                break
+            await get_message_writer().submit({
+                "session_id": session_id,
+                "user_id": user_id,
+                "role": role,
+                "content": content,
+            })
+            logger.debug(
+                "Saved message to database",
+                session_id=session_id,
+                role=role,
+                content_length=len(content),
+            )
         except Exception as e:
             logger.warning("Failed to save message to database (using placeholder)", error=str(e))
     
@@ -1,29 +1,49 @@
 """Embedding utilities for L2 cache semantic similarity."""
-from typing import List, Optional
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import numpy as np
 import structlog
 
 logger = structlog.get_logger()
 
+# Output dimension of all-MiniLM-L6-v2
+EMBEDDING_DIMENSION = 384
+
+# Largest number of texts encoded in one model call
+EMBEDDING_BATCH_SIZE = 32
+
+# Dedicated, long-lived thread for model inference, so encodes don't occupy
+# the loop's default executor. One worker: the batcher runs one encode at a
+# time, and torch already parallelizes inside it.
+_EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+
 # Global model instance (lazy loaded)
 _embedding_model = None
+_embedding_model_loaded = False
+# Embeddings are generated on worker threads; only one of them loads the model
+_embedding_model_lock = threading.Lock()
 
 
 def get_embedding_model():
     """Get or create the embedding model instance."""
-    global _embedding_model
-    if _embedding_model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            logger.info("Loading embedding model", model="all-MiniLM-L6-v2")
-            _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except ImportError as e:
-            logger.warning("sentence-transformers not available, embeddings disabled", error=str(e))
-            _embedding_model = None
+    global _embedding_model, _embedding_model_loaded
+    if not _embedding_model_loaded:
+        with _embedding_model_lock:
+            if not _embedding_model_loaded:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info("Loading embedding model", model="all-MiniLM-L6-v2")
+                    _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                except ImportError as e:
+                    logger.warning("sentence-transformers not available, embeddings disabled", error=str(e))
+                    _embedding_model = None
+                _embedding_model_loaded = True
     return _embedding_model
 
 
-def generate_embedding(text: str) -> List[float]:
+def generate_embedding(text: str) -> np.ndarray:
     """
     Generate embedding vector for text.
     
@@ -31,37 +51,164 @@ def generate_embedding(text: str) -> List[float]:
         text: Input text to embed
         
     Returns:
-        List of floats representing the embedding vector
+        Unit-length float32 array representing the embedding vector
     """
     model = get_embedding_model()
     if model is None:
         # Return a dummy embedding if model is not available
         logger.warning("Embedding model not available, returning dummy embedding")
-        return [0.0] * 384  # Default dimension for all-MiniLM-L6-v2
-    embedding = model.encode(text, convert_to_numpy=True)
-    return embedding.tolist()
+        return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
+    # Normalized by the model, so cosine similarity is a plain dot product;
+    # kept as a float32 array since the L2 cache stores its raw bytes directly
+    return model.encode(
+        text, convert_to_numpy=True, normalize_embeddings=True
+    ).astype(np.float32, copy=False)
 
 
-def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float:
+def generate_embeddings_batch(texts: List[str]) -> np.ndarray:
+    """
+    Generate embedding vectors for several texts in one model call.
+    
+    Args:
+        texts: Input texts to embed
+        
+    Returns:
+        Unit-length float32 array of shape (len(texts), EMBEDDING_DIMENSION)
+    """
+    model = get_embedding_model()
+    if model is None:
+        logger.warning("Embedding model not available, returning dummy embeddings")
+        return np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+    return model.encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    ).astype(np.float32, copy=False)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched model calls.
+    
+    A request arriving while no batch is running starts one immediately;
+    requests arriving while the model is busy wait and go out together in
+    the next call. Idle traffic pays no added latency, and bursts share
+    one forward pass instead of queuing for one each.
+    """
+    
+    def __init__(self):
+        """Initialize an empty batcher."""
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._draining: Optional[asyncio.Task] = None
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a text as part of the next batch.
+        
+        Args:
+            text: Input text to embed
+            
+        Returns:
+            Unit-length float32 embedding vector
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if self._draining is None:
+            self._draining = asyncio.create_task(self._drain())
+        return await future
+    
+    async def _drain(self):
+        """Encode pending texts batch by batch until none are left."""
+        try:
+            while self._pending:
+                batch = self._pending[:EMBEDDING_BATCH_SIZE]
+                del self._pending[:EMBEDDING_BATCH_SIZE]
+                # Callers that gave up (e.g. a speculative embedding cancelled
+                # on an L1 hit) cancel their future; don't spend a forward pass on them
+                batch = [entry for entry in batch if not entry[1].cancelled()]
+                if not batch:
+                    continue
+                try:
+                    # Off the event loop: inference is CPU-bound and releases the GIL
+                    vectors = await asyncio.get_running_loop().run_in_executor(
+                        _EMBED_EXECUTOR, generate_embeddings_batch, [text for text, _ in batch]
+                    )
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+        finally:
+            self._draining = None
+
+
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Get or create the shared embedding batcher."""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher()
+    return _embedding_batcher
+
+
+def cosine_similarity(
+    embedding1: List[float],
+    embedding2: List[float],
+    normalized: bool = False,
+) -> float:
     """
     Calculate cosine similarity between two embeddings.
     
     Args:
         embedding1: First embedding vector
         embedding2: Second embedding vector
+        normalized: Whether both vectors are already unit length (as
+            generate_embedding returns them), making this a plain dot product
         
     Returns:
         Cosine similarity score between 0 and 1
     """
-    vec1 = np.array(embedding1)
-    vec2 = np.array(embedding2)
+    vec1 = np.asarray(embedding1, dtype=np.float32)
+    vec2 = np.asarray(embedding2, dtype=np.float32)
+    if normalized:
+        return float(np.dot(vec1, vec2))
     
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
-    
-    if norm1 == 0 or norm2 == 0:
+    # One sqrt over the product of squared norms instead of two norm calls
+    squared_norms = np.vdot(vec1, vec1) * np.vdot(vec2, vec2)
+    if squared_norms == 0:
         return 0.0
     
-    return float(dot_product / (norm1 * norm2))
+    return float(np.dot(vec1, vec2) / np.sqrt(squared_norms))
+
 
+def cosine_similarity_batch(
+    query: np.ndarray,
+    matrix: np.ndarray,
+    normalized: bool = False,
+) -> np.ndarray:
+    """
+    Calculate cosine similarity between a query and every row of a matrix.
+    
+    Args:
+        query: Query vector, shape (D,)
+        matrix: Candidate vectors, shape (N, D)
+        normalized: Whether query and rows are already unit length, in which
+            case similarity is a single matrix-vector product
+        
+    Returns:
+        Similarity of each row to the query, shape (N,)
+    """
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scores = matrix @ query
+    if normalized:
+        return scores
+    
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
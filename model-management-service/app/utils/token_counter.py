@@ -1,5 +1,8 @@
 """Token counting utilities."""
-from typing import List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List
 import tiktoken
 import structlog
 
@@ -8,6 +11,16 @@ logger = structlog.get_logger()
 # Use cl100k_base encoding (GPT-3.5/GPT-4 compatible)
 _encoding = None
 
+# Long-lived pool for tokenizing from async code; tiktoken releases the GIL
+_TOKENIZER_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tokenizer")
+
+# Token counts of recently seen history texts. Earlier turns of a session are
+# re-counted on every request, so each turn only tokenizes what's new. A plain
+# dict, emptied when full; only count_tokens_batch touches it, on the event
+# loop, never from the executor threads, so it needs no locking.
+_TOKEN_MEMO_SIZE = 4096
+_token_memo: Dict[str, int] = {}
+
 
 def get_encoding():
     """Get or create the tokenizer encoding."""
@@ -31,6 +44,50 @@ def count_tokens(text: str) -> int:
     return len(encoding.encode(text))
 
 
+async def count_tokens_async(text: str) -> int:
+    """
+    Count tokens in a text string without blocking the event loop.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Number of tokens
+    """
+    return await asyncio.get_running_loop().run_in_executor(_TOKENIZER_EXECUTOR, count_tokens, text)
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """
+    Count tokens for several strings with a single tokenizer call.
+    
+    Strings counted recently are answered from a memo; only the rest are
+    encoded.
+    
+    Args:
+        texts: Input strings
+        
+    Returns:
+        Token count for each string, in order
+    """
+    counts = [_token_memo.get(text) for text in texts]
+    misses = [i for i, count in enumerate(counts) if count is None]
+    if misses:
+        encoded = get_encoding().encode_batch([texts[i] for i in misses])
+        if len(_token_memo) + len(misses) > _TOKEN_MEMO_SIZE:
+            _token_memo.clear()
+        for i, tokens in zip(misses, encoded):
+            counts[i] = len(tokens)
+            _token_memo[texts[i]] = counts[i]
+    return counts
+
+
+@lru_cache(maxsize=16)
+def _role_tokens(role: str) -> int:
+    """Token count of a message's role prefix; roles are a tiny closed set."""
+    return len(get_encoding().encode(f"{role}: "))
+
+
 def count_tokens_in_messages(messages: List[dict]) -> int:
     """
     Count total tokens in a list of messages.
@@ -41,16 +98,14 @@ def count_tokens_in_messages(messages: List[dict]) -> int:
     Returns:
         Total number of tokens
     """
-    total_tokens = 0
-    encoding = get_encoding()
-    
-    for message in messages:
-        # Count tokens for role and content
-        role_tokens = len(encoding.encode(f"{message.get('role', 'user')}: "))
-        content_tokens = len(encoding.encode(message.get('content', '')))
-        total_tokens += role_tokens + content_tokens
+    if not messages:
+        return 0
     
-    return total_tokens
+    # Role prefixes and contents are counted separately (joining them could
+    # merge tokens across the boundary); contents in one memoized batch
+    role_tokens = sum(_role_tokens(message.get('role', 'user')) for message in messages)
+    contents = [message.get('content', '') for message in messages]
+    return role_tokens + sum(count_tokens_batch(contents))
 
 
 def estimate_tokens(text: str) -> int:
@@ -0,0 +1,112 @@
+"""Shared HTTP client helpers for the endpoint test scripts."""
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Coroutine
+
+import httpx
+
+# Stream events are decoded once per token, so use orjson when installed
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# uvloop (installed with uvicorn[standard]) speeds up the socket I/O these
+# scripts consist of
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# TEST_VERBOSE=0 silences per-test detail, leaving only each script's summary
+VERBOSE = os.environ.get("TEST_VERBOSE", "1") == "1"
+
+BASE_URL = "http://localhost:8000"
+CHAT_URL = f"{BASE_URL}/api/v1/inference/chat"
+STREAM_URL = f"{BASE_URL}/api/v1/inference/chat/stream"
+SSE_HEADERS = {"Accept": "text/event-stream"}
+
+# SSE framing, as bytes so events are matched without decoding
+_SSE_DATA_PREFIX = b"data: "
+_SSE_DATA_OFFSET = len(_SSE_DATA_PREFIX)
+_SSE_EVENT_END = b"\n\n"
+_SSE_EVENT_END_LEN = len(_SSE_EVENT_END)
+
+# Pause for writes the server finishes in background tasks after it has
+# responded (history, cache). There is no endpoint to poll for them, and
+# they land within a few Redis round-trips
+SETTLE_DELAY = 0.1
+
+# Keep-alive pool for the shared client; sized above any burst these tests send.
+# HTTP/1.1 only: uvicorn does not serve HTTP/2, so http2=True would gain nothing
+CLIENT_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+
+
+def log(*args: Any, **kwargs: Any) -> None:
+    """Print test detail output unless TEST_VERBOSE=0."""
+    if VERBOSE:
+        print(*args, **kwargs)
+
+
+def log_traceback() -> None:
+    """Print the exception being handled, unless TEST_VERBOSE=0."""
+    if VERBOSE:
+        import traceback
+        traceback.print_exc()
+
+
+def new_client() -> httpx.AsyncClient:
+    """Create the client a test run shares across all of its tests."""
+    return httpx.AsyncClient(timeout=60.0, limits=CLIENT_LIMITS)
+
+
+def run(main: Coroutine[Any, Any, int]) -> int:
+    """Run a script's main coroutine, on uvloop when it is installed."""
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
+
+
+async def sse_events(response: httpx.Response):
+    """
+    Yield the JSON payload of each SSE data event in a streaming response.
+
+    Splits the raw byte stream on event boundaries and parses each payload
+    straight from bytes, skipping per-line text decoding. Reads the body
+    undecoded (aiter_raw): the service doesn't compress event streams, so
+    there's no Content-Encoding to undo.
+    """
+    buffer = bytearray()
+    async for chunk in response.aiter_raw():
+        buffer += chunk
+        while (end := buffer.find(_SSE_EVENT_END)) >= 0:
+            event = bytes(buffer[:end])
+            del buffer[:end + _SSE_EVENT_END_LEN]
+            if event[:_SSE_DATA_OFFSET] == _SSE_DATA_PREFIX:
+                try:
+                    yield _json_loads(event[_SSE_DATA_OFFSET:])
+                except json.JSONDecodeError:
+                    continue
+
+
+async def warm_up(client: httpx.AsyncClient) -> None:
+    """
+    Send one throwaway request before the timed tests.
+
+    Loads the model and opens a pooled connection so the first real test
+    isn't measured against cold-start costs. Failures are ignored; the
+    tests themselves report an unreachable server.
+    """
+    try:
+        await client.post(
+            CHAT_URL,
+            json={
+                "session_id": f"warmup-{datetime.now().timestamp()}",
+                "prompt": "ping",
+                "temperature": 0.0,
+            },
+        )
+    except httpx.HTTPError:
+        pass
@@ -2,268 +2,331 @@
 """Test both streaming and non-streaming endpoints."""
 import asyncio
 import httpx
-import json
+import statistics
 import sys
+import time
 from datetime import datetime
+from typing import List
 
+from client_helpers import (
+    CHAT_URL,
+    SETTLE_DELAY,
+    SSE_HEADERS,
+    STREAM_URL,
+    log,
+    log_traceback,
+    new_client,
+    run,
+    sse_events,
+    warm_up,
+)
 
-async def test_non_streaming():
+# Streaming requests sampled by the TTFT distribution test
+TTFT_RUNS = 10
+
+
+async def test_non_streaming(client: httpx.AsyncClient):
     """Test non-streaming endpoint."""
-    print("=" * 70)
-    print("TEST 1: Non-Streaming Endpoint")
-    print("=" * 70)
+    log("=" * 70)
+    log("TEST 1: Non-Streaming Endpoint")
+    log("=" * 70)
     
     prompt = "Explain what Python is in 2 sentences."
     session_id = f"test-nonstream-{datetime.now().timestamp()}"
     
-    print(f"\n📤 PROMPT:")
-    print(f"   {prompt}")
-    print(f"\n📋 Request Details:")
-    print(f"   Session ID: {session_id}")
-    print(f"   Temperature: 0.7")
-    print(f"   Stream: false")
+    log(f"\n📤 PROMPT:")
+    log(f"   {prompt}")
+    log(f"\n📋 Request Details:")
+    log(f"   Session ID: {session_id}")
+    log(f"   Temperature: 0.7")
+    log(f"   Stream: false")
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": session_id,
-                "prompt": prompt,
-                "stream": False,
-                "temperature": 0.7
-            }
-            
-            print(f"\n⏳ Sending request...")
-            start_time = datetime.now()
+        payload = {
+            "session_id": session_id,
+            "prompt": prompt,
+            "stream": False,
+            "temperature": 0.7
+        }
+        
+        log(f"\n⏳ Sending request...")
+        start_ns = time.perf_counter_ns()
+        
+        response = await client.post(
+            CHAT_URL,
+            json=payload
+        )
+        
+        elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+        
+        log(f"\n📊 Response Status: {response.status_code}")
+        log(f"⏱️  Response Time: {elapsed:.2f} seconds")
+        
+        if response.status_code == 200:
+            data = response.json()
+            log(f"\n✅ RESPONSE:")
+            log(f"   Session ID: {data.get('session_id')}")
+            log(f"   Response Length: {len(data.get('response', ''))} characters")
+            log(f"   Tokens Generated: {data.get('tokens_generated', 0)}")
+            log(f"   Tokens Prompt: {data.get('tokens_prompt', 0)}")
+            log(f"   Cache Hit: {data.get('cache_hit', False)}")
+            log(f"   Cache Type: {data.get('cache_type', 'N/A')}")
+            log(f"   Latency: {data.get('latency_ms', 0):.2f} ms")
+            log(f"   Timestamp: {data.get('timestamp')}")
+            log(f"\n📝 Full Response:")
+            log(f"   {data.get('response', '')[:200]}...")
+            return True
+        else:
+            log(f"\n❌ Error: {response.status_code}")
+            log(f"   {response.text}")
+            return False
             
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json=payload
-            )
-            
-            elapsed = (datetime.now() - start_time).total_seconds()
-            
-            print(f"\n📊 Response Status: {response.status_code}")
-            print(f"⏱️  Response Time: {elapsed:.2f} seconds")
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"\n✅ RESPONSE:")
-                print(f"   Session ID: {data.get('session_id')}")
-                print(f"   Response Length: {len(data.get('response', ''))} characters")
-                print(f"   Tokens Generated: {data.get('tokens_generated', 0)}")
-                print(f"   Tokens Prompt: {data.get('tokens_prompt', 0)}")
-                print(f"   Cache Hit: {data.get('cache_hit', False)}")
-                print(f"   Cache Type: {data.get('cache_type', 'N/A')}")
-                print(f"   Latency: {data.get('latency_ms', 0):.2f} ms")
-                print(f"   Timestamp: {data.get('timestamp')}")
-                print(f"\n📝 Full Response:")
-                print(f"   {data.get('response', '')[:200]}...")
-                return True
-            else:
-                print(f"\n❌ Error: {response.status_code}")
-                print(f"   {response.text}")
-                return False
-                
     except Exception as e:
-        print(f"\n❌ Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"\n❌ Exception: {e}")
+        log_traceback()
         return False
 
 
-async def test_streaming():
+async def test_streaming(client: httpx.AsyncClient):
     """Test streaming endpoint."""
-    print("\n" + "=" * 70)
-    print("TEST 2: Streaming Endpoint")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST 2: Streaming Endpoint")
+    log("=" * 70)
     
     prompt = "Count from 1 to 5, saying each number on a new line."
     session_id = f"test-stream-{datetime.now().timestamp()}"
     
-    print(f"\n📤 PROMPT:")
-    print(f"   {prompt}")
-    print(f"\n📋 Request Details:")
-    print(f"   Session ID: {session_id}")
-    print(f"   Temperature: 0.7")
-    print(f"   Stream: true")
+    log(f"\n📤 PROMPT:")
+    log(f"   {prompt}")
+    log(f"\n📋 Request Details:")
+    log(f"   Session ID: {session_id}")
+    log(f"   Temperature: 0.7")
+    log(f"   Stream: true")
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": session_id,
-                "prompt": prompt,
-                "stream": True,
-                "temperature": 0.7
-            }
-            
-            print(f"\n⏳ Sending streaming request...")
-            print(f"\n📥 STREAMING RESPONSE (tokens as they arrive):")
-            print(f"   ", end="", flush=True)
-            
-            start_time = datetime.now()
-            full_response = ""
-            tokens_received = 0
-            first_token_time = None
-            complete_received = False
-            stream_error = None
+        payload = {
+            "session_id": session_id,
+            "prompt": prompt,
+            "stream": True,
+            "temperature": 0.7
+        }
+        
+        log(f"\n⏳ Sending streaming request...")
+        
+        # Tokens are collected and printed once at the end; a flushed write
+        # per token would slow the loop being measured
+        start_ns = time.perf_counter_ns()
+        chunks = []
+        tokens_received = 0
+        first_token_ns = None
+        complete_received = False
+        stream_error = None
+        
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json=payload,
+            headers=SSE_HEADERS
+        ) as response:
+            if response.status_code != 200:
+                error_text = await response.aread()
+                log(f"\n❌ Error: {response.status_code}")
+                log(f"   {error_text.decode()}")
+                return False
             
-            async with client.stream(
-                "POST",
-                "http://localhost:8000/api/v1/inference/chat/stream",
-                json=payload,
-                headers={"Accept": "text/event-stream"}
-            ) as response:
-                if response.status_code != 200:
-                    error_text = await response.aread()
-                    print(f"\n❌ Error: {response.status_code}")
-                    print(f"   {error_text.decode()}")
-                    return False
+            async for data in sse_events(response):
+                token = data.get("token", "")
+                done = data.get("done", False)
                 
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]  # Remove "data: " prefix
-                        try:
-                            data = json.loads(data_str)
-                            token = data.get("token", "")
-                            done = data.get("done", False)
-                            
-                            if token:
-                                if first_token_time is None:
-                                    first_token_time = datetime.now()
-                                    time_to_first_token = (first_token_time - start_time).total_seconds()
-                                    print(f"\n   ⚡ First token received in {time_to_first_token:.2f}s\n   ", end="", flush=True)
-                                
-                                print(token, end="", flush=True)
-                                full_response += token
-                                tokens_received += 1
-                            
-                            if done:
-                                complete_received = True
-                                elapsed = (datetime.now() - start_time).total_seconds()
-                                
-                                print(f"\n\n✅ STREAM COMPLETE:")
-                                print(f"   Total Tokens Received: {tokens_received}")
-                                print(f"   Tokens Generated: {data.get('tokens_generated', 0)}")
-                                print(f"   Tokens Prompt: {data.get('tokens_prompt', 0)}")
-                                print(f"   Latency: {data.get('latency_ms', 0):.2f} ms")
-                                print(f"   Total Time: {elapsed:.2f} seconds")
-                                print(f"   Cache Hit: {data.get('cache_hit', False)}")
-                                
-                                if "error" in data:
-                                    stream_error = data.get("error")
-                                    print(f"   ⚠️  Error: {stream_error}")
-                                
-                                break
-                        except json.JSONDecodeError:
-                            continue
-            
-            if complete_received:
-                print(f"\n📝 Full Response:")
-                print(f"   {full_response[:200]}...")
-                return stream_error is None
-            else:
-                print(f"\n⚠️ Stream ended without completion marker")
-                return False
+                if token:
+                    if first_token_ns is None:
+                        first_token_ns = time.perf_counter_ns()
+                        time_to_first_token = (first_token_ns - start_ns) / 1e9
+                        log(f"\n   ⚡ First token received in {time_to_first_token:.2f}s")
+                    
+                    chunks.append(token)
+                    tokens_received += 1
                 
+                if done:
+                    complete_received = True
+                    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+                    
+                    log(f"\n✅ STREAM COMPLETE:")
+                    log(f"   Total Tokens Received: {tokens_received}")
+                    log(f"   Tokens Generated: {data.get('tokens_generated', 0)}")
+                    log(f"   Tokens Prompt: {data.get('tokens_prompt', 0)}")
+                    log(f"   Latency: {data.get('latency_ms', 0):.2f} ms")
+                    log(f"   Total Time: {elapsed:.2f} seconds")
+                    log(f"   Cache Hit: {data.get('cache_hit', False)}")
+                    
+                    if "error" in data:
+                        stream_error = data.get("error")
+                        log(f"   ⚠️  Error: {stream_error}")
+                    
+                    break
+        
+        if complete_received:
+            log(f"\n📝 Full Response:")
+            log(f"   {''.join(chunks)[:200]}...")
+            return stream_error is None
+        else:
+            log(f"\n⚠️ Stream ended without completion marker")
+            return False
+            
     except Exception as e:
-        print(f"\n❌ Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"\n❌ Exception: {e}")
+        log_traceback()
         return False
 
 
-async def test_both_with_same_session():
+async def test_both_with_same_session(client: httpx.AsyncClient):
     """Test both endpoints with the same session to verify history."""
-    print("\n" + "=" * 70)
-    print("TEST 3: Both Endpoints with Same Session")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST 3: Both Endpoints with Same Session")
+    log("=" * 70)
     
     session_id = f"test-both-{datetime.now().timestamp()}"
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # First request - non-streaming
-            print(f"\n1. Non-streaming request...")
-            response1 = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json={
-                    "session_id": session_id,
-                    "prompt": "My favorite programming language is Python.",
-                    "temperature": 0.7
-                }
-            )
-            
-            if response1.status_code == 200:
-                data1 = response1.json()
-                print(f"   ✓ Response: {data1.get('response', '')[:80]}...")
+        # First request - non-streaming
+        log(f"\n1. Non-streaming request...")
+        response1 = await client.post(
+            CHAT_URL,
+            json={
+                "session_id": session_id,
+                "prompt": "My favorite programming language is Python.",
+                "temperature": 0.7
+            }
+        )
+        
+        if response1.status_code == 200:
+            data1 = response1.json()
+            log(f"   ✓ Response: {data1.get('response', '')[:80]}...")
+        else:
+            log(f"   ✗ Failed: {response1.status_code}")
+            return False
+        
+        await asyncio.sleep(SETTLE_DELAY)
+        
+        # Second request - streaming
+        log(f"\n2. Streaming request (should use history)...")
+        tokens_received = 0
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json={
+                "session_id": session_id,
+                "prompt": "What is my favorite programming language?",
+                "stream": True
+            },
+            headers=SSE_HEADERS
+        ) as response2:
+            if response2.status_code == 200:
+                async for data in sse_events(response2):
+                    if data.get("token"):
+                        tokens_received += 1
+                    if data.get("done"):
+                        log(f"   ✓ Stream completed: {tokens_received} tokens")
+                        log(f"   Response: {data.get('tokens_prompt', 0)} prompt tokens (includes history)")
+                        return True
             else:
-                print(f"   ✗ Failed: {response1.status_code}")
+                log(f"   ✗ Failed: {response2.status_code}")
                 return False
-            
-            await asyncio.sleep(1)
-            
-            # Second request - streaming
-            print(f"\n2. Streaming request (should use history)...")
-            tokens_received = 0
-            async with client.stream(
-                "POST",
-                "http://localhost:8000/api/v1/inference/chat/stream",
-                json={
-                    "session_id": session_id,
-                    "prompt": "What is my favorite programming language?",
-                    "stream": True
-                },
-                headers={"Accept": "text/event-stream"}
-            ) as response2:
-                if response2.status_code == 200:
-                    async for line in response2.aiter_lines():
-                        if line.startswith("data: "):
-                            try:
-                                data = json.loads(line[6:])
-                                if data.get("token"):
-                                    tokens_received += 1
-                                if data.get("done"):
-                                    print(f"   ✓ Stream completed: {tokens_received} tokens")
-                                    print(f"   Response: {data.get('tokens_prompt', 0)} prompt tokens (includes history)")
-                                    return True
-                            except:
-                                pass
-                else:
-                    print(f"   ✗ Failed: {response2.status_code}")
-                    return False
-                    
+                
     except Exception as e:
-        print(f"\n❌ Exception: {e}")
+        log(f"\n❌ Exception: {e}")
         return False
 
 
-async def main():
-    """Run all tests."""
-    print("\n" + "🚀 Testing Model Management Endpoints".center(70))
-    print("=" * 70)
-    
-    results = []
+async def test_ttft_distribution(
+    client: httpx.AsyncClient,
+    samples: List[int],
+    runs: int = TTFT_RUNS,
+):
+    """
+    Sample time to first token over repeated streaming requests.
     
-    # Test 1: Non-streaming
-    results.append(await test_non_streaming())
+    Streams run one at a time against an otherwise idle server, so each
+    sample (ns, appended to ``samples``) measures the server rather than
+    queueing behind other requests on the single model backend.
+    """
+    log("\n" + "=" * 70)
+    log("TEST 4: Time to First Token Distribution")
+    log("=" * 70)
     
-    # Wait between tests
-    await asyncio.sleep(2)
+    stamp = datetime.now().timestamp()
     
-    # Test 2: Streaming
-    results.append(await test_streaming())
+    async def sample(i: int) -> bool:
+        # Distinct prompts, so samples measure generation rather than cache hits
+        payload = {
+            "session_id": f"test-ttft-{stamp}-{i}",
+            "prompt": f"Count from 1 to 5. (run {i})",
+            "stream": True,
+            "temperature": 0.7
+        }
+        start_ns = time.perf_counter_ns()
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json=payload,
+            headers=SSE_HEADERS
+        ) as response:
+            if response.status_code != 200:
+                return False
+            first_token = True
+            async for data in sse_events(response):
+                if first_token and data.get("token"):
+                    samples.append(time.perf_counter_ns() - start_ns)
+                    first_token = False
+                if data.get("done"):
+                    return "error" not in data
+        return False
     
-    # Wait between tests
-    await asyncio.sleep(2)
+    try:
+        log(f"\n⏳ Sampling {runs} streaming requests...")
+        outcomes = [await sample(i) for i in range(runs)]
+        log(f"   ✓ {sum(outcomes)}/{runs} streams completed")
+        return all(outcomes)
+        
+    except Exception as e:
+        log(f"\n❌ Exception: {e}")
+        log_traceback()
+        return False
+
+
+async def main():
+    """Run all tests."""
+    print("\n" + "🚀 Testing Model Management Endpoints".center(70))
+    print("=" * 70)
     
-    # Test 3: Both with same session
-    results.append(await test_both_with_same_session())
+    # One client for the whole run, so tests reuse pooled connections.
+    # Each test uses its own session, so they run concurrently; the TTFT
+    # sampling runs alone afterwards so the other tests don't skew it.
+    ttft_samples: List[int] = []
+    async with new_client() as client:
+        await warm_up(client)
+        outcomes = await asyncio.gather(
+            test_non_streaming(client),
+            test_streaming(client),
+            test_both_with_same_session(client),
+            return_exceptions=True,
+        )
+        try:
+            ttft_outcome = await test_ttft_distribution(client, ttft_samples)
+        except Exception as e:
+            ttft_outcome = e
+    results = [outcome is True for outcome in (*outcomes, ttft_outcome)]
     
     # Summary
     print("\n" + "=" * 70)
     print(f"📊 TEST SUMMARY: {sum(results)}/{len(results)} tests passed")
     print("=" * 70)
     
+    if len(ttft_samples) >= 2:
+        p50 = statistics.median(ttft_samples) / 1e9
+        p95 = statistics.quantiles(ttft_samples, n=20)[18] / 1e9
+        print(f"⚡ TTFT over {len(ttft_samples)} streams: p50 {p50:.2f}s, p95 {p95:.2f}s")
+    
     if all(results):
         print("\n✅ All endpoints are working correctly!")
     else:
@@ -273,5 +336,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    sys.exit(asyncio.run(main()))
+    sys.exit(run(main()))
 
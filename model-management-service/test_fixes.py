@@ -2,273 +2,393 @@
 """Comprehensive test suite for critical fixes."""
 import asyncio
 import httpx
-import json
 import sys
 from datetime import datetime
 
+from client_helpers import (
+    CHAT_URL,
+    SETTLE_DELAY,
+    SSE_HEADERS,
+    STREAM_URL,
+    log,
+    log_traceback,
+    new_client,
+    run,
+    sse_events,
+    warm_up,
+)
 
-async def test_error_handling():
+
+async def test_error_handling(client: httpx.AsyncClient):
     """Test error handling in endpoints."""
-    print("=" * 70)
-    print("TEST: Error Handling")
-    print("=" * 70)
+    log("=" * 70)
+    log("TEST: Error Handling")
+    log("=" * 70)
     
     # Test with invalid model config (should handle gracefully)
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": f"test-error-{datetime.now().timestamp()}",
-                "prompt": "Test prompt",
-                "temperature": 999,  # Invalid temperature
-            }
-            
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json=payload
-            )
-            
-            print(f"✓ Status: {response.status_code}")
-            if response.status_code == 200:
-                data = response.json()
-                print(f"  Response received: {len(data.get('response', ''))} chars")
-                return True
-            elif response.status_code == 422:
-                print(f"  ✓ Validation error caught: {response.json()}")
-                return True
-            else:
-                print(f"  Response: {response.text}")
-                return False
+        payload = {
+            "session_id": f"test-error-{datetime.now().timestamp()}",
+            "prompt": "Test prompt",
+            "temperature": 999,  # Invalid temperature
+        }
+        
+        response = await client.post(
+            CHAT_URL,
+            json=payload
+        )
+        
+        log(f"✓ Status: {response.status_code}")
+        if response.status_code == 200:
+            data = response.json()
+            log(f"  Response received: {len(data.get('response', ''))} chars")
+            return True
+        elif response.status_code == 422:
+            log(f"  ✓ Validation error caught: {response.json()}")
+            return True
+        else:
+            log(f"  Response: {response.text}")
+            return False
     except Exception as e:
-        print(f"✗ Exception: {e}")
+        log(f"✗ Exception: {e}")
         return False
 
 
-async def test_race_condition_fix():
+async def test_race_condition_fix(client: httpx.AsyncClient):
     """Test that prompt is saved before history is loaded."""
-    print("\n" + "=" * 70)
-    print("TEST: Race Condition Fix")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: Race Condition Fix")
+    log("=" * 70)
     
     session_id = f"test-race-{datetime.now().timestamp()}"
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # First request - should save prompt
-            payload1 = {
-                "session_id": session_id,
-                "prompt": "My favorite color is blue.",
-                "temperature": 0.7
-            }
-            
-            print(f"\n1. First request (saves prompt)...")
-            response1 = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json=payload1
-            )
-            
+        # First request - should save prompt
+        payload1 = {
+            "session_id": session_id,
+            "prompt": "My favorite color is blue.",
+            "temperature": 0.7
+        }
+        
+        log(f"\n1. First request (saves prompt)...")
+        # The stream endpoint stores the prompt before it emits anything, so
+        # the first event is proof enough; no need to wait for the whole reply
+        async with client.stream(
+            "POST", STREAM_URL, json=payload1, headers=SSE_HEADERS
+        ) as response1:
             if response1.status_code != 200:
-                print(f"  ✗ First request failed: {response1.status_code}")
+                log(f"  ✗ First request failed: {response1.status_code}")
                 return False
+            async for _ in sse_events(response1):
+                break
+        
+        log(f"  ✓ First request acknowledged")
+        
+        # Wait a bit for DB to save
+        await asyncio.sleep(SETTLE_DELAY)
+        
+        # Second request - should load history including first prompt
+        payload2 = {
+            "session_id": session_id,
+            "prompt": "What is my favorite color?",
+            "temperature": 0.7
+        }
+        
+        log(f"\n2. Second request (should use history)...")
+        chunks = []
+        final = {}
+        async with client.stream(
+            "POST", STREAM_URL, json=payload2, headers=SSE_HEADERS
+        ) as response2:
+            if response2.status_code != 200:
+                log(f"  ✗ Second request failed: {response2.status_code}")
+                return False
+            async for data in sse_events(response2):
+                chunks.append(data.get("token", ""))
+                if data.get("done"):
+                    final = data
+                    break
+        
+        log(f"  ✓ Second request completed")
+        log(f"  Response: {''.join(chunks)[:100]}")
+        log(f"  Tokens prompt: {final.get('tokens_prompt', 0)}")
+        # If tokens_prompt > 0, history was likely used
+        if final.get('tokens_prompt', 0) > 0:
+            log(f"  ✓ History appears to be loaded (tokens_prompt > 0)")
+        return True
             
-            print(f"  ✓ First request completed")
-            
-            # Wait a bit for DB to save
-            await asyncio.sleep(1)
-            
-            # Second request - should load history including first prompt
-            payload2 = {
-                "session_id": session_id,
-                "prompt": "What is my favorite color?",
-                "temperature": 0.7
-            }
-            
-            print(f"\n2. Second request (should use history)...")
-            response2 = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json=payload2
-            )
+    except Exception as e:
+        log(f"✗ Exception: {e}")
+        log_traceback()
+        return False
+
+
+async def test_prefix_reuse(client: httpx.AsyncClient):
+    """Test that a follow-up in the same session extends the earlier context."""
+    log("\n" + "=" * 70)
+    log("TEST: Shared Prefix Reuse")
+    log("=" * 70)
+    
+    # One session for both turns: the second context starts with the first,
+    # so the model server can reuse its cached prefill for that prefix
+    session_id = f"test-prefix-{datetime.now().timestamp()}"
+    background = (
+        "You are helping plan a week-long trip through the Scottish Highlands. "
+        "The travellers are two adults who enjoy hiking, local food and small "
+        "towns, travel by rental car, prefer guesthouses to hotels, and want "
+        "no more than three hours of driving on any single day."
+    )
+    
+    try:
+        log(f"\n1. Long opening prompt...")
+        response1 = await client.post(
+            CHAT_URL,
+            json={"session_id": session_id, "prompt": background, "temperature": 0.0}
+        )
+        if response1.status_code != 200:
+            log(f"  ✗ First request failed: {response1.status_code}")
+            return False
+        data1 = response1.json()
+        
+        await asyncio.sleep(SETTLE_DELAY)
+        
+        log(f"\n2. Follow-up sharing that prefix...")
+        response2 = await client.post(
+            CHAT_URL,
+            json={"session_id": session_id, "prompt": "Suggest a first-day route.", "temperature": 0.0}
+        )
+        if response2.status_code != 200:
+            log(f"  ✗ Follow-up failed: {response2.status_code}")
+            return False
+        data2 = response2.json()
+        
+        # tokens_prompt counts the whole context whether or not the model
+        # server reused its prefill, so it shows the history was carried;
+        # model latency is where prefix reuse shows up
+        log(f"  Tokens prompt: {data1.get('tokens_prompt', 0)} -> {data2.get('tokens_prompt', 0)}")
+        log(f"  Model latency: {data1.get('latency_ms', 0):.2f} ms -> {data2.get('latency_ms', 0):.2f} ms")
+        if data2.get("tokens_prompt", 0) > data1.get("tokens_prompt", 0):
+            log(f"  ✓ Follow-up context includes the earlier turn")
+            return True
+        else:
+            log(f"  ✗ Follow-up context does not include the earlier turn")
+            return False
             
-            if response2.status_code == 200:
-                data = response2.json()
-                print(f"  ✓ Second request completed")
-                print(f"  Response: {data.get('response', '')[:100]}")
-                print(f"  Tokens prompt: {data.get('tokens_prompt', 0)}")
-                # If tokens_prompt > 0, history was likely used
-                if data.get('tokens_prompt', 0) > 0:
-                    print(f"  ✓ History appears to be loaded (tokens_prompt > 0)")
-                return True
-            else:
-                print(f"  ✗ Second request failed: {response2.status_code}")
-                return False
-                
     except Exception as e:
-        print(f"✗ Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"✗ Exception: {e}")
         return False
 
 
-async def test_streaming_error_handling():
+async def test_streaming_error_handling(client: httpx.AsyncClient):
     """Test error handling in streaming endpoint."""
-    print("\n" + "=" * 70)
-    print("TEST: Streaming Error Handling")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: Streaming Error Handling")
+    log("=" * 70)
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": f"test-stream-error-{datetime.now().timestamp()}",
-                "prompt": "Test streaming",
-                "stream": True,
-                "temperature": 0.7
-            }
-            
-            print(f"\nSending streaming request...")
-            error_received = False
-            
-            async with client.stream(
-                "POST",
-                "http://localhost:8000/api/v1/inference/chat/stream",
-                json=payload,
-                headers={"Accept": "text/event-stream"}
-            ) as response:
-                if response.status_code != 200:
-                    print(f"  ✗ Status: {response.status_code}")
-                    return False
-                
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        try:
-                            data = json.loads(data_str)
-                            if data.get("done") and "error" in data:
-                                error_received = True
-                                print(f"  ✓ Error event received: {data.get('error')}")
-                                break
-                            elif data.get("done"):
-                                print(f"  ✓ Stream completed successfully")
-                                break
-                        except json.JSONDecodeError:
-                            continue
-            
-            return True  # If we got here, error handling worked
+        payload = {
+            "session_id": f"test-stream-error-{datetime.now().timestamp()}",
+            "prompt": "Test streaming",
+            "stream": True,
+            "temperature": 0.7
+        }
+        
+        log(f"\nSending streaming request...")
+        error_received = False
+        
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json=payload,
+            headers=SSE_HEADERS
+        ) as response:
+            if response.status_code != 200:
+                log(f"  ✗ Status: {response.status_code}")
+                return False
             
+            async for data in sse_events(response):
+                if data.get("done") and "error" in data:
+                    error_received = True
+                    log(f"  ✓ Error event received: {data.get('error')}")
+                    break
+                elif data.get("done"):
+                    log(f"  ✓ Stream completed successfully")
+                    break
+        
+        return True  # If we got here, error handling worked
+        
     except Exception as e:
-        print(f"✗ Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"✗ Exception: {e}")
+        log_traceback()
         return False
 
 
-async def test_database_error_handling():
+async def test_database_error_handling(client: httpx.AsyncClient):
     """Test database error handling."""
-    print("\n" + "=" * 70)
-    print("TEST: Database Error Handling")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: Database Error Handling")
+    log("=" * 70)
     
     # Test that service works even if DB operations fail
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": f"test-db-{datetime.now().timestamp()}",
-                "prompt": "Test database error handling",
-                "temperature": 0.7
-            }
+        payload = {
+            "session_id": f"test-db-{datetime.now().timestamp()}",
+            "prompt": "Test database error handling",
+            "temperature": 0.7
+        }
+        
+        log(f"\nSending request (DB may fail but request should succeed)...")
+        response = await client.post(
+            CHAT_URL,
+            json=payload
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            log(f"  ✓ Request succeeded despite potential DB errors")
+            log(f"  Response length: {len(data.get('response', ''))}")
+            return True
+        else:
+            log(f"  ✗ Request failed: {response.status_code}")
+            return False
             
-            print(f"\nSending request (DB may fail but request should succeed)...")
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"  ✓ Request succeeded despite potential DB errors")
-                print(f"  Response length: {len(data.get('response', ''))}")
-                return True
-            else:
-                print(f"  ✗ Request failed: {response.status_code}")
-                return False
-                
     except Exception as e:
-        print(f"✗ Exception: {e}")
+        log(f"✗ Exception: {e}")
         return False
 
 
-async def test_none_chunk_handling():
+async def test_none_chunk_handling(client: httpx.AsyncClient):
     """Test handling of None chunks from model."""
-    print("\n" + "=" * 70)
-    print("TEST: None Chunk Handling")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: None Chunk Handling")
+    log("=" * 70)
     
     # This tests that the code handles None chunks gracefully
     # We can't easily simulate this, but we can verify the code doesn't crash
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": f"test-none-{datetime.now().timestamp()}",
-                "prompt": "Say hello",
-                "temperature": 0.7
-            }
-            
-            print(f"\nSending request...")
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("response"):
-                    print(f"  ✓ Request handled None chunks gracefully")
-                    return True
-                else:
-                    print(f"  ⚠ Empty response (might indicate None chunk issue)")
-                    return False
+        payload = {
+            "session_id": f"test-none-{datetime.now().timestamp()}",
+            "prompt": "Say hello",
+            "temperature": 0.7
+        }
+        
+        log(f"\nSending request...")
+        response = await client.post(
+            CHAT_URL,
+            json=payload
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("response"):
+                log(f"  ✓ Request handled None chunks gracefully")
+                return True
             else:
-                print(f"  ✗ Request failed: {response.status_code}")
+                log(f"  ⚠ Empty response (might indicate None chunk issue)")
                 return False
-                
+        else:
+            log(f"  ✗ Request failed: {response.status_code}")
+            return False
+            
     except Exception as e:
-        print(f"✗ Exception: {e}")
+        log(f"✗ Exception: {e}")
         return False
 
 
-async def test_background_task_error_tracking():
+async def test_background_task_error_tracking(client: httpx.AsyncClient):
     """Test that background task errors are logged."""
-    print("\n" + "=" * 70)
-    print("TEST: Background Task Error Tracking")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: Background Task Error Tracking")
+    log("=" * 70)
     
     # This test verifies that background tasks don't crash the service
     # We can't easily verify logging, but we can ensure requests still work
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "session_id": f"test-bg-{datetime.now().timestamp()}",
+        # Same prompt in a fresh session each time, so the context (and
+        # cache key) repeats and later requests can be served from cache.
+        # Bodies are built up front, leaving only the sends in the fan-out
+        session_prefix = f"test-bg-{datetime.now().timestamp()}"
+        first, *repeats = [
+            {
+                "session_id": f"{session_prefix}-{i}",
                 "prompt": "Test background tasks",
-                "temperature": 0.7
+                "temperature": 0.0
             }
+            for i in range(8)
+        ]
+        
+        log(f"\nSending multiple requests to trigger background tasks...")
+        limit = asyncio.Semaphore(4)
+        
+        async def send(body: dict) -> bool:
+            async with limit:
+                response = await client.post(CHAT_URL, json=body)
+            return response.status_code == 200
+        
+        # The first request populates the cache; the repeats then go out
+        # together over the pooled connections, bounded by the semaphore
+        results = [await send(first)]
+        await asyncio.sleep(SETTLE_DELAY)
+        results += await asyncio.gather(*(send(body) for body in repeats))
+        
+        if all(results):
+            log(f"  ✓ All requests succeeded (background tasks handled)")
+            return True
+        else:
+            log(f"  ✗ Some requests failed")
+            return False
             
-            print(f"\nSending multiple requests to trigger background tasks...")
-            results = []
-            for i in range(3):
-                response = await client.post(
-                    "http://localhost:8000/api/v1/inference/chat",
-                    json={**payload, "prompt": f"Request {i}: {payload['prompt']}"}
-                )
-                results.append(response.status_code == 200)
-                await asyncio.sleep(0.5)
+    except Exception as e:
+        log(f"✗ Exception: {e}")
+        return False
+
+
+async def test_cache_hit(client: httpx.AsyncClient):
+    """Test that a repeated deterministic request is served from cache."""
+    log("\n" + "=" * 70)
+    log("TEST: Cache Hit")
+    log("=" * 70)
+    
+    # Fresh sessions with no history give both requests the same context,
+    # and temperature 0 keeps the response cacheable
+    session_prefix = f"test-cache-{datetime.now().timestamp()}"
+    payload = {
+        "prompt": "Name the largest planet in the solar system.",
+        "temperature": 0.0
+    }
+    
+    try:
+        log(f"\n1. First request (populates cache)...")
+        response1 = await client.post(
+            CHAT_URL,
+            json={**payload, "session_id": f"{session_prefix}-1"}
+        )
+        if response1.status_code != 200:
+            log(f"  ✗ First request failed: {response1.status_code}")
+            return False
+        
+        # The cache is written by a background task after the response
+        await asyncio.sleep(SETTLE_DELAY)
+        
+        log(f"\n2. Repeated request (should hit cache)...")
+        response2 = await client.post(
+            CHAT_URL,
+            json={**payload, "session_id": f"{session_prefix}-2"}
+        )
+        if response2.status_code != 200:
+            log(f"  ✗ Repeated request failed: {response2.status_code}")
+            return False
+        
+        data = response2.json()
+        if data.get("cache_hit") is True:
+            log(f"  ✓ Served from {data.get('cache_type')} cache in {data.get('latency_ms', 0):.2f} ms")
+            return True
+        else:
+            log(f"  ✗ Repeated request was not a cache hit")
+            return False
             
-            if all(results):
-                print(f"  ✓ All requests succeeded (background tasks handled)")
-                return True
-            else:
-                print(f"  ✗ Some requests failed")
-                return False
-                
     except Exception as e:
-        print(f"✗ Exception: {e}")
+        log(f"✗ Exception: {e}")
         return False
 
 
@@ -277,25 +397,22 @@ async def main():
     print("\n" + "🔧 Testing Critical Fixes".center(70))
     print("=" * 70)
     
-    results = []
-    
-    # Test 1: Error handling
-    results.append(await test_error_handling())
-    
-    # Test 2: Race condition fix
-    results.append(await test_race_condition_fix())
-    
-    # Test 3: Streaming error handling
-    results.append(await test_streaming_error_handling())
-    
-    # Test 4: Database error handling
-    results.append(await test_database_error_handling())
-    
-    # Test 5: None chunk handling
-    results.append(await test_none_chunk_handling())
-    
-    # Test 6: Background task error tracking
-    results.append(await test_background_task_error_tracking())
+    # One client for the whole run, so tests reuse pooled connections.
+    # Each test uses its own session, so they run concurrently.
+    async with new_client() as client:
+        await warm_up(client)
+        outcomes = await asyncio.gather(
+            test_error_handling(client),
+            test_race_condition_fix(client),
+            test_prefix_reuse(client),
+            test_streaming_error_handling(client),
+            test_database_error_handling(client),
+            test_none_chunk_handling(client),
+            test_background_task_error_tracking(client),
+            test_cache_hit(client),
+            return_exceptions=True,
+        )
+    results = [outcome is True for outcome in outcomes]
     
     # Summary
     print("\n" + "=" * 70)
@@ -311,5 +428,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    sys.exit(asyncio.run(main()))
+    sys.exit(run(main()))
 
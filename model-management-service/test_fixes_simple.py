@@ -2,176 +2,190 @@
 """Simple test suite for critical fixes."""
 import asyncio
 import httpx
-import json
 import sys
 from datetime import datetime
 
+from client_helpers import (
+    CHAT_URL,
+    SETTLE_DELAY,
+    SSE_HEADERS,
+    STREAM_URL,
+    log,
+    log_traceback,
+    new_client,
+    run,
+    sse_events,
+)
 
-async def test_basic_functionality():
+
+async def test_basic_functionality(client: httpx.AsyncClient):
     """Test basic endpoint functionality."""
-    print("=" * 70)
-    print("TEST: Basic Functionality")
-    print("=" * 70)
+    log("=" * 70)
+    log("TEST: Basic Functionality")
+    log("=" * 70)
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # Test non-streaming
-            print("\n1. Testing non-streaming endpoint...")
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json={
-                    "session_id": f"test-basic-{datetime.now().timestamp()}",
-                    "prompt": "Say hello",
-                    "temperature": 0.7
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"   ✓ Non-streaming: {len(data.get('response', ''))} chars, {data.get('tokens_generated', 0)} tokens")
+        # Test non-streaming
+        log("\n1. Testing non-streaming endpoint...")
+        response = await client.post(
+            CHAT_URL,
+            json={
+                "session_id": f"test-basic-{datetime.now().timestamp()}",
+                "prompt": "Say hello",
+                "temperature": 0.7
+            }
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            log(f"   ✓ Non-streaming: {len(data.get('response', ''))} chars, {data.get('tokens_generated', 0)} tokens")
+        else:
+            log(f"   ✗ Non-streaming failed: {response.status_code}")
+            return False
+        
+        # Test streaming
+        log("\n2. Testing streaming endpoint...")
+        tokens_received = 0
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json={
+                "session_id": f"test-stream-basic-{datetime.now().timestamp()}",
+                "prompt": "Count to 2",
+                "stream": True
+            },
+            headers=SSE_HEADERS
+        ) as stream:
+            if stream.status_code == 200:
+                async for data in sse_events(stream):
+                    if data.get("done"):
+                        tokens_received = data.get("tokens_generated", 0)
+                        break
+                    elif data.get("token"):
+                        tokens_received += 1
+                log(f"   ✓ Streaming: {tokens_received} tokens received")
             else:
-                print(f"   ✗ Non-streaming failed: {response.status_code}")
+                log(f"   ✗ Streaming failed: {stream.status_code}")
                 return False
-            
-            # Test streaming
-            print("\n2. Testing streaming endpoint...")
-            tokens_received = 0
-            async with client.stream(
-                "POST",
-                "http://localhost:8000/api/v1/inference/chat/stream",
-                json={
-                    "session_id": f"test-stream-basic-{datetime.now().timestamp()}",
-                    "prompt": "Count to 2",
-                    "stream": True
-                },
-                headers={"Accept": "text/event-stream"}
-            ) as stream:
-                if stream.status_code == 200:
-                    async for line in stream.aiter_lines():
-                        if line.startswith("data: "):
-                            try:
-                                data = json.loads(line[6:])
-                                if data.get("done"):
-                                    tokens_received = data.get("tokens_generated", 0)
-                                    break
-                                elif data.get("token"):
-                                    tokens_received += 1
-                            except:
-                                pass
-                    print(f"   ✓ Streaming: {tokens_received} tokens received")
-                else:
-                    print(f"   ✗ Streaming failed: {stream.status_code}")
-                    return False
-            
-            return True
-            
+        
+        return True
+        
     except Exception as e:
-        print(f"✗ Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"✗ Exception: {e}")
+        log_traceback()
         return False
 
 
-async def test_error_handling():
+async def test_error_handling(client: httpx.AsyncClient):
     """Test error handling."""
-    print("\n" + "=" * 70)
-    print("TEST: Error Handling")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: Error Handling")
+    log("=" * 70)
     
+    # Validation errors come back without touching the model, so these
+    # requests keep a short timeout on the shared client
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Test invalid temperature
-            print("\n1. Testing invalid temperature...")
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json={
-                    "session_id": "test-error",
-                    "prompt": "Test",
-                    "temperature": 999  # Invalid
-                }
-            )
-            
-            if response.status_code == 422:
-                print("   ✓ Validation error caught correctly")
-            else:
-                print(f"   ⚠ Unexpected status: {response.status_code}")
-            
-            # Test empty prompt
-            print("\n2. Testing empty prompt...")
-            response = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json={
-                    "session_id": "test-error",
-                    "prompt": "",  # Empty
-                }
-            )
-            
-            if response.status_code == 422:
-                print("   ✓ Empty prompt validation works")
-            else:
-                print(f"   ⚠ Unexpected status: {response.status_code}")
-            
-            return True
-            
+        # Test invalid temperature
+        log("\n1. Testing invalid temperature...")
+        response = await client.post(
+            CHAT_URL,
+            json={
+                "session_id": "test-error",
+                "prompt": "Test",
+                "temperature": 999  # Invalid
+            },
+            timeout=10.0
+        )
+        
+        if response.status_code == 422:
+            log("   ✓ Validation error caught correctly")
+        else:
+            log(f"   ⚠ Unexpected status: {response.status_code}")
+        
+        # Test empty prompt
+        log("\n2. Testing empty prompt...")
+        response = await client.post(
+            CHAT_URL,
+            json={
+                "session_id": "test-error",
+                "prompt": "",  # Empty
+            },
+            timeout=10.0
+        )
+        
+        if response.status_code == 422:
+            log("   ✓ Empty prompt validation works")
+        else:
+            log(f"   ⚠ Unexpected status: {response.status_code}")
+        
+        return True
+        
     except Exception as e:
-        print(f"✗ Exception: {e}")
+        log(f"✗ Exception: {e}")
         return False
 
 
-async def test_race_condition():
+async def test_race_condition(client: httpx.AsyncClient):
     """Test race condition fix."""
-    print("\n" + "=" * 70)
-    print("TEST: Race Condition Fix")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST: Race Condition Fix")
+    log("=" * 70)
     
     session_id = f"test-race-{datetime.now().timestamp()}"
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # First request
-            print("\n1. First request (saves prompt)...")
-            response1 = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json={
-                    "session_id": session_id,
-                    "prompt": "My name is TestUser",
-                    "temperature": 0.7
-                }
-            )
-            
+        # First request: the stream endpoint stores the prompt before its
+        # first event, so stop there instead of waiting out the generation
+        log("\n1. First request (saves prompt)...")
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json={
+                "session_id": session_id,
+                "prompt": "My name is TestUser",
+                "temperature": 0.7
+            },
+            headers=SSE_HEADERS,
+        ) as response1:
             if response1.status_code != 200:
-                print(f"   ✗ First request failed: {response1.status_code}")
+                log(f"   ✗ First request failed: {response1.status_code}")
                 return False
-            
-            print("   ✓ First request completed")
-            
-            # Wait for DB save
-            await asyncio.sleep(2)
-            
-            # Second request
-            print("\n2. Second request (should have history)...")
-            response2 = await client.post(
-                "http://localhost:8000/api/v1/inference/chat",
-                json={
-                    "session_id": session_id,
-                    "prompt": "What is my name?",
-                    "temperature": 0.7
-                }
-            )
-            
-            if response2.status_code == 200:
-                data = response2.json()
-                print(f"   ✓ Second request completed")
-                print(f"   Response: {data.get('response', '')[:80]}...")
-                return True
-            else:
-                print(f"   ✗ Second request failed: {response2.status_code}")
+            async for _ in sse_events(response1):
+                break
+        
+        log("   ✓ First request acknowledged")
+        
+        # Wait for DB save
+        await asyncio.sleep(SETTLE_DELAY)
+        
+        # Second request
+        log("\n2. Second request (should have history)...")
+        chunks = []
+        async with client.stream(
+            "POST",
+            STREAM_URL,
+            json={
+                "session_id": session_id,
+                "prompt": "What is my name?",
+                "temperature": 0.7
+            },
+            headers=SSE_HEADERS,
+        ) as response2:
+            if response2.status_code != 200:
+                log(f"   ✗ Second request failed: {response2.status_code}")
                 return False
-                
+            async for data in sse_events(response2):
+                chunks.append(data.get("token", ""))
+                if data.get("done"):
+                    break
+        
+        log(f"   ✓ Second request completed")
+        log(f"   Response: {''.join(chunks)[:80]}...")
+        return True
+            
     except Exception as e:
-        print(f"✗ Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"✗ Exception: {e}")
+        log_traceback()
         return False
 
 
@@ -180,11 +194,16 @@ async def main():
     print("\n" + "🔧 Testing Critical Fixes".center(70))
     print("=" * 70)
     
-    results = []
-    
-    results.append(await test_basic_functionality())
-    results.append(await test_error_handling())
-    results.append(await test_race_condition())
+    # One client for the whole run, so tests reuse pooled connections.
+    # Each test uses its own session, so they run concurrently.
+    async with new_client() as client:
+        outcomes = await asyncio.gather(
+            test_basic_functionality(client),
+            test_error_handling(client),
+            test_race_condition(client),
+            return_exceptions=True,
+        )
+    results = [outcome is True for outcome in outcomes]
     
     print("\n" + "=" * 70)
     print(f"📊 TEST SUMMARY: {sum(results)}/{len(results)} tests passed")
@@ -199,5 +218,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    sys.exit(asyncio.run(main()))
+    sys.exit(run(main()))
 
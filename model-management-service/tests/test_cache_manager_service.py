@@ -0,0 +1,66 @@
+"""Tests for CacheManager's batched L1 lookups."""
+import pytest
+
+from app.services import l1_cache
+from app.services.cache_manager_service import CacheManager
+
+
+class FakeRedis:
+    """In-memory stand-in for the few Redis commands L1 uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+
+@pytest.fixture
+def cache_manager(monkeypatch):
+    fake = FakeRedis()
+
+    async def get_fake_redis():
+        return fake
+
+    monkeypatch.setattr(l1_cache, "get_redis_client", get_fake_redis)
+    return CacheManager()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "messages",
+    [
+        [],
+        [
+            {"role": "user", "content": "Hi, I'm planning a trip."},
+            {"role": "assistant", "content": "Great, where to?"},
+        ],
+    ],
+)
+async def test_check_exact_many_finds_responses_stored_by_requests(cache_manager, messages):
+    model_config = {"temperature": 0.7, "max_tokens": 256}
+    # Store the way the inference endpoints do: keyed by ContextBuilder.prepare
+    prepared = cache_manager.context_builder.prepare(messages, "What about Scotland?", model_config)
+    await cache_manager.l1_cache.store(prepared.prompt_hash, "Scotland is lovely.")
+
+    hits = await cache_manager.check_exact_many(
+        ["What about Scotland?", "What about Wales?"],
+        messages,
+        model_config,
+    )
+
+    assert hits == {"What about Scotland?": "Scotland is lovely."}
+
+
+@pytest.mark.unit
+async def test_check_exact_many_keys_on_history(cache_manager):
+    prepared = cache_manager.context_builder.prepare([], "Tell me more.", None)
+    await cache_manager.l1_cache.store(prepared.prompt_hash, "More about nothing.")
+
+    history = [{"role": "user", "content": "Tell me about owls."}]
+    hits = await cache_manager.check_exact_many(["Tell me more."], history)
+
+    assert hits == {}